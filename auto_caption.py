@@ -1,9 +1,9 @@
-"""Automatic image-caption generation via an external LLM.
+"""Automatic image-caption generation via an external LLM — the app side.
 
-Self-contained module: holds the LLM connection settings (persisted as an
-``.ini`` next to the program), a small settings dialog, and the logic that
-sends the current image to an OpenAI-compatible vision endpoint and returns a
-plain-text English description.
+Holds the LLM settings dialog and the button commands wired into main.py.
+The Tk-free core (settings persisted as an ``.ini`` next to the program, the
+HTTP client for the OpenAI-compatible vision endpoint, image encoding and
+the batch pipeline) lives in llm.py, shared with the headless cli.py.
 
 Borrowed in spirit from the Ideogram-Json-Captioner project, but trimmed down:
 we only need a normal English caption (no JSON schema), and we talk to the
@@ -18,282 +18,20 @@ Public surface used by main.py::
 
 from __future__ import annotations
 
-import base64
-import configparser
-import io
-import json
-import mimetypes
 import os
 import threading
-import urllib.request
-import urllib.error
-from dataclasses import dataclass, asdict, fields
+import time
 from tkinter import (
-    Toplevel, Frame, Label, Entry, Button, Text, StringVar,
-    END, NORMAL, DISABLED, WORD, BOTH, X, LEFT, RIGHT,
+    Toplevel, Frame, Label, Entry, Button, Checkbutton, Text, StringVar,
+    BooleanVar, END, NORMAL, DISABLED, WORD, BOTH, X, LEFT, RIGHT,
 )
 from tkinter import ttk, messagebox
 
-from PIL import Image
-
-
-# ---------------------------------------------------------------------------
-# Settings
-# ---------------------------------------------------------------------------
-
-_INI_NAME = "auto_caption_settings.ini"
-_SECTION = "llm"
-
-DEFAULT_SYSTEM_PROMPT = (
-    "You write factual image captions in English for image datasets. "
-    "Return one polished plain-text caption only. No markdown, no JSON, no "
-    "bullet points. Describe the main subjects, setting, style, lighting, "
-    "camera/viewpoint, and notable objects without guessing identities."
+from llm import (
+    BATCH_BACKENDS, DEFAULT_SYSTEM_PROMPT, DEFAULT_USER_PROMPT, BatchStats,
+    LLMClient, LLMSettings, caption_many, generate_caption, list_models,
 )
 
-DEFAULT_USER_PROMPT = (
-    "Write a detailed but clean description of this image in English. Keep it "
-    "useful for recreating the image, but avoid unsupported proper names or "
-    "speculation."
-)
-
-
-def settings_path() -> str:
-    """Path to the .ini stored in the program folder (next to this module)."""
-    return os.path.join(os.path.dirname(os.path.abspath(__file__)), _INI_NAME)
-
-
-@dataclass
-class LLMSettings:
-    base_url: str = "http://127.0.0.1:8000/v1"
-    api_key: str = ""
-    model: str = ""
-    system_prompt: str = DEFAULT_SYSTEM_PROMPT
-    user_prompt: str = DEFAULT_USER_PROMPT
-    max_tokens: int = 1000
-    temperature: float = 0.2
-    timeout: float = 180.0
-    # Sampling sent on every request so the result does not depend on the
-    # server's launch-time defaults (aggressive penalties can produce garbage).
-    top_p: float = 0.9
-    presence_penalty: float = 0.0
-    repeat_penalty: float = 1.0
-    # auto | original | png | jpeg : how the image is encoded before sending
-    vision_image_format: str = "auto"
-
-    @classmethod
-    def load(cls, path: str | None = None) -> "LLMSettings":
-        path = path or settings_path()
-        defaults = cls()
-        if not os.path.exists(path):
-            return defaults
-        parser = configparser.ConfigParser()
-        try:
-            parser.read(path, encoding="utf-8")
-        except (OSError, configparser.Error):
-            return defaults
-        if not parser.has_section(_SECTION):
-            return defaults
-
-        sec = parser[_SECTION]
-        values = asdict(defaults)
-        for f in fields(cls):
-            if f.name not in sec:
-                continue
-            raw = sec[f.name]
-            try:
-                if f.type == "int" or f.name == "max_tokens":
-                    values[f.name] = int(raw)
-                elif f.type == "float" or f.name in ("temperature", "timeout"):
-                    values[f.name] = float(raw)
-                else:
-                    values[f.name] = raw
-            except (TypeError, ValueError):
-                pass  # keep default on malformed value
-        return cls(**values)
-
-    def save(self, path: str | None = None) -> str:
-        path = path or settings_path()
-        parser = configparser.ConfigParser()
-        parser[_SECTION] = {k: str(v) for k, v in asdict(self).items()}
-        with open(path, "w", encoding="utf-8") as f:
-            parser.write(f)
-        return path
-
-
-# ---------------------------------------------------------------------------
-# Image encoding + HTTP call
-# ---------------------------------------------------------------------------
-
-def _image_to_data_url(path: str, vision_image_format: str = "auto") -> str:
-    """Encode an image file as a base64 ``data:`` URL for the chat payload."""
-    fmt = (vision_image_format or "auto").lower().strip()
-    suffix = os.path.splitext(path)[1].lower()
-
-    convert_to: str | None = None
-    if fmt == "png":
-        convert_to = "PNG"
-    elif fmt in ("jpeg", "jpg"):
-        convert_to = "JPEG"
-    elif fmt == "auto" and suffix == ".webp":
-        # Many endpoints choke on webp; re-encode to PNG by default.
-        convert_to = "PNG"
-
-    if convert_to is None:
-        mime, _ = mimetypes.guess_type(path)
-        mime = mime or "application/octet-stream"
-        with open(path, "rb") as fh:
-            b64 = base64.b64encode(fh.read()).decode("utf-8")
-        return f"data:{mime};base64,{b64}"
-
-    with Image.open(path) as image:
-        if convert_to == "JPEG":
-            if image.mode not in ("RGB", "L"):
-                image = image.convert("RGB")
-            mime = "image/jpeg"
-        else:
-            if image.mode not in ("RGB", "RGBA"):
-                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
-            mime = "image/png"
-        buffer = io.BytesIO()
-        image.save(buffer, format=convert_to)
-        b64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    return f"data:{mime};base64,{b64}"
-
-
-def _chat_completions_url(base_url: str) -> str:
-    base = base_url.rstrip("/")
-    if base.endswith("/chat/completions"):
-        return base
-    if base.endswith("/v1"):
-        return base + "/chat/completions"
-    return base + "/v1/chat/completions"
-
-
-def _models_url(base_url: str) -> str:
-    base = base_url.rstrip("/")
-    if base.endswith("/models"):
-        return base
-    if base.endswith("/v1"):
-        return base + "/models"
-    return base + "/v1/models"
-
-
-def list_models(settings: "LLMSettings", timeout: float = 5.0) -> list[str]:
-    """Return model ids exposed by the endpoint (empty list on failure)."""
-    request = urllib.request.Request(_models_url(settings.base_url))
-    if settings.api_key.strip():
-        request.add_header("Authorization", f"Bearer {settings.api_key.strip()}")
-    try:
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            payload = json.loads(response.read().decode("utf-8"))
-    except (urllib.error.URLError, json.JSONDecodeError, OSError):
-        return []
-    data = payload.get("data") if isinstance(payload, dict) else None
-    if not isinstance(data, list):
-        return []
-    ids = []
-    for item in data:
-        if isinstance(item, dict) and isinstance(item.get("id"), str) and item["id"].strip():
-            ids.append(item["id"].strip())
-    return ids
-
-
-def generate_caption(settings: LLMSettings, image_path: str) -> str:
-    """Send the image to the LLM and return a plain-text English caption.
-
-    Raises RuntimeError with a user-facing message on any failure.
-    """
-    model = settings.model.strip()
-    if not model:
-        # Servers like llama-server expose exactly one model; auto-pick it so
-        # the user doesn't have to type the gguf filename by hand.
-        available = list_models(settings)
-        if available:
-            model = available[0]
-        else:
-            raise RuntimeError(
-                "No model name is configured and none could be fetched from the "
-                "server. Open LLM settings and set the model (or check the URL)."
-            )
-
-    image_url = _image_to_data_url(image_path, settings.vision_image_format)
-    payload = {
-        "model": model,
-        "temperature": settings.temperature,
-        "top_p": settings.top_p,
-        "presence_penalty": settings.presence_penalty,
-        # llama.cpp's name; OpenAI-style servers ignore unknown keys.
-        "repeat_penalty": settings.repeat_penalty,
-        "max_tokens": settings.max_tokens,
-        "messages": [
-            {"role": "system", "content": settings.system_prompt},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": settings.user_prompt},
-                    {"type": "image_url", "image_url": {"url": image_url}},
-                ],
-            },
-        ],
-    }
-    data = json.dumps(payload).encode("utf-8")
-    request = urllib.request.Request(
-        _chat_completions_url(settings.base_url),
-        data=data,
-        method="POST",
-    )
-    request.add_header("Content-Type", "application/json")
-    if settings.api_key.strip():
-        request.add_header("Authorization", f"Bearer {settings.api_key.strip()}")
-
-    try:
-        with urllib.request.urlopen(request, timeout=settings.timeout) as response:
-            body = response.read().decode("utf-8")
-    except urllib.error.HTTPError as exc:
-        detail = ""
-        try:
-            detail = exc.read().decode("utf-8", errors="replace")[:500]
-        except Exception:
-            pass
-        raise RuntimeError(f"LLM request failed: HTTP {exc.code}. {detail}") from exc
-    except urllib.error.URLError as exc:
-        raise RuntimeError(
-            f"Cannot reach LLM at {settings.base_url}: {exc.reason}"
-        ) from exc
-
-    try:
-        parsed = json.loads(body)
-        choice = parsed["choices"][0]
-        message = choice["message"]
-        content = message.get("content")
-    except (json.JSONDecodeError, KeyError, IndexError, TypeError) as exc:
-        raise RuntimeError(f"Unexpected LLM response: {body[:500]}") from exc
-
-    if isinstance(content, list):  # some servers return content parts
-        content = "".join(
-            part.get("text", "") for part in content if isinstance(part, dict)
-        )
-    caption = (content or "").strip().strip('"').strip()
-    if caption:
-        return caption
-
-    # Reasoning models may leave content empty and put text in reasoning_content.
-    # That text is the model's thinking, not a finished caption, so we don't use
-    # it — but we point the user at the real cause.
-    if (message.get("reasoning_content") or "").strip():
-        raise RuntimeError(
-            "The model returned only reasoning/thinking text and no caption. "
-            "This is usually a reasoning model or an aggressive sampling setup. "
-            "Try a non-reasoning vision model, or relaunch the server without "
-            "high presence/repeat penalties."
-        )
-    finish = choice.get("finish_reason")
-    raise RuntimeError(
-        f"LLM returned an empty caption (finish_reason={finish}). Check the model "
-        "and the server's sampling settings."
-    )
-
 
 # ---------------------------------------------------------------------------
 # Settings dialog
@@ -318,7 +56,12 @@ class _SettingsDialog(Toplevel):
         self._presence_penalty = StringVar(value=str(settings.presence_penalty))
         self._repeat_penalty = StringVar(value=str(settings.repeat_penalty))
         self._timeout = StringVar(value=str(settings.timeout))
+        self._concurrency = StringVar(value=str(settings.max_concurrency))
+        self._max_side = StringVar(value=str(settings.max_image_side))
+        self._jpeg_quality = StringVar(value=str(settings.jpeg_quality))
         self._fmt = StringVar(value=settings.vision_image_format)
+        self._stream = BooleanVar(value=settings.stream)
+        self._backend = StringVar(value=settings.batch_backend)
 
         body = Frame(self)
         body.pack(fill=BOTH, expand=True, padx=10, pady=10)
@@ -348,6 +91,13 @@ class _SettingsDialog(Toplevel):
         row = self._entry(body, row, "Presence penalty", self._presence_penalty)
         row = self._entry(body, row, "Repeat penalty", self._repeat_penalty)
         row = self._entry(body, row, "Timeout (s)", self._timeout)
+        row = self._entry(body, row, "Parallel requests", self._concurrency)
+        Label(body, text="Batch backend").grid(row=row, column=0, sticky="w", pady=3)
+        ttk.Combobox(
+            body, textvariable=self._backend, state="readonly", width=28,
+            values=BATCH_BACKENDS,
+        ).grid(row=row, column=1, sticky="ew", pady=3)
+        row += 1
 
         Label(body, text="Image format").grid(row=row, column=0, sticky="w", pady=3)
         ttk.Combobox(
@@ -355,6 +105,17 @@ class _SettingsDialog(Toplevel):
             values=("auto", "original", "png", "jpeg"),
         ).grid(row=row, column=1, sticky="ew", pady=3)
         row += 1
+        row = self._entry(body, row, "Max image side (px)", self._max_side)
+        Label(body, text="(0 = send full resolution)", fg="gray").grid(
+            row=row, column=1, sticky="w"
+        )
+        row += 1
+        row = self._entry(body, row, "JPEG quality", self._jpeg_quality)
+        Checkbutton(
+            body, text="Stream Auto-caption text as it is generated",
+            variable=self._stream,
+        ).grid(row=row, column=1, sticky="w", pady=3)
+        row += 1
 
         Label(body, text="System prompt").grid(row=row, column=0, sticky="nw", pady=3)
         self._system = Text(body, width=48, height=5, wrap=WORD)
@@ -435,11 +196,17 @@ class _SettingsDialog(Toplevel):
             presence_penalty = float(self._presence_penalty.get().strip())
             repeat_penalty = float(self._repeat_penalty.get().strip())
             timeout = float(self._timeout.get().strip())
+            max_concurrency = int(self._concurrency.get().strip())
+            max_image_side = int(self._max_side.get().strip() or 0)
+            jpeg_quality = int(self._jpeg_quality.get().strip())
+            if max_concurrency < 1 or max_image_side < 0 or not 1 <= jpeg_quality <= 100:
+                raise ValueError
         except ValueError:
             messagebox.showerror(
                 "Invalid value",
-                "Max tokens must be an integer; temperature, top-p, penalties and "
-                "timeout must be numbers.",
+                "Max tokens, parallel requests (1 or more), max image side (0 or "
+                "more) and JPEG quality (1-100) must be integers; temperature, "
+                "top-p, penalties and timeout must be numbers.",
                 parent=self,
             )
             return
@@ -457,6 +224,11 @@ class _SettingsDialog(Toplevel):
             repeat_penalty=repeat_penalty,
             timeout=timeout,
             vision_image_format=self._fmt.get().strip() or "auto",
+            max_concurrency=max_concurrency,
+            max_image_side=max_image_side,
+            jpeg_quality=jpeg_quality,
+            stream=bool(self._stream.get()),
+            batch_backend=self._backend.get().strip() or "threads",
         )
         try:
             settings.save()
@@ -487,7 +259,27 @@ class AutoCaptioner:
         self.batch_button: Button | None = None  # "Caption all", set by main.py
         self._batch_running = False
         self._batch_cancel = False
-        self._batch_errors_detail: list[str] = []
+        self._batch_eta = None   # caption_jobs.EtaEstimator of the running batch
+        self._client: LLMClient | None = None
+        self._client_lock = threading.Lock()
+        # Streaming "Auto-caption": text received so far, whether a UI update
+        # is already queued, and the editor text it replaced (None until the
+        # first chunk is shown).
+        self._stream_text = ""
+        self._stream_queued = False
+        self._stream_original: str | None = None
+
+    def client(self, settings: LLMSettings) -> LLMClient:
+        """Session client for *settings*: connections and the detected model
+        id are reused until the settings change."""
+        with self._client_lock:
+            old = self._client
+            if old is not None and old.settings == settings:
+                return old
+            self._client = LLMClient(settings)
+        if old is not None:
+            old.close()
+        return self._client
 
     # -- button commands ---------------------------------------------------
 
@@ -514,14 +306,39 @@ class AutoCaptioner:
     # -- worker ------------------------------------------------------------
 
     def _worker(self, settings: LLMSettings, rel_path: str, image_path: str):
+        self._stream_text = ""
+        self._stream_queued = False
+        self._stream_original = None
+
+        def on_delta(text: str):
+            # Coalesce: at most one editor update queued, showing the latest text.
+            self._stream_text = text
+            if not self._stream_queued:
+                self._stream_queued = True
+                self.app.root.after(0, self._show_stream, rel_path)
+
         try:
-            caption = generate_caption(settings, image_path)
+            caption = generate_caption(settings, image_path, self.client(settings),
+                                       on_delta=on_delta)
             self.app.root.after(0, self._on_success, rel_path, image_path, caption)
         except Exception as exc:  # surface any failure to the user
-            self.app.root.after(0, self._on_error, str(exc))
+            self.app.root.after(0, self._on_error, str(exc), rel_path, image_path)
+
+    def _show_stream(self, rel_path: str):
+        self._stream_queued = False
+        if not self._busy or self.app.current_image != rel_path:
+            return   # finished already, or the user moved on: the result is saved at the end
+        text_area = self.app.text_area
+        if self._stream_original is None:
+            self._stream_original = text_area.get("1.0", "end-1c")
+        text_area.config(state=NORMAL)
+        text_area.delete("1.0", END)
+        text_area.insert("1.0", self._stream_text)
+        text_area.see(END)
 
     def _on_success(self, rel_path: str, image_path: str, caption: str):
         self._set_busy(False)
+        self._stream_original = None
         # Still on the same image: show it in the editor for review/save.
         if self.app.current_image == rel_path:
             self.app.text_area.config(state=NORMAL)
@@ -554,19 +371,18 @@ class AutoCaptioner:
 
         # Keep the DB / list / thumbnail dot aligned with what's on disk.
         try:
-            app.db.update_caption(rel_path, caption)
+            # Batch runs call this per image: let the DB writer batch commits.
+            app.db.update_caption(rel_path, caption, wait=False)
         except Exception:
             pass
         try:
-            app.thumb_view.refresh_caption_dot(rel_path)
+            app.thumb_view.refresh_caption_dot(
+                rel_path, has_caption=1 if caption.strip() else 0)
         except Exception:
             pass
-        if app.file_list.exists(rel_path):
-            vals = app.file_list.item(rel_path, "values")
-            disp = vals[0] if vals else app._reldisp(rel_path)
-            app.file_list.item(rel_path, values=(disp, len(caption)))
+        app.file_list.set_length(rel_path, len(caption))
         if app._sort_state.get("col") == "len":
-            app._apply_current_sort()
+            app._resort_one(rel_path)
         # If this image happens to be the one currently open, refresh the editor.
         if app.current_image == rel_path:
             app.text_area.config(state=NORMAL)
@@ -583,6 +399,11 @@ class AutoCaptioner:
 
     # -- batch: caption all images without a caption -----------------------
 
+    @property
+    def batch_running(self) -> bool:
+        """True from the start of "Caption all" until its summary is shown."""
+        return self._batch_running
+
     def generate_for_all_missing(self):
         # If a batch is already running, this button acts as Stop.
         if self._batch_running:
@@ -607,10 +428,16 @@ class AutoCaptioner:
         if not targets:
             messagebox.showinfo("Auto-caption", "All images already have a caption.")
             return
+        try:
+            resumed = len(missing.intersection(rp for rp, _, _ in app.db.get_caption_jobs()))
+        except Exception:
+            resumed = 0
         if not messagebox.askyesno(
             "Caption all missing",
             f"Generate captions for {len(targets)} image(s) without a caption?\n"
-            "This may take a while. You can keep working; click the button again to stop.",
+            + (f"{resumed} of them are left over from an unfinished earlier run.\n"
+               if resumed else "")
+            + "This may take a while. You can keep working; click the button again to stop.",
         ):
             return
 
@@ -626,40 +453,85 @@ class AutoCaptioner:
         ).start()
 
     def _batch_worker(self, settings: LLMSettings, targets: list[str]):
+        # The run is a job queue in the database (caption_jobs.py): it survives
+        # a restart, and transient failures are retried with backoff. Up to
+        # settings.max_concurrency requests are in flight; final results are
+        # counted here, so progress only moves forward.
+        from caption_jobs import EtaEstimator, run_caption_jobs
+        # Per-image failures are read back from the job table at the end;
+        # only run-level problems are collected here.
+        db = self.app.db
+        counts = {"done": 0, "errors": 0}
+        finished = False   # set once _batch_done is queued: later results are only saved
+        problems: list[str] = []
+        stats = BatchStats()
+        after = self.app.root.after
         total = len(targets)
-        done = 0
-        errors = 0
-        for rp in targets:
-            if self._batch_cancel:
-                break
-            image_path = self.app.db._abs(rp)
-            try:
-                caption = generate_caption(settings, image_path)
-            except Exception as exc:
-                errors += 1
-                self.app.root.after(0, self._batch_note_error, os.path.basename(image_path), str(exc))
+        try:
+            db.enqueue_caption_jobs(targets)
+            total = len(db.get_caption_jobs())
+        except Exception as exc:
+            problems.append(f"job queue: {exc}")
+        self._batch_eta = EtaEstimator(db)
+
+        def on_result(rp, image_path, caption, error):
+            # Runs on a request thread (or the asyncio loop): no DB reads here.
+            if error is not None:
+                if not finished:
+                    counts["errors"] += 1
             else:
-                self.app.root.after(0, self._persist_to_image, rp, image_path, caption, False)
-            done += 1
-            self.app.root.after(0, self._batch_progress, done, total)
-        self.app.root.after(0, self._batch_done, done, total, errors, self._batch_cancel)
+                after(0, self._persist_timed, stats, rp, image_path, caption)
+            if not finished:
+                counts["done"] += 1
+                after(0, self._batch_progress, counts["done"], total)
+
+        run = caption_many
+        extra = {"client": self.client(settings)}
+        if settings.batch_backend == "asyncio":
+            from caption_async import caption_many_async
+            run, extra = caption_many_async, {}
+        try:
+            cancelled = run_caption_jobs(
+                db, settings, run,
+                on_result=on_result,
+                should_stop=lambda: self._batch_cancel,
+                stats=stats,
+                **extra,
+            )
+        except Exception as exc:   # no model: nothing was sent
+            problems.append(f"all images: {exc}")
+            cancelled = True
+        finished = True
+        after(0, self._batch_done, counts["done"], total, counts["errors"], cancelled,
+              stats, problems)
+
+    def _persist_timed(self, stats: BatchStats, rel_path: str, image_path: str,
+                       caption: str):
+        t0 = time.perf_counter()
+        self._persist_to_image(rel_path, image_path, caption, False)
+        stats.add("persist", time.perf_counter() - t0)
 
     def _batch_progress(self, done: int, total: int):
         # Reuse the thumbnail progress widgets; override the label wording.
         self.app._set_thumb_progress(done, total)
         if done < total:
+            from caption_jobs import format_duration
+            # Queries the job table at most once per ETA_REFRESH, here on the
+            # Tk thread rather than in the result callback.
+            rate, left = (self._batch_eta.estimate(total - done)
+                          if self._batch_eta is not None else (None, None))
+            timing = (f", {rate:.2f}/s, ETA {format_duration(left)}"
+                      if rate and left is not None else "")
             self.app.thumb_progress_label.config(
-                text=f"Captioning {done}/{total} ({total - done} left)"
+                text=f"Captioning {done}/{total} ({total - done} left{timing})"
             )
 
-    def _batch_note_error(self, name: str, message: str):
-        # Keep a short rolling note in the label; full summary comes at the end.
-        self._batch_errors_detail.append(f"{name}: {message}")
-
-    def _batch_done(self, done: int, total: int, errors: int, cancelled: bool):
+    def _batch_done(self, done: int, total: int, errors: int, cancelled: bool,
+                    stats: BatchStats | None = None, problems: list[str] | None = None):
         self.app._set_thumb_progress(total, total)  # hide the bar/label
         self._busy = False
         self._batch_running = False
+        self._batch_eta = None
         if self.button is not None:
             self.button.config(state=NORMAL)
         if self.batch_button is not None:
@@ -669,17 +541,39 @@ class AutoCaptioner:
             f"{'Stopped. ' if cancelled else ''}Captioned {ok} image(s)"
             + (f", {errors} failed." if errors else ".")
         )
-        if self._batch_errors_detail:
-            summary += "\n\nFailures:\n" + "\n".join(self._batch_errors_detail[:10])
-            if len(self._batch_errors_detail) > 10:
-                summary += f"\n… and {len(self._batch_errors_detail) - 10} more."
-        self._batch_errors_detail = []
-        (messagebox.showwarning if errors else messagebox.showinfo)(
+        if stats is not None and stats.requests:
+            summary += f"\n\nTiming: {stats.summary()}"
+        try:
+            failures = [f"{os.path.basename(rp)}: {error}"
+                        for rp, error in self.app.db.get_caption_job_failures()]
+        except Exception as exc:
+            failures = [f"job queue: {exc}"]
+        details = (problems or []) + failures
+        failed = bool(details)
+        if failed:
+            summary += "\n\nFailures:\n" + "\n".join(details[:10])
+            if len(details) > 10:
+                summary += f"\n… and {len(details) - 10} more."
+            summary += ("\n\nFailed images stay in the job queue; "
+                        "Caption all tries them again.")
+        (messagebox.showwarning if failed else messagebox.showinfo)(
             "Auto-caption batch", summary
         )
 
-    def _on_error(self, message: str):
+    def _on_error(self, message: str, rel_path: str | None = None,
+                  image_path: str | None = None):
         self._set_busy(False)
+        original, self._stream_original = self._stream_original, None
+        if original is not None and rel_path is not None:
+            # A failed stream leaves partial text behind: put back what the
+            # editor held before (and on disk, if navigating away saved it).
+            app = self.app
+            if app.current_image == rel_path:
+                app.text_area.config(state=NORMAL)
+                app.text_area.delete("1.0", END)
+                app.text_area.insert("1.0", original)
+            else:
+                self._persist_to_image(rel_path, image_path, original, notify=False)
         messagebox.showerror("Auto-caption failed", message)
 
     def _set_busy(self, busy: bool):
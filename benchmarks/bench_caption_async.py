@@ -0,0 +1,91 @@
+"""
+bench_caption_async.py — "Caption all" threads backend vs asyncio backend.
+
+    python benchmarks/bench_caption_async.py --count 600 --levels 16,64,256
+
+Runs caption_many() (one thread per request slot) and caption_many_async()
+(one event loop) against stub_llm with --latency seconds per reply and
+enough server slots for every level, and reports captions/sec, the peak
+number of client threads (named caption*) and the requests the server saw at
+once. Then times how long Stop takes to return on the asyncio backend.
+"""
+
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from synth import make_images
+from stub_llm import start_stub
+
+from llm import LLMSettings, BatchStats, caption_many
+from caption_async import caption_many_async
+
+
+def client_threads() -> int:
+    return sum(t.name.startswith("caption") for t in threading.enumerate())
+
+
+def run(fn, settings: LLMSettings, paths: list[str], stop_after: float | None = None):
+    results = []
+    peak = [0]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.02):
+            peak[0] = max(peak[0], client_threads())
+
+    threading.Thread(target=sample, daemon=True).start()
+    stop = threading.Event()
+    if stop_after is not None:
+        threading.Timer(stop_after, stop.set).start()
+    t0 = time.perf_counter()
+    stopped = fn(settings, ((p, p) for p in paths),
+                 on_result=lambda key, path, caption, error: results.append(error or caption),
+                 should_stop=stop.is_set, stats=BatchStats())
+    wall = time.perf_counter() - t0
+    done.set()
+    errors = [r for r in results if isinstance(r, Exception)]
+    return wall, len(results), errors, peak[0], stopped
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--count", type=int, default=600)
+    ap.add_argument("--latency", type=float, default=0.5)
+    ap.add_argument("--levels", default="16,64,256")
+    args = ap.parse_args()
+    levels = [int(x) for x in args.levels.split(",")]
+
+    directory = tempfile.mkdtemp(prefix="async_bench_")
+    try:
+        paths = make_images(directory, 24, (256, 192), formats=("jpg",), captions=0)
+        paths = [paths[i % len(paths)] for i in range(args.count)]
+        server = start_stub(latency=args.latency, parallel=max(levels), words=20)
+        print(f"{args.count} images, stub latency {args.latency}s")
+        print(f"{'backend':>8} {'slots':>6} {'seconds':>8} {'capt/s':>8} "
+              f"{'threads':>8} {'server peak':>12} {'errors':>7}")
+        for level in levels:
+            for name, fn in (("threads", caption_many), ("asyncio", caption_many_async)):
+                server.peak = 0
+                settings = LLMSettings(base_url=server.base_url, model="stub",
+                                       max_concurrency=level)
+                wall, n, errors, threads, _ = run(fn, settings, paths)
+                print(f"{name:>8} {level:>6} {wall:>8.2f} {n / wall:>8.1f} "
+                      f"{threads:>8} {server.peak:>12} {len(errors):>7}")
+                time.sleep(args.latency)   # let cancelled / late stub replies drain
+
+        settings = LLMSettings(base_url=server.base_url, model="stub",
+                               max_concurrency=max(levels))
+        wall, n, _, _, stopped = run(caption_many_async, settings, paths,
+                                     stop_after=args.latency * 1.5)
+        print(f"asyncio stop after {args.latency * 1.5:.2f}s returned at {wall:.2f}s "
+              f"(stopped={stopped}, {n} results)")
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+bench_caption_batch.py — "Caption all" throughput vs max_concurrency.
+
+    python benchmarks/bench_caption_batch.py --count 24 --latency 0.5 --parallel 4
+
+Runs llm.caption_many() (the pipeline behind AutoCaptioner's batch
+run) against stub_llm with artificial latency, for several concurrency
+levels, and reports captions/sec, the peak number of requests the server saw
+at once and the per-stage timings. The "serial" row is the old loop: encode
+and request one image after the other on one thread. Then measures how long
+a stop request takes to return.
+
+Use ``--size`` / ``--format png`` to make encoding expensive enough to
+matter (PNG sources are re-encoded when --vision-format is png).
+"""
+
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from synth import make_images
+from stub_llm import start_stub
+
+from llm import LLMSettings, BatchStats, caption_many, generate_caption
+
+
+def run(settings: LLMSettings, paths: list[str], stop_after: float | None = None):
+    results = []
+    stats = BatchStats()
+    stop = threading.Event()
+    if stop_after is not None:
+        threading.Timer(stop_after, stop.set).start()
+    t0 = time.perf_counter()
+    stopped = caption_many(
+        settings, ((p, p) for p in paths),
+        on_result=lambda key, path, caption, error: results.append(error or caption),
+        should_stop=stop.is_set,
+        stats=stats,
+    )
+    return time.perf_counter() - t0, results, stopped, stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--count", type=int, default=24)
+    ap.add_argument("--latency", type=float, default=0.5)
+    ap.add_argument("--parallel", type=int, default=4)
+    ap.add_argument("--levels", default="1,2,4,8")
+    ap.add_argument("--size", type=int, default=512, help="image width (4:3)")
+    ap.add_argument("--format", default="jpg", choices=("jpg", "png", "webp"))
+    ap.add_argument("--vision-format", default="auto")
+    args = ap.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="caption_bench_")
+    try:
+        paths = make_images(directory, args.count, (args.size, args.size * 3 // 4),
+                            formats=(args.format,), captions=0)
+        server = start_stub(latency=args.latency, parallel=args.parallel)
+        print(f"{args.count} {args.format} images ({args.size}px), stub latency "
+              f"{args.latency}s, {args.parallel} server slots")
+        print(f"{'concurrency':>12} {'seconds':>9} {'captions/s':>11} {'peak':>6}  stages")
+
+        settings = LLMSettings(base_url=server.base_url, model="stub",
+                               vision_image_format=args.vision_format)
+        t0 = time.perf_counter()
+        for p in paths:
+            generate_caption(settings, p)
+        secs = time.perf_counter() - t0
+        print(f"{'serial':>12} {secs:>9.2f} {len(paths) / secs:>11.2f} {1:>6}")
+
+        for level in (int(x) for x in args.levels.split(",")):
+            settings = LLMSettings(base_url=server.base_url, model="stub",
+                                   max_concurrency=level,
+                                   vision_image_format=args.vision_format)
+            server.peak = 0
+            secs, results, _, stats = run(settings, paths)
+            errors = [r for r in results if isinstance(r, Exception)]
+            assert len(results) == len(paths) and not errors, errors[:1]
+            print(f"{level:>12} {secs:>9.2f} {len(paths) / secs:>11.2f} {server.peak:>6}  "
+                  f"{stats.summary()}")
+
+        settings = LLMSettings(base_url=server.base_url, model="stub",
+                               max_concurrency=args.parallel,
+                               vision_image_format=args.vision_format)
+        secs, results, stopped, _ = run(settings, paths, stop_after=args.latency * 1.5)
+        print(f"stop after {args.latency * 1.5:.2f}s returned at {secs:.2f}s "
+              f"(stopped={stopped}, {len(results)} results so far)")
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+bench_caption_jobs.py — Resumable "Caption all" job queue under failures.
+
+    python benchmarks/bench_caption_jobs.py --count 200 --fail-rate 0.2
+
+Queues every image of a synthetic folder as caption jobs, runs them with
+caption_jobs.run_caption_jobs() against stub_llm answering --fail-rate of
+the requests with HTTP 503, and kills the run (closes the database without
+stopping the worker cleanly) after --crash-after seconds. Then reopens the
+folder, resumes, and reports how many images were captioned before and after
+the "crash", how many retries happened, how many images were captioned
+twice (replies that landed after the database was gone: delivery is at
+least once) and how close the mid-run ETA came to the actual time.
+"""
+
+import argparse
+import collections
+import shutil
+import tempfile
+import threading
+import time
+
+from synth import make_images
+from stub_llm import start_stub
+
+import caption_jobs
+from llm import LLMSettings, LLMClient, caption_many
+from caption_jobs import EtaEstimator, run_caption_jobs
+from db import ImageDB
+
+
+def run(directory: str, settings: LLMSettings, captioned: collections.Counter,
+        stop_after: float | None):
+    db = ImageDB()
+    db.open(directory)
+    stop = threading.Event()
+    if stop_after is not None:
+        threading.Timer(stop_after, stop.set).start()
+    retries = []
+    eta = EtaEstimator(db)
+    total = len(db.get_caption_jobs())
+    done = [0]
+    guesses = []
+    t0 = time.perf_counter()
+
+    finished = threading.Event()
+
+    def on_result(rp, path, caption, error):
+        if error is None:
+            captioned[rp] += 1
+        done[0] += 1
+
+    def report():
+        # Like cli.py: the estimate reads the job table, so it is taken on a
+        # reporter thread, not in on_result. Sampled once half is done.
+        while not finished.wait(0.05):
+            if done[0] >= total // 2:
+                rate, left = eta.estimate(total - done[0])
+                if left is not None:
+                    guesses.append((time.perf_counter() - t0, left))
+                    return
+
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    client = LLMClient(settings)
+    try:
+        stopped = run_caption_jobs(db, settings, caption_many, on_result=on_result,
+                                   on_retry=lambda rp, e, d: retries.append(d),
+                                   should_stop=stop.is_set, client=client)
+    finally:
+        finished.set()
+        reporter.join()
+    wall = time.perf_counter() - t0
+    counts = db.get_caption_job_counts()
+    db.close()
+    client.close()
+    return stopped, wall, len(retries), counts, guesses
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--count", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--parallel", type=int, default=4)
+    ap.add_argument("--fail-rate", type=float, default=0.2)
+    ap.add_argument("--crash-after", type=float, default=1.0)
+    args = ap.parse_args()
+
+    caption_jobs.BACKOFF_BASE = 0.2   # keep the demo short
+    directory = tempfile.mkdtemp(prefix="jobs_bench_")
+    try:
+        paths = make_images(directory, args.count, (128, 96), formats=("jpg",),
+                            captions=0)
+        db = ImageDB()
+        db.open(directory)
+        rel_paths = db.sync(paths)
+        db.enqueue_caption_jobs(rel_paths)
+        db.close()
+
+        server = start_stub(latency=args.latency, parallel=args.parallel,
+                            words=10, fail_rate=args.fail_rate)
+        settings = LLMSettings(base_url=server.base_url, model="stub",
+                               max_concurrency=args.parallel)
+        captioned = collections.Counter()
+        print(f"{args.count} jobs, {args.parallel} slots, "
+              f"{args.fail_rate:.0%} of requests fail with 503")
+        for label, stop_after in (("first run", args.crash_after), ("resumed", None)):
+            stopped, wall, retries, counts, guesses = run(directory, settings,
+                                                          captioned, stop_after)
+            line = (f"{label:>10}: {wall:6.2f}s, stopped={stopped}, {retries} retries, "
+                    f"captioned so far {len(captioned)}, states {dict(counts)}")
+            if guesses:
+                at, left = guesses[0]
+                line += f"; ETA at half-way {left:.2f}s vs actual {wall - at:.2f}s"
+            print(line)
+        twice = sum(1 for n in captioned.values() if n > 1)
+        print(f"503s sent: {server.failures}; images captioned more than once: {twice}")
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+bench_caption_stream.py — Time to first visible text, streamed vs not.
+
+    python benchmarks/bench_caption_stream.py --latency 5 --words 60
+
+Generates captions through generate_caption() against stub_llm, whose
+replies take *latency* seconds in total. Without streaming nothing can be
+shown until the whole reply has arrived; with ``stream=True`` the first
+on_delta() callback (what "Auto-caption" pushes into the editor) fires after
+one word's worth of generation. Also checks both paths return the same
+caption text.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from synth import make_images
+from stub_llm import start_stub
+
+from llm import LLMClient, LLMSettings, generate_caption
+
+
+def run(settings: LLMSettings, client: LLMClient, path: str):
+    first = []
+    deltas = []
+    t0 = time.perf_counter()
+
+    def on_delta(text):
+        if not first:
+            first.append(time.perf_counter() - t0)
+        deltas.append(text)
+
+    caption = generate_caption(settings, path, client, on_delta=on_delta)
+    total = time.perf_counter() - t0
+    return (first[0] if settings.stream else total), total, len(deltas), caption
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--latency", type=float, default=3.0)
+    ap.add_argument("--words", type=int, default=60)
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="stream_bench_")
+    try:
+        path = make_images(directory, 1, (512, 384), formats=("jpg",), captions=0)[0]
+        server = start_stub(latency=args.latency, parallel=1, words=args.words)
+        print(f"reply of {args.words} words over {args.latency:.1f}s")
+        print(f"{'mode':>9} {'first text s':>13} {'complete s':>11} {'updates':>8}")
+        captions = {}
+        for stream in (False, True):
+            settings = LLMSettings(base_url=server.base_url, stream=stream)
+            client = LLMClient(settings)
+            for _ in range(args.runs):
+                first, total, updates, caption = run(settings, client, path)
+            client.close()
+            captions[stream] = caption.split()[5:]   # past "A stub caption number N."
+            label = "stream" if stream else "blocking"
+            print(f"{label:>9} {first:>13.3f} {total:>11.3f} {updates:>8}")
+        print("same text:", captions[False] == captions[True])
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
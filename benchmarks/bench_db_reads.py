@@ -0,0 +1,107 @@
+"""
+bench_db_reads.py — Scroll-time read latency while the DB is being written.
+
+    python benchmarks/bench_db_reads.py --rows 20000 --seconds 5
+
+Measures ImageDB.get_visible_rows_bulk() for a window of rows (what
+ThumbnailView._sync_visible asks for on every scroll step) first on an idle
+database, then while background threads stream thumbnails (ThumbWorker) and
+caption updates (batch captioning) through the writer. Each thread reads on
+its own connection, so the two latency distributions should match.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+from db import ImageDB
+
+
+def measure(db: ImageDB, rows: int, window: int, seconds: float) -> list[float]:
+    rnd = random.Random(1)
+    paths = [f"img_{i:07d}.jpg" for i in range(rows)]
+    samples = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = rnd.randrange(0, rows - window)
+        t0 = time.perf_counter()
+        db.get_visible_rows_bulk(paths[start:start + window])
+        samples.append((time.perf_counter() - t0) * 1000)
+        time.sleep(0.005)
+    return samples
+
+
+def report(label: str, samples: list[float]):
+    samples.sort()
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:>22} {len(samples):>7} {statistics.median(samples):>8.2f} "
+          f"{p99:>8.2f} {samples[-1]:>8.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--window", type=int, default=64)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="read_bench_")
+    try:
+        db = ImageDB()
+        db.open(directory)
+        thumb = os.urandom(6 * 1024)
+        db._conn.executemany(
+            "INSERT INTO images (id, rel_path, mtime, has_caption, caption_text, "
+            "cap_size) VALUES (?, ?, 0, 1, 'caption', -1)",
+            [(i + 1, f"img_{i:07d}.jpg") for i in range(args.rows)])
+        db._conn.executemany(
+            "INSERT INTO thumbs (image_id, data) VALUES (?, ?)",
+            [(i + 1, thumb) for i in range(args.rows)])
+        db._conn.commit()
+
+        print(f"{args.rows} rows, window of {args.window}")
+        print(f"{'':>22} {'reads':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        report("idle", measure(db, args.rows, args.window, args.seconds))
+
+        stop = threading.Event()
+        written = [0, 0]
+
+        def thumbs():
+            rnd = random.Random(2)
+            while not stop.is_set():
+                db.set_thumb(f"img_{rnd.randrange(args.rows):07d}.jpg", thumb)
+                written[0] += 1
+                time.sleep(0.0005)
+
+        def captions():
+            rnd = random.Random(3)
+            while not stop.is_set():
+                db.update_caption(f"img_{rnd.randrange(args.rows):07d}.jpg",
+                                  "new caption " * rnd.randint(1, 20), wait=False)
+                written[1] += 1
+                time.sleep(0.002)
+
+        workers = [threading.Thread(target=f, daemon=True) for f in (thumbs, captions)]
+        for t in workers:
+            t.start()
+        loaded = measure(db, args.rows, args.window, args.seconds)
+        stop.set()
+        for t in workers:
+            t.join()
+        report("thumbs + captions", loaded)
+        print(f"(background: {written[0]} thumbs, {written[1]} captions written; "
+              f"{db._writer.commits} commits)")
+        db.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
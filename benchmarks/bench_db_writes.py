@@ -0,0 +1,99 @@
+"""
+bench_db_writes.py — ImageDB.set_thumb() throughput and read latency under load.
+
+    python benchmarks/bench_db_writes.py --rows 5000 --thumb-kb 6
+
+Modes:
+    legacy        rollback journal, one commit per set_thumb (old behaviour)
+    wal           WAL + synchronous=NORMAL, one commit per set_thumb
+    write-behind  WAL + single writer thread batching commits (default)
+
+For each mode a writer thread stores one thumbnail per row (like
+ThumbWorker) while the main thread keeps issuing get_by_rel() reads (like
+the UI); reports thumbs/sec until everything is committed and the read
+latency percentiles seen during the run.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+from db import ImageDB
+
+MODES = ("legacy", "wal", "write-behind")
+
+
+def open_db(directory: str, mode: str, rows: int) -> ImageDB:
+    db = ImageDB(write_behind=(mode == "write-behind"))
+    db.open(directory)
+    if mode == "legacy":
+        db._conn.execute("PRAGMA journal_mode=DELETE")
+        db._conn.execute("PRAGMA synchronous=FULL")
+    db._conn.executemany(
+        "INSERT INTO images (rel_path, mtime, has_caption, caption_text, cap_size) "
+        "VALUES (?, 0, 1, 'caption', -1)",
+        [(f"img_{i:07d}.jpg",) for i in range(rows)])
+    db._conn.commit()
+    return db
+
+
+def run(mode: str, rows: int, thumb_kb: int) -> tuple[float, list[float]]:
+    directory = tempfile.mkdtemp(prefix="write_bench_")
+    try:
+        db = open_db(directory, mode, rows)
+        payloads = [os.urandom(thumb_kb * 1024) for _ in range(16)]
+        done = threading.Event()
+
+        def writer():
+            for i in range(rows):
+                db.set_thumb(f"img_{i:07d}.jpg", payloads[i % len(payloads)])
+            db.flush()
+            done.set()
+
+        latencies = []
+        t0 = time.perf_counter()
+        threading.Thread(target=writer, daemon=True).start()
+        i = 0
+        while not done.is_set():
+            r0 = time.perf_counter()
+            db.get_by_rel(f"img_{i % rows:07d}.jpg")
+            latencies.append((time.perf_counter() - r0) * 1000)
+            i += 1
+            time.sleep(0.002)
+        elapsed = time.perf_counter() - t0
+        missing = db._conn.execute(
+            "SELECT COUNT(*) FROM images WHERE NOT EXISTS "
+            "(SELECT 1 FROM thumbs WHERE image_id = images.id)").fetchone()[0]
+        assert missing == 0, f"{missing} thumbs not committed"
+        db.close()
+        return rows / elapsed, latencies
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--thumb-kb", type=int, default=6)
+    ap.add_argument("--modes", default=",".join(MODES))
+    args = ap.parse_args()
+
+    print(f"{args.rows} thumbs of {args.thumb_kb} KB")
+    print(f"{'mode':>13} {'thumbs/s':>10} {'read p50 ms':>12} {'read p99 ms':>12} "
+          f"{'read max ms':>12}")
+    for mode in args.modes.split(","):
+        rate, lat = run(mode, args.rows, args.thumb_kb)
+        lat.sort()
+        p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+        print(f"{mode:>13} {rate:>10.0f} {statistics.median(lat):>12.2f} "
+              f"{p99:>12.2f} {lat[-1]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+bench_decode.py — Thumbnail decode time and peak RSS per format and policy.
+
+    python benchmarks/bench_decode.py --width 6000 --height 4000
+
+Each (format, policy) pair runs in a fresh interpreter so the reported peak
+RSS (``VmHWM`` / ``ru_maxrss``) belongs to that pair alone. ``baseline`` is
+the original ``img.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)`` call
+(Pillow's default ``reducing_gap=2.0``, so ``balanced`` should match it);
+``no_reduce`` turns that reduction off (see ``db.THUMB_POLICIES``).
+``draft1`` is the dropped fast path for reference: an explicit
+``draft("RGB", (THUMB_SIZE, THUMB_SIZE))`` plus ``reducing_gap=1.0``.
+"""
+
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synth import FORMATS, make_image
+
+from PIL import Image
+
+from db import THUMB_POLICIES, THUMB_SIZE, _generate_thumb
+
+BASELINE = "baseline"
+DRAFT1 = "draft1"
+
+
+def _draft1_thumb(abs_path: str) -> bytes | None:
+    """Smallest JPEG draft that still covers the target, then reduce to ~1x."""
+    try:
+        with Image.open(abs_path) as img:
+            img.draft("RGB", (THUMB_SIZE, THUMB_SIZE))
+            img.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS, reducing_gap=1.0)
+            buf = io.BytesIO()
+            img.convert("RGB").save(buf, "JPEG", quality=80)
+            return buf.getvalue()
+    except Exception:
+        return None
+
+
+def _baseline_thumb(abs_path: str) -> bytes | None:
+    """The thumbnail call as it was before THUMB_POLICIES existed."""
+    try:
+        img = Image.open(abs_path)
+        img.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, "JPEG", quality=80)
+        return buf.getvalue()
+    except Exception:
+        return None
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM is per address space, so unlike ru_maxrss (kept across execve on
+    # Linux) it does not inherit the parent's peak.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:          # Windows
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def child(path: str, policy: str, repeat: int):
+    base = _peak_rss_mb()
+    generate = {BASELINE: lambda p, _: _baseline_thumb(p),
+                DRAFT1: lambda p, _: _draft1_thumb(p)}.get(policy, _generate_thumb)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        if generate(path, policy) is None:
+            raise SystemExit(f"decode failed: {path}")
+    ms = (time.perf_counter() - t0) * 1000 / repeat
+    print(f"{ms:.2f} {_peak_rss_mb():.1f} {base:.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--width", type=int, default=6000)
+    ap.add_argument("--height", type=int, default=4000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--child", nargs=2, metavar=("PATH", "POLICY"),
+                    help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.repeat)
+        return
+
+    directory = tempfile.mkdtemp(prefix="decode_bench_")
+    try:
+        img = make_image((args.width, args.height))
+        print(f"{args.width}x{args.height}, mean of {args.repeat} decodes per cell")
+        print(f"{'format':>6} {'policy':>9} {'ms/thumb':>9} {'peak RSS MB':>12} {'(idle MB)':>10}")
+        for ext, fmt in FORMATS.items():
+            path = os.path.join(directory, f"src.{ext}")
+            img.save(path, fmt, quality=90)
+            for policy in (BASELINE, *THUMB_POLICIES, DRAFT1):
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--repeat",
+                     str(args.repeat), "--child", path, policy],
+                    capture_output=True, text=True, check=True,
+                ).stdout.split()
+                ms, peak, base = (float(x) for x in out)
+                print(f"{ext:>6} {policy:>9} {ms:>9.1f} {peak:>12.1f} {base:>10.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+bench_dedupe.py — Near-duplicate grouping time vs collection size.
+
+    python benchmarks/bench_dedupe.py --rows 10000,100000 --distance 4
+
+Uses random 64-bit hashes with every 20th one a few-bit variant of its
+neighbour (a near-duplicate), builds dedupe.HashIndex and times groups().
+The pairwise column extrapolates an all-pairs comparison from a sample.
+"""
+
+import argparse
+import random
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+from dedupe import HashIndex, DUP_DISTANCE
+
+
+def make_hashes(rows: int, distance: int) -> dict[str, int]:
+    rnd = random.Random(4)
+    hashes = {}
+    prev = 0
+    for i in range(rows):
+        if i % 20 == 1:
+            h = prev
+            for _ in range(rnd.randint(0, distance)):
+                h ^= 1 << rnd.randrange(64)
+        else:
+            h = rnd.getrandbits(64)
+        hashes[f"img_{i:07d}.jpg"] = prev = h
+    return hashes
+
+
+def pairwise_estimate(values: list[int], distance: int) -> float:
+    sample = values[:2000]
+    t0 = time.perf_counter()
+    for i, a in enumerate(sample):
+        for b in sample[:i]:
+            (a ^ b).bit_count() <= distance
+    per_pair = (time.perf_counter() - t0) / (len(sample) * (len(sample) - 1) / 2)
+    return per_pair * len(values) * (len(values) - 1) / 2
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", default="10000,100000")
+    ap.add_argument("--distance", type=int, default=DUP_DISTANCE)
+    args = ap.parse_args()
+
+    print(f"distance <= {args.distance} bits")
+    print(f"{'rows':>8} {'build s':>9} {'groups s':>9} {'groups':>8} {'pairwise s':>11}")
+    for rows in (int(x) for x in args.rows.split(",")):
+        hashes = make_hashes(rows, args.distance)
+        t0 = time.perf_counter()
+        index = HashIndex(hashes.items(), args.distance)
+        t1 = time.perf_counter()
+        groups = index.groups()
+        t2 = time.perf_counter()
+        est = pairwise_estimate(list(hashes.values()), args.distance)
+        print(f"{rows:>8} {t1 - t0:>9.2f} {t2 - t1:>9.2f} {len(groups):>8} {est:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
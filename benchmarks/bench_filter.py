@@ -0,0 +1,93 @@
+"""
+bench_filter.py — ImageDB.get_all() filter latency: LIKE vs FTS5.
+
+    python benchmarks/bench_filter.py --rows 10000,100000,1000000
+
+Fills a fresh database with synthetic captions (the FTS index is populated by
+the same triggers the app uses) and reports the median latency of a few
+typical queries in ``substring`` and ``fts`` mode.
+"""
+
+import argparse
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+from db import ImageDB
+
+WORDS = (
+    "portrait landscape woman man dog cat car street night city forest river "
+    "mountain sunset beach red blue green golden soft dramatic lighting close "
+    "up wide angle photo painting illustration anime style detailed background "
+    "smiling standing sitting walking holding wearing dress jacket hat glasses"
+).split()
+RARE = ["zebra", "lighthouse", "saxophone", "origami", "volcano"]
+
+QUERIES = ["lighthouse", "light", "red car", '"golden hour"', "cat OR dog",
+           "zebra NOT night"]
+
+
+def fill(db: ImageDB, rows: int):
+    rnd = random.Random(42)
+    batch = []
+    for i in range(rows):
+        words = rnd.choices(WORDS, k=rnd.randint(12, 40))
+        if rnd.random() < 0.001:
+            words.append(rnd.choice(RARE))
+        if rnd.random() < 0.01:
+            words += ["golden", "hour"]
+        batch.append((f"set_{i // 1000:04d}/img_{i:07d}.png", " ".join(words)))
+        if len(batch) == 50_000:
+            _insert(db, batch)
+            batch = []
+    _insert(db, batch)
+
+
+def _insert(db: ImageDB, batch):
+    db._conn.executemany(
+        "INSERT INTO images (rel_path, mtime, has_caption, caption_text, cap_size) "
+        "VALUES (?, 0, 1, ?, -1)", batch)
+    db._conn.commit()
+
+
+def timed(db: ImageDB, query: str, mode: str, repeat: int) -> tuple[float, int]:
+    samples, n = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = len(db.get_all(query, mode=mode))
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), n
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", default="10000,100000,1000000")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    for rows in (int(x) for x in args.rows.split(",")):
+        directory = tempfile.mkdtemp(prefix="filter_bench_")
+        try:
+            db = ImageDB()
+            db.open(directory)
+            if not db.has_fts:
+                raise SystemExit("this SQLite build has no FTS5")
+            t0 = time.perf_counter()
+            fill(db, rows)
+            print(f"\n{rows} rows (filled + indexed in {time.perf_counter() - t0:.1f}s)")
+            print(f"{'query':>18} {'LIKE ms':>9} {'hits':>8} {'FTS ms':>9} {'hits':>8}")
+            for q in QUERIES:
+                like_ms, like_n = timed(db, q, "substring", args.repeat)
+                fts_ms, fts_n = timed(db, q, "fts", args.repeat)
+                print(f"{q:>18} {like_ms:>9.1f} {like_n:>8} {fts_ms:>9.1f} {fts_n:>8}")
+            db.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_folder_load.py — Time until a folder is browsable: blocking vs progressive load.
+
+    python benchmarks/bench_folder_load.py --files 100000 --dirs 400 --listing-delay 0.005
+
+Builds the same synthetic tree as bench_scan.py and opens it twice per
+database state (fresh ``thumbs.sqlite``, then already synced):
+
+    blocking     scan_directory() + ImageDB.sync() — the window showed
+                 nothing until both had finished
+    progressive  folder_loader.FolderLoader, callbacks pumped from a queue
+                 as the Tk mainloop would; reports the first chunk
+                 (first images browsable), the number of chunks and the end
+
+``--listing-delay`` adds a sleep to every directory listing to stand in for
+a network share.
+"""
+
+import argparse
+import queue
+import shutil
+import tempfile
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+import scanner
+from bench_scan import build_tree, fresh_db
+from db import ImageDB
+from folder_loader import FolderLoader
+
+
+def blocking(root: str, db: ImageDB) -> tuple[int, float]:
+    t0 = time.perf_counter()
+    scan = scanner.scan_directory(root)
+    db.open(root)
+    n = len(db.sync(scan.images))
+    return n, time.perf_counter() - t0
+
+
+def progressive(root: str, db: ImageDB) -> tuple[int, float, int, float]:
+    """(images, first chunk s, chunks, done s)."""
+    events: queue.Queue = queue.Queue()
+    first = [None]
+    chunks = [0]
+    done = []
+
+    def on_chunk(rel_paths, lengths):
+        chunks[0] += 1
+        if first[0] is None:
+            first[0] = time.perf_counter() - t0
+
+    loader = FolderLoader(db, post=lambda fn, *a: events.put((fn, a)),
+                          on_chunk=on_chunk,
+                          on_done=lambda dirs, rps, complete: done.append(rps),
+                          on_error=lambda exc: done.append(exc))
+    t0 = time.perf_counter()
+    loader.start(root)
+    while not done:
+        fn, args = events.get()
+        fn(*args)
+    if isinstance(done[0], Exception):
+        raise done[0]
+    return len(done[0]), first[0] or 0.0, chunks[0], time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--files", type=int, default=50000)
+    ap.add_argument("--dirs", type=int, default=200)
+    ap.add_argument("--listing-delay", type=float, default=0.0,
+                    help="seconds added to every directory listing")
+    args = ap.parse_args()
+
+    if args.listing_delay:
+        scan_one = scanner._scan_one
+
+        def slow_scan_one(path):
+            time.sleep(args.listing_delay)
+            return scan_one(path)
+
+        scanner._scan_one = slow_scan_one
+
+    root = tempfile.mkdtemp(prefix="load_bench_")
+    try:
+        print(f"building {args.files} files in {args.dirs} folders under {root}")
+        build_tree(root, args.files, args.dirs)
+        print(f"{'db':>6} {'path':>12} {'images':>7} {'browsable s':>12} "
+              f"{'chunks':>7} {'done s':>7}")
+        for state in ("fresh", "synced"):
+            if state == "fresh":
+                fresh_db(root).close()
+            db = ImageDB()
+            n, secs = blocking(root, db)
+            db.close()
+            print(f"{state:>6} {'blocking':>12} {n:>7} {secs:>12.2f} {1:>7} {secs:>7.2f}")
+            if state == "fresh":
+                fresh_db(root).close()
+            db = ImageDB()
+            n, first, chunks, secs = progressive(root, db)
+            db.close()
+            print(f"{state:>6} {'progressive':>12} {n:>7} {first:>12.2f} "
+                  f"{chunks:>7} {secs:>7.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
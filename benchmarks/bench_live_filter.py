@@ -0,0 +1,94 @@
+"""
+bench_live_filter.py — Keystroke-to-result latency of LiveFilter.
+
+    python benchmarks/bench_live_filter.py --rows 100000
+
+Fills a database with synthetic captions, then "types" each query one
+character at a time (``--interval`` ms between keys) through LiveFilter, the
+way the filter box does. Reports, per query, the latency from the last
+keystroke to the delivered result and how many evaluations actually ran.
+The debounce timer runs on threading.Timer and results are delivered on the
+worker thread — there is no Tk mainloop here, so Treeview rebuild time is not
+included.
+"""
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+from bench_filter import fill
+from db import ImageDB
+from live_filter import FILTER_DEBOUNCE_MS, FilterSpec, LiveFilter
+
+QUERIES = ["lighthouse", "red car", "golden hour", "portrait woman"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--interval", type=int, default=80, help="ms between keys")
+    ap.add_argument("--debounce", type=int, default=FILTER_DEBOUNCE_MS)
+    ap.add_argument("--mode", default="auto", choices=("auto", "substring"))
+    args = ap.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="live_filter_bench_")
+    try:
+        db = ImageDB()
+        db.open(directory)
+        fill(db, args.rows)
+        all_files = [r["rel_path"] for r in db.get_all()]
+
+        done = threading.Event()
+        state = {"result": None, "runs": 0}
+
+        def after(ms, fn, *a):
+            t = threading.Timer(ms / 1000, fn, a)
+            t.daemon = True
+            t.start()
+            return t
+
+        def on_result(spec, rel_paths):
+            state["result"] = (spec, len(rel_paths), time.perf_counter())
+            done.set()
+
+        lf = LiveFilter(db, after=after, after_cancel=lambda t: t.cancel(),
+                        post=lambda fn, *a: fn(*a), on_result=on_result,
+                        debounce_ms=args.debounce)
+        get_all = db.get_all
+
+        def counting_get_all(*a, **kw):   # one call per evaluated query
+            state["runs"] += 1
+            return get_all(*a, **kw)
+
+        db.get_all = counting_get_all
+
+        print(f"{args.rows} rows, {args.interval} ms/key, debounce {args.debounce} ms, mode {args.mode}")
+        print(f"{'query':>16} {'keys':>5} {'runs':>5} {'latency ms':>11} {'hits':>7}")
+        latencies = []
+        for q in QUERIES:
+            done.clear()
+            state["runs"] = 0
+            for i in range(1, len(q) + 1):
+                last_key = time.perf_counter()
+                lf.submit(FilterSpec(text=q[:i], mode=args.mode), all_files)
+                time.sleep(args.interval / 1000)
+            done.wait(30)
+            spec, hits, t_done = state["result"]
+            assert spec.text == q, spec
+            ms = (t_done - last_key) * 1000
+            latencies.append(ms)
+            print(f"{q:>16} {len(q):>5} {state['runs']:>5} {ms:>11.1f} {hits:>7}")
+        print(f"median keystroke-to-result: {statistics.median(latencies):.1f} ms "
+              f"(includes the {args.debounce} ms debounce)")
+        db.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
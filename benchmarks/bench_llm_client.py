@@ -0,0 +1,81 @@
+"""
+bench_llm_client.py — Per-image LLM latency with and without a shared client.
+
+    python benchmarks/bench_llm_client.py --count 30 --connect-delay 0.05
+
+Captions the same images through generate_caption() against stub_llm with a
+blank model name, twice: once with a fresh client per image (what every call
+used to do: new connection, plus a /models round trip to detect the model)
+and once with one LLMClient reused for the whole run. ``--connect-delay``
+stands in for the TCP + TLS handshake of a remote endpoint. Then runs
+caption_many() with several request slots to show the connection count
+stays at the slot count.
+"""
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+from synth import make_images
+from stub_llm import start_stub
+
+from llm import LLMClient, LLMSettings, caption_many, generate_caption
+
+
+def run(server, settings: LLMSettings, paths: list[str], shared: bool):
+    server.connections = server.model_lists = 0
+    client = LLMClient(settings) if shared else None
+    samples = []
+    for p in paths:
+        t0 = time.perf_counter()
+        generate_caption(settings, p, client)
+        samples.append((time.perf_counter() - t0) * 1000)
+    if client is not None:
+        client.close()
+    return samples, server.connections, server.model_lists
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--count", type=int, default=30)
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--connect-delay", type=float, default=0.05)
+    ap.add_argument("--parallel", type=int, default=4)
+    args = ap.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="client_bench_")
+    try:
+        paths = make_images(directory, args.count, (256, 192), formats=("jpg",),
+                            captions=0)
+        server = start_stub(latency=args.latency, parallel=args.parallel,
+                            connect_delay=args.connect_delay)
+        settings = LLMSettings(base_url=server.base_url, model="")
+        generate_caption(settings, paths[0])   # warm the payload cache
+
+        print(f"{args.count} images, latency {args.latency * 1000:.0f} ms, "
+              f"connect {args.connect_delay * 1000:.0f} ms")
+        print(f"{'client':>10} {'p50 ms':>8} {'mean ms':>8} {'conns':>6} {'/models':>8}")
+        for label, shared in (("per image", False), ("shared", True)):
+            samples, conns, lists = run(server, settings, paths, shared)
+            print(f"{label:>10} {statistics.median(samples):>8.1f} "
+                  f"{statistics.fmean(samples):>8.1f} {conns:>6} {lists:>8}")
+
+        settings.max_concurrency = args.parallel
+        server.connections = server.model_lists = 0
+        client = LLMClient(settings)
+        t0 = time.perf_counter()
+        caption_many(settings, ((p, p) for p in paths * 2),
+                     on_result=lambda *a: None, client=client)
+        wall = time.perf_counter() - t0
+        client.close()
+        print(f"caption_many x{args.parallel}: {len(paths) * 2} images in {wall:.2f}s, "
+              f"{server.connections} connections, {server.model_lists} /models call(s)")
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
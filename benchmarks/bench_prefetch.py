@@ -0,0 +1,98 @@
+"""
+bench_prefetch.py — Tk-thread cost per navigation step with and without prefetch.
+
+    python benchmarks/bench_prefetch.py --count 40 --size 4000x3000 --repeat-ms 33
+
+Simulates holding the arrow key through a folder of large PNGs: one step
+every ``--repeat-ms`` (keyboard auto-repeat), forward through half the
+folder, back a quarter, then forward again. For every step it times what
+display_image does on the Tk thread before the image can be shown:
+
+    direct     Image.open + LANCZOS scale_to_fit of the full image
+    prefetch   ImagePrefetcher.get(); on a miss the same decode + put(),
+               then update() to queue the neighbours
+
+and prints p50 / p95 / max step cost plus the prefetcher's hit rate.
+"""
+
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+from synth import make_images
+
+from PIL import Image
+
+from prefetch import ImagePrefetcher, scale_to_fit
+
+
+def walk(count: int) -> list[int]:
+    """Indices visited: forward half, back a quarter, forward to the end."""
+    fwd = count // 2
+    back = count // 4
+    return (list(range(fwd)) + list(range(fwd - 2, fwd - back - 1, -1))
+            + list(range(fwd - back, count)))
+
+
+def run(paths, steps, box, repeat: float, prefetcher: ImagePrefetcher | None):
+    samples = []
+    for i in steps:
+        t_step = time.perf_counter()
+        path = paths[i]
+        scaled = prefetcher.get(path, box) if prefetcher else None
+        if scaled is None:
+            with Image.open(path) as img:
+                scaled = scale_to_fit(img, box)
+            if prefetcher:
+                prefetcher.put(path, box, scaled)
+        if prefetcher:
+            prefetcher.update(i, len(paths), paths.__getitem__, box)
+        cost = time.perf_counter() - t_step
+        samples.append(cost * 1000)
+        time.sleep(max(0.0, repeat - cost))   # the rest of the key-repeat interval
+    return samples
+
+
+def describe(samples) -> str:
+    q = statistics.quantiles(samples, n=20)
+    return (f"p50 {statistics.median(samples):7.1f}  p95 {q[18]:7.1f}  "
+            f"max {max(samples):7.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--count", type=int, default=40)
+    ap.add_argument("--size", default="4000x3000")
+    ap.add_argument("--box", default="1600x1000", help="image_label size")
+    ap.add_argument("--repeat-ms", type=float, default=33.0)
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+    size = tuple(int(v) for v in args.size.split("x"))
+    box = tuple(int(v) for v in args.box.split("x"))
+
+    directory = tempfile.mkdtemp(prefix="prefetch_bench_")
+    try:
+        paths = make_images(directory, args.count, size, formats=("png",), captions=0)
+        steps = walk(len(paths))
+        repeat = args.repeat_ms / 1000
+        print(f"{len(steps)} steps over {len(paths)} {args.size} PNGs, box {args.box}, "
+              f"one step per {args.repeat_ms:g} ms")
+        t0 = time.perf_counter()
+        direct = run(paths, steps, box, repeat, None)
+        print(f"{'direct':>9}: {describe(direct)}  "
+              f"({time.perf_counter() - t0:.1f} s)")
+        prefetcher = ImagePrefetcher(workers=args.workers)
+        t0 = time.perf_counter()
+        fetched = run(paths, steps, box, repeat, prefetcher)
+        print(f"{'prefetch':>9}: {describe(fetched)}  "
+              f"({time.perf_counter() - t0:.1f} s)")
+        print(f"           {prefetcher.stats.summary()}")
+        prefetcher.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+bench_scan.py — Folder open: os.walk + per-file stat vs scanner.scan_directory.
+
+    python benchmarks/bench_scan.py --files 100000 --dirs 200
+
+Creates a synthetic tree of empty image files (half with ``.txt`` sidecars)
+and times, against a fresh ``thumbs.sqlite`` each time:
+
+    legacy   os.walk, then ImageDB.sync(paths) stat-ing every file and
+             probing its sidecar, then update_all_captions() (as before)
+    scan/N   scan_directory(workers=N), then ImageDB.sync(entries)
+
+Local disks hide most of the difference; point ``--dir`` at a network share
+to see the effect of parallel listing.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+from db import ImageDB, DB_FILENAME
+from scanner import IMAGE_EXTS, scan_directory
+
+
+def build_tree(root: str, files: int, dirs: int):
+    per_dir = max(1, files // dirs)
+    n = 0
+    for d in range(dirs):
+        sub = os.path.join(root, f"set_{d // 20:03d}", f"part_{d:04d}")
+        os.makedirs(sub, exist_ok=True)
+        for i in range(per_dir):
+            if n >= files:
+                return
+            stem = os.path.join(sub, f"img_{i:05d}")
+            open(stem + IMAGE_EXTS[i % len(IMAGE_EXTS)], "wb").close()
+            if i % 2 == 0:
+                with open(stem + ".txt", "w", encoding="utf-8") as f:
+                    f.write(f"caption {n}")
+            n += 1
+
+
+def fresh_db(root: str) -> ImageDB:
+    path = os.path.join(root, DB_FILENAME)
+    if os.path.exists(path):
+        os.remove(path)
+    db = ImageDB()
+    db.open(root)
+    return db
+
+
+def legacy(root: str) -> tuple[int, float, float]:
+    t0 = time.perf_counter()
+    found = []
+    for d, _, names in os.walk(root):
+        for f in names:
+            if f.lower().endswith(IMAGE_EXTS):
+                found.append(os.path.join(d, f))
+    found.sort()
+    t1 = time.perf_counter()
+    db = fresh_db(root)
+    rps = db.sync(found)
+    db.update_all_captions(rps)
+    t2 = time.perf_counter()
+    db.close()
+    return len(found), t1 - t0, t2 - t0
+
+
+def scanned(root: str, workers: int) -> tuple[int, float, float]:
+    t0 = time.perf_counter()
+    result = scan_directory(root, workers=workers)
+    t1 = time.perf_counter()
+    db = fresh_db(root)
+    db.sync(result.images)
+    t2 = time.perf_counter()
+    db.close()
+    return len(result.images), t1 - t0, t2 - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--files", type=int, default=100_000)
+    ap.add_argument("--dirs", type=int, default=200)
+    ap.add_argument("--workers", default="1,8")
+    ap.add_argument("--dir", help="existing tree to scan (nothing is created)")
+    args = ap.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix="scan_bench_")
+    try:
+        if not args.dir:
+            print(f"building {args.files} files in {args.dirs} folders under {root}")
+            build_tree(root, args.files, args.dirs)
+        print(f"{'path':>10} {'images':>8} {'scan s':>8} {'total s':>8}")
+        n, scan_s, total_s = legacy(root)
+        print(f"{'legacy':>10} {n:>8} {scan_s:>8.2f} {total_s:>8.2f}")
+        for w in (int(x) for x in args.workers.split(",")):
+            n, scan_s, total_s = scanned(root, w)
+            print(f"{'scan/' + str(w):>10} {n:>8} {scan_s:>8.2f} {total_s:>8.2f}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+bench_startup.py — Import time of main.py and time to the first painted window.
+
+    python benchmarks/bench_startup.py --runs 5
+
+Runs ``python -X importtime -c "import main"`` in fresh interpreters and
+reports the median cumulative import time of main plus its most expensive
+direct imports, then the cost of the optional modules main.py now loads on
+first use (deep_translator, watchdog, tkinterdnd2, ...).
+
+With a display, it also starts ``main.py`` with IMAGE_CAPTION_STARTUP_TRACE=1,
+which prints a ``first-paint <unix time>`` line on stderr once the empty
+window has been drawn (before the folder prompt), and reports process start
+to first paint. Without a display that part is skipped.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from synth import ROOT
+
+DEFERRED = ("deep_translator", "watchdog.observers", "tkinterdnd2",
+            "idlelib.tooltip", "PIL.ImageTk", "auto_caption")
+
+
+def importtime(statement: str) -> list[tuple[int, int, str]]:
+    """(depth, cumulative µs, module) rows of one ``-X importtime`` run."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode:
+        raise SystemExit(f"{statement!r} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, int(cumulative), name.strip()))
+    return rows
+
+
+def module_ms(rows, module: str) -> float:
+    return next((c for _, c, n in rows if n == module), 0) / 1000
+
+
+def first_paint(timeout: float) -> float | None:
+    """Seconds from spawning main.py to its first painted window."""
+    env = dict(os.environ, IMAGE_CAPTION_STARTUP_TRACE="1")
+    t0 = time.time()
+    proc = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env,
+                            stderr=subprocess.PIPE, text=True)
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            line = proc.stderr.readline()
+            if not line:
+                return None   # exited without painting
+            if line.startswith("first-paint "):
+                return float(line.split()[1]) - t0
+        return None
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=8, help="direct imports to list")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    args = ap.parse_args()
+
+    importtime("import main")   # warm the .pyc cache
+    runs = [importtime("import main") for _ in range(args.runs)]
+    totals = [module_ms(rows, "main") for rows in runs]
+    print(f"import main: median {statistics.median(totals):.1f} ms "
+          f"(min {min(totals):.1f}, {args.runs} runs)")
+
+    # Direct imports of main (depth 1 under it), by median cumulative time.
+    # (-X importtime lists a module's imports just before the module itself.)
+    direct: dict[str, list[float]] = {}
+    for rows in runs:
+        block = []
+        for depth, cumulative, name in rows:
+            if depth:
+                block.append((depth, cumulative, name))
+                continue
+            if name == "main":
+                for d, c, n in block:
+                    if d == 1:
+                        direct.setdefault(n, []).append(c / 1000)
+            block = []
+    ranked = sorted(direct.items(), key=lambda kv: -statistics.median(kv[1]))
+    print(f"{'module':>24} {'ms':>7}")
+    for name, samples in ranked[:args.top]:
+        print(f"{name:>24} {statistics.median(samples):>7.1f}")
+
+    print("\ndeferred to first use:")
+    loaded = {name for rows in runs for _, _, name in rows}
+    for module in DEFERRED:
+        ms = statistics.median(module_ms(importtime(f"import {module}"), module)
+                               for _ in range(max(1, args.runs // 2)))
+        state = "loaded at startup!" if module in loaded else "not loaded at startup"
+        print(f"{module:>24} {ms:>7.1f}  {state}")
+
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        print("\nfirst paint: skipped (no DISPLAY)")
+        return
+    samples = [s for s in (first_paint(args.timeout) for _ in range(args.runs))
+               if s is not None]
+    if samples:
+        print(f"\nfirst paint: median {statistics.median(samples) * 1000:.0f} ms "
+              f"(min {min(samples) * 1000:.0f}) from process start")
+    else:
+        print("\nfirst paint: no trace line (window did not open)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+bench_thumb_backends.py — SQLite thumbs table vs mmap-ed thumbnail atlas.
+
+    python benchmarks/bench_thumb_backends.py --rows 20000 --thumb-kb 8
+
+For each backend: stores one thumbnail per row through ImageDB.set_thumb()
+(like ThumbWorker), then times get_visible_rows_bulk() for random windows
+(what ThumbnailView._sync_visible asks for on every scroll step) and counts
+the bytes Python allocates per window. The atlas returns memoryview slices
+of the mapping, so its allocation stays flat regardless of thumbnail size.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import synth  # noqa: F401  (sys.path setup)
+
+from db import ImageDB, THUMB_BACKENDS
+
+
+def run(backend: str, rows: int, thumb_kb: int, window: int, reads: int):
+    directory = tempfile.mkdtemp(prefix="backend_bench_")
+    try:
+        db = ImageDB(thumb_backend=backend)
+        db.open(directory)
+        db._conn.executemany(
+            "INSERT INTO images (rel_path, mtime, has_caption, caption_text, "
+            "cap_size) VALUES (?, 0, 1, 'caption', -1)",
+            [(f"img_{i:07d}.jpg",) for i in range(rows)])
+        db._conn.commit()
+        payloads = [os.urandom(thumb_kb * 1024) for _ in range(16)]
+        paths = [f"img_{i:07d}.jpg" for i in range(rows)]
+
+        t0 = time.perf_counter()
+        for i, rp in enumerate(paths):
+            db.set_thumb(rp, payloads[i % len(payloads)])
+        db.flush()
+        fill_rate = rows / (time.perf_counter() - t0)
+
+        rnd = random.Random(1)
+        samples = []
+        for _ in range(reads):
+            start = rnd.randrange(0, rows - window)
+            t0 = time.perf_counter()
+            db.get_visible_rows_bulk(paths[start:start + window])
+            samples.append((time.perf_counter() - t0) * 1000)
+
+        tracemalloc.start()
+        for _ in range(20):
+            start = rnd.randrange(0, rows - window)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            got = db.get_visible_rows_bulk(paths[start:start + window])
+            peak = tracemalloc.get_traced_memory()[1] - before
+            del got
+        tracemalloc.stop()
+        db.close()
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        return fill_rate, statistics.median(samples), p99, peak
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--thumb-kb", type=int, default=8)
+    ap.add_argument("--window", type=int, default=64)
+    ap.add_argument("--reads", type=int, default=500)
+    args = ap.parse_args()
+
+    print(f"{args.rows} thumbs of {args.thumb_kb} KB, window of {args.window}")
+    print(f"{'backend':>8} {'fill/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'KB/window':>10}")
+    for backend in THUMB_BACKENDS:
+        rate, p50, p99, peak = run(backend, args.rows, args.thumb_kb,
+                                   args.window, args.reads)
+        print(f"{backend:>8} {rate:>9.0f} {p50:>8.2f} {p99:>8.2f} {peak / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
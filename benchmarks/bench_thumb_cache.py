@@ -0,0 +1,51 @@
+"""
+bench_thumb_cache.py — Reopening a folder with and without the shared cache.
+
+    python benchmarks/bench_thumb_cache.py --count 200 --workers 2
+
+Each run deletes the folder's thumbs.sqlite first (as for a copied dataset
+or a parent folder opened for the first time) and times how long
+ThumbWorker takes to deliver every thumbnail: without ThumbCache, with an
+empty cache (decode + store), and with the cache filled by that run.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from synth import make_images
+from bench_thumbs import run_once
+
+from thumb_cache import ThumbCache
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--count", type=int, default=200)
+    ap.add_argument("--width", type=int, default=2048)
+    ap.add_argument("--height", type=int, default=1536)
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="thumb_cache_bench_")
+    cache_dir = tempfile.mkdtemp(prefix="thumb_cache_store_")
+    try:
+        print(f"generating {args.count} images ({args.width}x{args.height})")
+        paths = make_images(directory, args.count, (args.width, args.height))
+        cache = ThumbCache(os.path.join(cache_dir, "cache.sqlite"))
+        print(f"{'':>12} {'seconds':>9} {'thumbs/s':>9}")
+        for label, c in (("no cache", None), ("cold cache", cache),
+                         ("warm cache", cache)):
+            secs = run_once(directory, paths, args.workers, cache=c)
+            print(f"{label:>12} {secs:>9.2f} {len(paths) / secs:>9.1f}")
+        print(f"(cache: {cache.hits} hits, {cache.misses} misses, "
+              f"{cache.total_bytes / 1e6:.1f} MB)")
+        cache.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
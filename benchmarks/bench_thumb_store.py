@@ -0,0 +1,163 @@
+"""
+bench_thumb_store.py — Metadata query time with inline thumbnail BLOBs vs a
+separate thumbs table.
+
+    python benchmarks/bench_thumb_store.py --rows 20000,100000 --thumb-kb 8
+
+Builds a database in the old layout (JPEG bytes in images.thumb, every row
+with a thumbnail), times the metadata queries the app issues, then opens it
+with ImageDB — which migrates the BLOBs into the thumbs table — and times
+the same queries again. Each query runs on a fresh connection with SQLite's
+default page cache, as the app's per-thread readers do.
+
+"scan MB" is the size of the images b-tree without overflow pages — what a
+metadata table scan has to pull through the page cache / from disk. When
+the database file is already in the OS cache the timings understate the
+difference; the page counts do not.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import synth  # noqa: F401  (sys.path setup)
+
+from db import ImageDB, DB_FILENAME
+from bench_filter import WORDS
+
+LEGACY_SCHEMA = """
+    CREATE TABLE images (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        rel_path     TEXT UNIQUE NOT NULL,
+        mtime        REAL NOT NULL,
+        has_caption  INTEGER NOT NULL DEFAULT 0,
+        caption_text TEXT NOT NULL DEFAULT '',
+        thumb        BLOB,
+        cap_mtime    REAL,
+        cap_size     INTEGER
+    );
+    CREATE INDEX idx_rel_path ON images (rel_path);
+    CREATE INDEX idx_has_caption ON images (has_caption);
+"""
+
+# (label, inline-layout SQL, split-layout SQL, needs a rel_path parameter)
+QUERIES = [
+    ("caption lengths",
+     "SELECT rel_path, LENGTH(caption_text) FROM images",
+     "SELECT rel_path, LENGTH(caption_text) FROM images", False),
+    ("substring filter",
+     "SELECT id, rel_path, has_caption, caption_text FROM images "
+     "WHERE caption_text LIKE '%lighthouse%' OR rel_path LIKE '%lighthouse%'",
+     "SELECT id, rel_path, has_caption, caption_text FROM images "
+     "WHERE caption_text LIKE '%lighthouse%' OR rel_path LIKE '%lighthouse%'", False),
+    ("show empty",
+     "SELECT id, rel_path FROM images WHERE has_caption = 0 OR caption_text = ''",
+     "SELECT id, rel_path FROM images WHERE has_caption = 0 OR caption_text = ''",
+     False),
+    ("pending thumbs",
+     "SELECT rel_path FROM images WHERE thumb IS NULL ORDER BY rel_path",
+     "SELECT rel_path FROM images WHERE NOT EXISTS "
+     "(SELECT 1 FROM thumbs WHERE image_id = images.id) ORDER BY rel_path", False),
+    ("get_by_rel x200",
+     "SELECT * FROM images WHERE rel_path = ?",
+     "SELECT * FROM images WHERE rel_path = ?", True),
+]
+
+
+def build_legacy(path: str, rows: int, thumb_kb: int):
+    rnd = random.Random(7)
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    thumbs = [os.urandom(thumb_kb * 1024) for _ in range(32)]
+    batch = []
+    for i in range(rows):
+        caption = " ".join(rnd.choices(WORDS, k=rnd.randint(12, 40)))
+        if rnd.random() < 0.05:
+            caption = ""
+        batch.append((f"set_{i // 1000:04d}/img_{i:07d}.png", 1 if caption else 0,
+                      caption, thumbs[i % len(thumbs)]))
+    conn.executemany(
+        "INSERT INTO images (rel_path, mtime, has_caption, caption_text, thumb, "
+        "cap_size) VALUES (?, 0, ?, ?, ?, -1)", batch)
+    conn.commit()
+    conn.close()
+
+
+def scan_mb(path: str) -> float:
+    conn = sqlite3.connect(path)
+    try:
+        size = conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat "
+            "WHERE name = 'images' AND pagetype != 'overflow'").fetchone()[0]
+    except sqlite3.OperationalError:
+        size = 0   # SQLite built without dbstat
+    finally:
+        conn.close()
+    return (size or 0) / 1e6
+
+
+def time_queries(path: str, column: int, rows: int, repeat: int) -> dict[str, float]:
+    rnd = random.Random(3)
+    probes = [f"set_{i // 1000:04d}/img_{i:07d}.png"
+              for i in rnd.sample(range(rows), 200)]
+    result = {}
+    for q in QUERIES:
+        samples = []
+        for _ in range(repeat):
+            conn = sqlite3.connect(path)
+            t0 = time.perf_counter()
+            if q[3]:
+                for rp in probes:
+                    conn.execute(q[column], (rp,)).fetchone()
+            else:
+                conn.execute(q[column]).fetchall()
+            samples.append((time.perf_counter() - t0) * 1000)
+            conn.close()
+        result[q[0]] = statistics.median(samples)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", default="20000,100000")
+    ap.add_argument("--thumb-kb", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    for rows in (int(x) for x in args.rows.split(",")):
+        directory = tempfile.mkdtemp(prefix="thumb_store_bench_")
+        try:
+            path = os.path.join(directory, DB_FILENAME)
+            build_legacy(path, rows, args.thumb_kb)
+            inline = time_queries(path, 1, rows, args.repeat)
+            inline_mb = scan_mb(path)
+
+            t0 = time.perf_counter()
+            db = ImageDB()
+            db.open(directory)
+            migrate_s = time.perf_counter() - t0
+            moved = db._conn.execute("SELECT COUNT(*) FROM thumbs").fetchone()[0]
+            db.close()
+            assert moved == rows, (moved, rows)
+            split = time_queries(path, 2, rows, args.repeat)
+            split_mb = scan_mb(path)
+
+            print(f"\n{rows} rows, {args.thumb_kb} KB thumbs "
+                  f"(migrated in {migrate_s:.1f}s)")
+            print(f"{'':>20} {'inline':>10} {'split':>10} {'ratio':>8}")
+            print(f"{'scan MB':>20} {inline_mb:>10.1f} {split_mb:>10.1f} "
+                  f"{inline_mb / max(split_mb, 1e-6):>7.1f}x")
+            for name, _, _, _ in QUERIES:
+                a, b = inline[name], split[name]
+                print(f"{name + ' ms':>20} {a:>10.1f} {b:>10.1f} {a / max(b, 1e-6):>7.1f}x")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+bench_thumbs.py — ThumbWorker throughput (thumbnails/sec) vs worker count.
+
+    python benchmarks/bench_thumbs.py --count 300 --workers 1,2,4
+
+Builds a synthetic folder of PNG/JPEG/WebP files, then for each worker count
+starts from an empty thumbnail cache and times how long ThumbWorker takes to
+deliver every ``"thumb"`` result on its ``result_queue``.
+"""
+
+import argparse
+import os
+import queue
+import shutil
+import tempfile
+import time
+
+from synth import make_images
+
+from db import ImageDB, ThumbWorker, DB_FILENAME
+
+
+def run_once(directory: str, paths: list[str], workers: int, cache=None) -> float:
+    db_path = os.path.join(directory, DB_FILENAME)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    db = ImageDB()
+    db.open(directory)
+    rel_paths = db.sync(paths)
+    q: queue.Queue = queue.Queue()
+    worker = ThumbWorker(db, q, workers=workers, cache=cache)
+    worker.request(rel_paths)
+    t0 = time.perf_counter()
+    worker.start()
+    done = 0
+    while done < len(rel_paths):
+        kind, *_ = q.get()
+        if kind == "thumb":
+            done += 1
+    elapsed = time.perf_counter() - t0
+    worker.stop()
+    db.close()
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--count", type=int, default=300)
+    ap.add_argument("--width", type=int, default=2048)
+    ap.add_argument("--height", type=int, default=1536)
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--dir", help="reuse/keep this folder instead of a temp dir")
+    args = ap.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="thumb_bench_")
+    try:
+        print(f"generating {args.count} images ({args.width}x{args.height}) in {directory}")
+        paths = make_images(directory, args.count, (args.width, args.height))
+        print(f"{'workers':>8} {'seconds':>9} {'thumbs/s':>9}")
+        for n in (int(x) for x in args.workers.split(",")):
+            secs = run_once(directory, paths, n)
+            print(f"{n:>8} {secs:>9.2f} {len(paths) / secs:>9.1f}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
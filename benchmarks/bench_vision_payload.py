@@ -0,0 +1,83 @@
+"""
+bench_vision_payload.py — Vision payload size and caption latency vs downscaling.
+
+    python benchmarks/bench_vision_payload.py --megapixels 20 --bandwidth 12.5
+
+Writes one large JPEG and one large PNG, then for several
+(vision_image_format, max_image_side, jpeg_quality) settings reports the
+data-URL size, encode time (cold; the repeat is served from the payload
+cache) and end-to-end generate_caption() latency against stub_llm with the
+given upload bandwidth (MB/s; 12.5 = 100 Mbit/s).
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from synth import make_image
+from stub_llm import start_stub
+
+import llm
+from llm import LLMSettings, generate_caption, _image_to_data_url
+
+CASES = [
+    ("original", "auto", 0, 90),
+    ("jpeg full", "jpeg", 0, 90),
+    ("2048 q90", "auto", 2048, 90),
+    ("1536 q90", "auto", 1536, 90),
+    ("1024 q85", "auto", 1024, 85),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--megapixels", type=float, default=20)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--bandwidth", type=float, default=12.5, help="MB/s")
+    args = ap.parse_args()
+
+    w = int((args.megapixels * 1e6 * 3 / 2) ** 0.5)
+    size = (w, w * 2 // 3)
+    directory = tempfile.mkdtemp(prefix="payload_bench_")
+    try:
+        image = make_image(size)
+        sources = {}
+        for ext, fmt in (("jpg", "JPEG"), ("png", "PNG")):
+            path = os.path.join(directory, f"source.{ext}")
+            image.save(path, fmt, quality=92)
+            sources[ext] = path
+        server = start_stub(latency=args.latency, parallel=1,
+                            bandwidth=args.bandwidth * 1e6)
+        print(f"{size[0]}x{size[1]} source, stub latency {args.latency}s, "
+              f"upload {args.bandwidth} MB/s")
+        print(f"{'source':>6} {'setting':>10} {'payload MB':>11} {'encode ms':>10} "
+              f"{'cached ms':>10} {'caption s':>10}")
+        for ext, path in sources.items():
+            print(f"{ext:>6} {'(file)':>10} {os.path.getsize(path) / 1e6:>11.2f}")
+            for label, fmt, side, quality in CASES:
+                llm._payload_cache = llm._PayloadCache(
+                    llm.PAYLOAD_CACHE_BYTES * 4)
+                t0 = time.perf_counter()
+                url = _image_to_data_url(path, fmt, side, quality)
+                encode = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                _image_to_data_url(path, fmt, side, quality)
+                cached = time.perf_counter() - t0
+                settings = LLMSettings(base_url=server.base_url, model="stub",
+                                       vision_image_format=fmt,
+                                       max_image_side=side, jpeg_quality=quality)
+                llm._payload_cache = llm._PayloadCache(0)
+                t0 = time.perf_counter()
+                generate_caption(settings, path)
+                caption = time.perf_counter() - t0
+                print(f"{'':>6} {label:>10} {len(url) / 1e6:>11.2f} {encode * 1000:>10.0f} "
+                      f"{cached * 1000:>10.2f} {caption:>10.2f}")
+        server.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
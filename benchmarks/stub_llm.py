@@ -0,0 +1,206 @@
+"""
+stub_llm.py — Local OpenAI-compatible stub endpoint with artificial latency.
+
+    python benchmarks/stub_llm.py --port 8765 --latency 1.0 --parallel 4
+
+Serves ``GET /v1/models`` and ``POST /v1/chat/completions``. Each completion
+sleeps *latency* seconds while holding one of *parallel* slots (like
+llama-server ``--parallel N``), then returns a caption naming the request
+number. With ``--bandwidth`` (MB/s) it also waits as long as uploading the
+request body over such a link would take; ``--connect-delay`` adds a fixed
+cost to every new connection (a stand-in for a remote TCP + TLS handshake).
+``--fail-rate`` answers that fraction of completions with HTTP 503.
+``connections`` and ``model_lists`` count new connections and /models calls.
+Captions are padded to ``--words`` words; requests with ``"stream": true``
+get them as server-sent events, one word per chunk, spread evenly over
+*latency*.
+Point "LLM settings" at ``http://127.0.0.1:<port>/v1`` to exercise the
+app without a model, or import ``start_stub()`` from other benchmarks.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODEL_ID = "stub-vision"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with keep-alive clients
+    # Nagle + delayed ACK would add ~40 ms to every reused-connection reply.
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):   # keep benchmark output clean
+        pass
+
+    def setup(self):
+        super().setup()
+        server = self.server
+        with server.stats_lock:
+            server.connections += 1
+        if server.connect_delay:
+            time.sleep(server.connect_delay)
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, n: int, words: list[str], delay: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload):
+            data = b"data: " + payload + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        for i, word in enumerate(words):
+            time.sleep(delay)
+            chunk = {"id": f"stub-{n}", "object": "chat.completion.chunk",
+                     "model": MODEL_ID,
+                     "choices": [{"index": 0, "finish_reason": None,
+                                  "delta": {"content": word if i == 0 else " " + word}}]}
+            event(json.dumps(chunk).encode("utf-8"))
+        event(json.dumps({"id": f"stub-{n}", "object": "chat.completion.chunk",
+                          "choices": [{"index": 0, "finish_reason": "stop",
+                                       "delta": {}}]}).encode("utf-8"))
+        event(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            with self.server.stats_lock:
+                self.server.model_lists += 1
+            self._send_json(200, {"object": "list",
+                                  "data": [{"id": MODEL_ID, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        server = self.server
+        with server.stats_lock:
+            server.bytes_in += length
+        if server.bandwidth:
+            time.sleep(length / server.bandwidth)
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            stream = bool(json.loads(body).get("stream"))
+        except (ValueError, AttributeError):
+            stream = False
+        if server.fail_rate and server.rng.random() < server.fail_rate:
+            with server.stats_lock:
+                server.failures += 1
+            self._send_json(503, {"error": "stub overloaded"})
+            return
+        with server.slots:
+            n = next(server.counter)
+            with server.stats_lock:
+                server.active += 1
+                server.peak = max(server.peak, server.active)
+            words = f"A stub caption number {n}.".split()
+            words += ["word"] * max(0, server.words - len(words))
+            if stream:
+                try:
+                    self._send_stream(n, words, server.latency / len(words))
+                finally:
+                    with server.stats_lock:
+                        server.active -= 1
+                return
+            time.sleep(server.latency)
+            with server.stats_lock:
+                server.active -= 1
+        self._send_json(200, {
+            "id": f"stub-{n}",
+            "object": "chat.completion",
+            "model": MODEL_ID,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant",
+                            "content": " ".join(words)},
+            }],
+        })
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of clients connect at once in the concurrency benchmarks; the
+    # default listen backlog (5) would drop them into SYN retransmits.
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients dropping a request (Stop, cancelled asyncio runs) are expected.
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def start_stub(port: int = 0, latency: float = 1.0, parallel: int = 4,
+               bandwidth: float = 0.0, connect_delay: float = 0.0,
+               words: int = 40, fail_rate: float = 0.0):
+    """Start the stub on a daemon thread; returns the server (``.base_url``).
+
+    *bandwidth* is in bytes/s (0 = unlimited).
+    """
+    server = _Server(("127.0.0.1", port), _Handler)
+    server.latency = latency
+    server.slots = threading.BoundedSemaphore(parallel)
+    server.counter = itertools.count(1)
+    server.stats_lock = threading.Lock()
+    server.active = 0
+    server.peak = 0
+    server.bandwidth = bandwidth
+    server.bytes_in = 0
+    server.connect_delay = connect_delay
+    server.connections = 0
+    server.model_lists = 0
+    server.words = words
+    server.fail_rate = fail_rate
+    server.failures = 0
+    server.rng = random.Random(1)
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=1.0)
+    ap.add_argument("--parallel", type=int, default=4)
+    ap.add_argument("--bandwidth", type=float, default=0.0, help="MB/s, 0 = unlimited")
+    ap.add_argument("--connect-delay", type=float, default=0.0,
+                    help="seconds added to each new connection")
+    ap.add_argument("--words", type=int, default=40,
+                    help="length of streamed captions")
+    ap.add_argument("--fail-rate", type=float, default=0.0,
+                    help="fraction of completions answered with HTTP 503")
+    args = ap.parse_args()
+    server = start_stub(args.port, args.latency, args.parallel, args.bandwidth * 1e6,
+                        args.connect_delay, args.words, args.fail_rate)
+    print(f"stub LLM at {server.base_url} (latency {args.latency}s, "
+          f"{args.parallel} slots); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
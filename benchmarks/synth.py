@@ -0,0 +1,61 @@
+"""
+synth.py — Synthetic datasets shared by the benchmark scripts.
+
+Benchmarks are plain scripts (``python benchmarks/bench_*.py``); this module
+also puts the repository root on ``sys.path`` so they can import ``db`` etc.
+"""
+
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FORMATS = {"png": "PNG", "jpg": "JPEG", "webp": "WEBP"}
+
+
+def make_image(size: tuple[int, int], seed: int = 0):
+    """Return a PIL image with gradients + noise (compresses like a photo)."""
+    from PIL import Image, ImageDraw
+
+    rnd = random.Random(seed)
+    w, h = size
+    img = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(24):
+        x0, y0 = rnd.randrange(w), rnd.randrange(h)
+        x1, y1 = x0 + rnd.randrange(w // 2 + 1), y0 + rnd.randrange(h // 2 + 1)
+        fill = (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256))
+        draw.ellipse((x0, y0, x1, y1), fill=fill)
+    noise = Image.effect_noise((w, h), 24).convert("RGB")
+    return Image.blend(img, noise, 0.15)
+
+
+def make_images(directory: str, count: int, size=(2048, 1536),
+                formats=("png", "jpg", "webp"), captions: float = 0.5) -> list[str]:
+    """Write *count* images cycling through *formats*; return absolute paths.
+
+    A ``.txt`` sidecar is written for roughly *captions* of them. Images are
+    rendered once per format and re-saved under different names — decoding
+    cost is what the benchmarks measure, not content variety.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rnd = random.Random(1234)
+    base = make_image(size)
+    paths = []
+    for i in range(count):
+        ext = formats[i % len(formats)]
+        path = os.path.join(directory, f"img_{i:06d}.{ext}")
+        if i < len(formats):
+            base.save(path, FORMATS[ext], quality=90)
+        else:
+            with open(os.path.join(directory, f"img_{i % len(formats):06d}.{ext}"), "rb") as src, \
+                    open(path, "wb") as dst:
+                dst.write(src.read())
+        if rnd.random() < captions:
+            with open(os.path.splitext(path)[0] + ".txt", "w", encoding="utf-8") as f:
+                f.write(f"synthetic caption {i}")
+        paths.append(path)
+    return paths
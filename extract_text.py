@@ -2,6 +2,7 @@
 
 Public API:
     extract_caption(path) -> str | None
+    extract_text_nodes(path) -> list[tuple[str, str]]   # (node name, text)
 
 Two storage conventions are recognised:
   * Automatic1111 / SD style — plain text in EXIF ``UserComment``
@@ -114,14 +115,20 @@ def _load_comfy_prompt(raw: str):
 
 
 def _extract_comfy_texts(prompt: dict) -> list[str]:
-    """Return prompt text from the active text nodes of a ComfyUI prompt.
+    """Return prompt text from the active text nodes of a ComfyUI prompt."""
+    return [text for _, text in _extract_comfy_nodes(prompt)]
+
+
+def _extract_comfy_nodes(prompt: dict) -> list[tuple[str, str]]:
+    """Return (node name, text) pairs from the active text nodes of a prompt.
 
     The API prompt format already contains only active, executable nodes
     (notes and muted/bypassed nodes are absent). Of those, keep nodes whose
     class/title mentions "text" or "prompt", drop utility and system/negative
-    nodes, and take the meaningful string content of their inputs.
+    nodes, and take the meaningful string content of their inputs. The node
+    name is its title, or its class when untitled.
     """
-    texts: list[str] = []
+    texts: list[tuple[str, str]] = []
     seen: set[str] = set()
     for node in prompt.values():
         if not isinstance(node, dict):
@@ -148,7 +155,7 @@ def _extract_comfy_texts(prompt: dict) -> list[str]:
             )
             if is_content:
                 seen.add(stripped)
-                texts.append(stripped)
+                texts.append((title or cls, stripped))
     return texts
 
 
@@ -182,3 +189,31 @@ def extract_caption(path: str) -> str | None:
                 texts.append(text)
 
     return "\n\n".join(texts) if texts else None
+
+
+def extract_text_nodes(path: str) -> list[tuple[str, str]]:
+    """Extract embedded text from an image as (node name, text) pairs.
+
+    EXIF UserComment comes back as one ``("UserComment", text)`` pair; a
+    ComfyUI prompt yields one pair per text input of its active text nodes.
+    Returns an empty list if the image carries no recognised text.
+    """
+    try:
+        fields = _collect_raw_fields(path)
+    except Exception:
+        return []
+
+    nodes: list[tuple[str, str]] = []
+    user_comment = fields.get("exif:UserComment", "").strip()
+    if user_comment:
+        nodes.append(("UserComment", user_comment))
+    seen: set[str] = set()
+    for value in fields.values():
+        prompt = _load_comfy_prompt(value)
+        if not prompt:
+            continue
+        for name, text in _extract_comfy_nodes(prompt):
+            if text not in seen:
+                seen.add(text)
+                nodes.append((name, text))
+    return nodes
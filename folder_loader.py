@@ -0,0 +1,141 @@
+"""
+folder_loader.py — Progressive folder opening on a worker thread.
+
+``FolderLoader.start(directory)`` opens the folder's database, then scans and
+syncs the folder in chunks, handing each chunk to the UI as soon as its rows
+are in the database. The first images are browsable within moments even on
+a 100k-image network share, while the rest of the folder keeps loading.
+
+Key properties:
+    * Directories are listed with ``scanner.iter_directory``. Images are synced
+      with ``ImageDB.sync(prune=False)`` in chunks of ``LOAD_CHUNK`` (the first
+      one only ``FIRST_CHUNK``, and whatever has been found every
+      ``LOAD_CHUNK_SECONDS``), then delivered as
+      ``on_chunk(rel_paths, caption_lengths)``.
+    * ``on_done(dirs, rel_paths, complete)`` ends every load that is not
+      superseded. After a complete load rows of files deleted since the last
+      open are pruned (rows the UI added or renamed meanwhile are kept) and
+      *rel_paths* is the whole folder in path order (like ``scan_directory``).
+      After ``cancel()`` *complete* is False and *rel_paths* is what was
+      delivered; nothing is pruned. ``on_error(exc)`` reports a failure.
+    * ``start()`` while a load is running supersedes it: the old load is
+      cancelled, the new worker waits for it before reopening the database,
+      and nothing the old load posted is delivered any more.
+    * Callbacks go through the owner's ``post`` (e.g. ``root.after(0, ...)``)
+      and are filtered on the receiving thread; no Tk imports.
+"""
+
+import threading
+import time
+
+from scanner import iter_directory
+
+FIRST_CHUNK = 200          # images delivered before anything else
+LOAD_CHUNK = 2000          # images synced per chunk afterwards
+LOAD_CHUNK_SECONDS = 0.5   # deliver what was found at least this often
+
+
+class FolderLoader:
+    """Scan + sync one folder at a time into *db* (see module docstring)."""
+
+    def __init__(self, db, *, post, on_chunk, on_done, on_error=None):
+        self._db = db
+        self._post = post
+        self._on_chunk = on_chunk
+        self._on_done = on_done
+        self._on_error = on_error
+        self._generation = 0
+        self._thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def start(self, directory: str):
+        """Load *directory*, superseding any load in progress."""
+        self._generation += 1
+        self._stop_event.set()
+        self._stop_event = stop = threading.Event()
+        previous = self._thread
+        self._thread = threading.Thread(
+            target=self._run, args=(self._generation, directory, previous, stop),
+            name="folder-load", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop after the current chunk; ``on_done(..., complete=False)`` follows."""
+        self._stop_event.set()
+
+    def stop(self):
+        """Cancel without any further callbacks and wait for the worker."""
+        self._generation += 1
+        self._stop_event.set()
+        t = self._thread
+        if t is not None and t.is_alive():
+            t.join(timeout=2.0)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def _emit(self, gen: int, callback, *args):
+        if callback is not None:
+            try:
+                self._post(self._deliver, gen, callback, args)
+            except Exception:
+                pass   # receiving loop already gone
+
+    def _deliver(self, gen: int, callback, args):
+        if gen == self._generation:   # drop results of superseded loads
+            callback(*args)
+
+    def _run(self, gen: int, directory: str, previous, stop: threading.Event):
+        if previous is not None:
+            previous.join()   # it may still be writing to the database
+        if stop.is_set():
+            return
+        db = self._db
+        dirs: list[str] = []
+        delivered: list[str] = []
+        pending = []
+
+        def deliver(entries):
+            for i in range(0, len(entries), LOAD_CHUNK):
+                rel_paths = db.sync(entries[i:i + LOAD_CHUNK], prune=False)
+                lengths = db.get_caption_lengths(rel_paths)
+                delivered.extend(rel_paths)
+                self._emit(gen, self._on_chunk, rel_paths, lengths)
+                if stop.is_set():
+                    return
+
+        try:
+            db.open(directory)
+            known = db.get_rel_paths()
+            last = time.monotonic()
+            listing = iter_directory(directory)
+            try:
+                for d, images in listing:
+                    if stop.is_set():
+                        break
+                    dirs.append(d)
+                    pending.extend(images)
+                    limit = LOAD_CHUNK if delivered else FIRST_CHUNK
+                    if len(pending) >= limit or (
+                            pending and time.monotonic() - last >= LOAD_CHUNK_SECONDS):
+                        deliver(pending)
+                        pending = []
+                        last = time.monotonic()
+            finally:
+                listing.close()
+            if pending and not stop.is_set():
+                deliver(pending)
+            complete = not stop.is_set()
+            if complete:
+                db.prune(set(delivered), known)
+                delivered.sort(key=db._abs)
+        except Exception as exc:
+            self._emit(gen, self._on_error, exc)
+            return
+        dirs.sort()
+        self._emit(gen, self._on_done, dirs, delivered, complete)
@@ -0,0 +1,239 @@
+"""
+image_set.py — Ordered set of rel_paths with fast lookup by path and by index.
+
+``ImageSet`` replaces the plain ``list[str]`` that held the (filtered) image
+list, where every ``list.index(rel_path)`` / ``pop(i)`` was an O(n) scan and
+bulk operations (thumbnail streaming, deletes, renames) turned quadratic.
+
+Key properties:
+    * ``rp in s`` is O(1) (dict membership).
+    * ``s.index(rp)`` / ``s[i]`` are O(log n): items live in blocks of at most
+      ``2 * LOAD`` entries; a Fenwick tree over block lengths gives the offset
+      of each block.
+    * ``insert`` / ``remove`` / ``pop`` touch a single block plus the Fenwick
+      tree; splitting or dropping a block rebuilds the per-block tables,
+      which are O(n / LOAD).
+    * Indices are positions in the current order, exactly as with a list; the
+      order only changes on insert/remove/sort.
+    * Entries are unique; ``index()`` / ``remove()`` raise ``ValueError`` for
+      unknown paths, like ``list``.
+"""
+
+from bisect import bisect_right
+from itertools import chain
+
+LOAD = 512
+
+
+class ImageSet:
+    """Ordered, duplicate-free sequence of rel_paths."""
+
+    def __init__(self, rel_paths=()):
+        self._set_items(list(dict.fromkeys(rel_paths)))
+
+    # ------------------------------------------------------------------
+    # Construction / bookkeeping
+    # ------------------------------------------------------------------
+
+    def _set_items(self, items: list[str]):
+        self._blocks: list[list[str]] = [
+            items[i:i + LOAD] for i in range(0, len(items), LOAD)
+        ]
+        self._len = len(items)
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        """Recompute path->block map, block positions and the Fenwick tree."""
+        self._block_of: dict[str, list[str]] = {}
+        self._block_pos: dict[int, int] = {}
+        for bi, blk in enumerate(self._blocks):
+            self._block_pos[id(blk)] = bi
+            for rp in blk:
+                self._block_of[rp] = blk
+        self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        n = len(self._blocks)
+        tree = [0] * (n + 1)
+        for i, blk in enumerate(self._blocks, start=1):
+            tree[i] += len(blk)
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bi: int, delta: int):
+        i = bi + 1
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _offset(self, bi: int) -> int:
+        """Number of items in blocks before block *bi*."""
+        total, i, tree = 0, bi, self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """(block index, offset in block) of item *index* (0 <= index < len)."""
+        tree = self._tree
+        pos, rem = 0, index
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= rem:
+                pos = nxt
+                rem -= tree[nxt]
+            step >>= 1
+        return pos, rem
+
+    def _norm_index(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("ImageSet index out of range")
+        return index
+
+    # ------------------------------------------------------------------
+    # Sequence protocol
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def __contains__(self, rel_path) -> bool:
+        return rel_path in self._block_of
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        bi, off = self._locate(self._norm_index(index))
+        return self._blocks[bi][off]
+
+    def __repr__(self) -> str:
+        return f"ImageSet({list(self)!r})"
+
+    def index(self, rel_path: str) -> int:
+        blk = self._block_of.get(rel_path)
+        if blk is None:
+            raise ValueError(f"{rel_path!r} is not in ImageSet")
+        return self._offset(self._block_pos[id(blk)]) + blk.index(rel_path)
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
+
+    def insert(self, index: int, rel_path: str):
+        """Insert *rel_path* before position *index* (clamped, like list)."""
+        if rel_path in self._block_of:
+            raise ValueError(f"{rel_path!r} is already in ImageSet")
+        if not self._blocks:
+            self._set_items([rel_path])
+            return
+        index = max(0, min(index if index >= 0 else index + self._len, self._len))
+        if index == self._len:
+            bi = len(self._blocks) - 1
+            off = len(self._blocks[bi])
+        else:
+            bi, off = self._locate(index)
+        blk = self._blocks[bi]
+        blk.insert(off, rel_path)
+        self._block_of[rel_path] = blk
+        self._len += 1
+        if len(blk) > 2 * LOAD:
+            half = blk[LOAD:]
+            del blk[LOAD:]
+            self._blocks.insert(bi + 1, half)
+            for rp in half:
+                self._block_of[rp] = half
+            self._block_pos = {id(b): i for i, b in enumerate(self._blocks)}
+            self._rebuild_tree()
+        else:
+            self._tree_add(bi, 1)
+
+    def append(self, rel_path: str):
+        self.insert(self._len, rel_path)
+
+    def insert_sorted(self, rel_path: str, key=None, reverse: bool = False) -> int:
+        """Insert into a set already ordered by *key*; return the new index."""
+        k = key or (lambda rp: rp)
+        if reverse:
+            k = (lambda f: lambda rp: _Rev(f(rp)))(k)
+        if not self._blocks:
+            self.append(rel_path)
+            return 0
+        kv = k(rel_path)
+        # The last key of each block is enough to pick the block.
+        bi = bisect_right(self._blocks, kv, key=lambda b: k(b[-1]))
+        bi = min(bi, len(self._blocks) - 1)
+        off = bisect_right(self._blocks[bi], kv, key=k)
+        index = self._offset(bi) + off
+        self.insert(index, rel_path)
+        return index
+
+    def pop(self, index: int = -1) -> str:
+        index = self._norm_index(index)
+        bi, off = self._locate(index)
+        rp = self._blocks[bi][off]
+        self._remove_at(bi, off)
+        return rp
+
+    def remove(self, rel_path: str):
+        blk = self._block_of.get(rel_path)
+        if blk is None:
+            raise ValueError(f"{rel_path!r} is not in ImageSet")
+        self._remove_at(self._block_pos[id(blk)], blk.index(rel_path))
+
+    def discard(self, rel_path: str):
+        if rel_path in self._block_of:
+            self.remove(rel_path)
+
+    def _remove_at(self, bi: int, off: int):
+        blk = self._blocks[bi]
+        rp = blk.pop(off)
+        del self._block_of[rp]
+        self._len -= 1
+        if not blk:
+            del self._blocks[bi]
+            self._block_pos = {id(b): i for i, b in enumerate(self._blocks)}
+            self._rebuild_tree()
+        else:
+            self._tree_add(bi, -1)
+
+    def replace(self, old_rp: str, new_rp: str):
+        """Swap *old_rp* for *new_rp* at the same position (rename)."""
+        blk = self._block_of.pop(old_rp, None)
+        if blk is None:
+            raise ValueError(f"{old_rp!r} is not in ImageSet")
+        if new_rp in self._block_of:
+            self._block_of[old_rp] = blk
+            raise ValueError(f"{new_rp!r} is already in ImageSet")
+        blk[blk.index(old_rp)] = new_rp
+        self._block_of[new_rp] = blk
+
+    def sort(self, key=None, reverse: bool = False):
+        self._set_items(sorted(self, key=key, reverse=reverse))
+
+    def copy(self) -> "ImageSet":
+        return ImageSet(self)
+
+
+class _Rev:
+    """Inverts ordering so bisect works on descending sequences."""
+
+    __slots__ = ("v",)
+
+    def __init__(self, v):
+        self.v = v
+
+    def __lt__(self, other):
+        return other.v < self.v
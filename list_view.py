@@ -0,0 +1,270 @@
+"""
+list_view.py — Virtualized file list (path + caption length) for ImageCaptionApp.
+
+Class ``VirtualListView`` replaces a fully populated ``ttk.Treeview``: the tree
+only ever holds one screenful of "slot" rows, and scrolling rewrites their
+values instead of moving thousands of items. Cost of scroll, redraw, sort and
+refilter is therefore proportional to the visible rows, not to the dataset.
+
+Key properties:
+    * The row list is NOT copied — ``set_images()`` keeps a reference. After
+      mutating it in place (sort, append, pop) call ``refresh()``.
+    * Caption lengths come from a shared ``{rel_path: int}`` dict;
+      ``set_length()`` updates it and repaints the row if visible.
+    * Selection is a pure highlight painted from ``current index``; clicks
+      and keys are resolved to dataset indices by the view itself, so Tk's
+      ``<<TreeviewSelect>>`` (queued, and tied to slots rather than rows) is
+      not used.
+    * A separate Scrollbar maps (top row / total rows) to the virtual
+      position; the Treeview itself never scrolls.
+"""
+
+from tkinter import Frame, Scrollbar, VERTICAL, LEFT, RIGHT, BOTH, Y, END
+from tkinter import ttk, font as tkfont
+
+WHEEL_ROWS = 3
+
+
+class VirtualListView:
+    """Virtualized two-column list with keyboard/mouse navigation."""
+
+    def __init__(self, parent, *, display=str, on_select=None, on_sort=None):
+        self._display = display        # rel_path -> text of the "path" column
+        self._on_select = on_select    # (index) when the user picks a row
+        self._on_sort = on_sort        # (column) on heading click
+
+        # --- data state ---
+        self._files: list[str] = []
+        self._lengths: dict[str, int] = {}
+        self._current_idx: int = 0
+        self._top: int = 0
+        self._page_rows: int = 0
+
+        # slot iids currently in the tree, and the values last written to them
+        self._slots: list[str] = []
+        self._slot_vals: list[tuple] = []
+        self._row_h: int = 0
+        self._header_h: int = 0
+
+        # --- UI ---
+        self.frame = Frame(parent)
+        self._tree = ttk.Treeview(self.frame, columns=("path", "len"),
+                                  show="headings", selectmode="none", height=1)
+        self._tree.heading("path", text="File", command=lambda: self._sort("path"))
+        self._tree.heading("len", text="Len", command=lambda: self._sort("len"))
+        self._tree.column("path", anchor="w", stretch=True)
+        self._tree.column("len", anchor="e", width=56, stretch=False, minwidth=40)
+        self._tree.pack(side=LEFT, fill=BOTH, expand=True)
+        self._scrollbar = Scrollbar(self.frame, orient=VERTICAL, width=18,
+                                    command=self._on_scrollbar_command)
+        self._scrollbar.pack(side=RIGHT, fill=Y)
+
+        self._tree.bind("<Configure>", self._on_configure)
+        self._tree.bind("<Button-1>", self._on_click)
+        for ev in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self._tree.bind(ev, self._on_mousewheel)
+        self._tree.bind("<Up>",    lambda e: self._key_move(-1))
+        self._tree.bind("<Down>",  lambda e: self._key_move(1))
+        self._tree.bind("<Prior>", lambda e: self._key_move(-max(1, self._page_rows - 1)))
+        self._tree.bind("<Next>",  lambda e: self._key_move(max(1, self._page_rows - 1)))
+        self._tree.bind("<Home>",  lambda e: self._key_to(0))
+        self._tree.bind("<End>",   lambda e: self._key_to(len(self._files) - 1))
+
+    # ------------------------------------------------------------------
+    # Panel show / hide
+    # ------------------------------------------------------------------
+
+    def grid(self, **opts):
+        self.frame.grid(**opts)
+
+    def grid_remove(self):
+        self.frame.grid_remove()
+
+    def focus(self):
+        self._tree.focus_set()
+
+    def bind(self, sequence, func):
+        """Bind an event on the list widget itself (e.g. ``<FocusOut>``)."""
+        self._tree.bind(sequence, func, add="+")
+
+    # ------------------------------------------------------------------
+    # Public data API
+    # ------------------------------------------------------------------
+
+    def set_images(self, rel_paths: list[str], lengths: dict[str, int],
+                   current_index: int = 0):
+        """Show *rel_paths* (kept by reference) from the top."""
+        self._files = rel_paths
+        self._lengths = lengths
+        self._current_idx = max(0, min(current_index, len(rel_paths) - 1))
+        self._top = 0
+        self._render()
+
+    def refresh(self):
+        """Repaint after the row list or lengths were changed in place."""
+        if self._files:
+            self._current_idx = min(self._current_idx, len(self._files) - 1)
+        else:
+            self._current_idx = 0
+        self._scroll_to(self._top)
+
+    def set_current(self, index: int, ensure_visible: bool = True):
+        """Highlight *index* and optionally scroll it into view."""
+        if not self._files:
+            return
+        self._current_idx = max(0, min(index, len(self._files) - 1))
+        if ensure_visible:
+            self.see(self._current_idx)
+        else:
+            self._render()
+
+    def see(self, index: int):
+        """Scroll minimally so that row *index* is visible."""
+        k = max(1, self._page_rows)
+        if index < self._top:
+            self._scroll_to(index)
+        elif index >= self._top + k:
+            self._scroll_to(index - k + 1)
+        else:
+            self._render()
+
+    def set_length(self, rel_path: str, n: int):
+        """Update the caption length of *rel_path* and repaint if visible."""
+        self._lengths[rel_path] = n
+        self._render()
+
+    def yview(self) -> tuple[float, float]:
+        n = len(self._files)
+        if not n:
+            return (0.0, 1.0)
+        return (self._top / n, min(1.0, (self._top + self._page_rows) / n))
+
+    def yview_moveto(self, fraction: float):
+        self._scroll_to(int(round(fraction * len(self._files))))
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def _scroll_to(self, top: int):
+        n = len(self._files)
+        self._top = max(0, min(top, n - max(1, self._page_rows)))
+        self._render()
+
+    def _render(self):
+        tv = self._tree
+        n = len(self._files)
+        k = max(0, min(self._page_rows, n - self._top))
+
+        while len(self._slots) < k:
+            self._slots.append(tv.insert("", END, values=("", "")))
+            self._slot_vals.append(("", ""))
+        while len(self._slots) > k:
+            tv.delete(self._slots.pop())
+            self._slot_vals.pop()
+
+        for i, iid in enumerate(self._slots):
+            rp = self._files[self._top + i]
+            vals = (self._display(rp), self._lengths.get(rp, 0))
+            if self._slot_vals[i] != vals:
+                tv.item(iid, values=vals)
+                self._slot_vals[i] = vals
+
+        cur = self._current_idx - self._top
+        want = (self._slots[cur],) if 0 <= cur < k else ()
+        if tuple(tv.selection()) != want:
+            tv.selection_set(want)
+
+        self._scrollbar.set(*self.yview())
+
+    def _measure(self):
+        """Row / heading height in pixels (from a drawn row when possible)."""
+        if self._slots:
+            box = self._tree.bbox(self._slots[0])
+            if box:
+                self._header_h, self._row_h = box[1], box[3]
+                return
+        if not self._row_h:
+            try:
+                rh = int(ttk.Style().lookup("Treeview", "rowheight") or 0)
+            except (ValueError, TypeError):
+                rh = 0
+            if rh <= 0:
+                rh = tkfont.nametofont("TkDefaultFont").metrics("linespace") + 3
+            self._row_h = rh
+            self._header_h = rh + 4
+
+    def _on_configure(self, event=None):
+        self._measure()
+        h = self._tree.winfo_height()
+        self._page_rows = max(0, (h - self._header_h - 2) // max(1, self._row_h))
+        self._scroll_to(self._top)
+        if self._slots:
+            # Refine with real metrics now that at least one row is drawn.
+            self._tree.after_idle(self._remeasure)
+
+    def _remeasure(self):
+        old = (self._row_h, self._header_h)
+        self._measure()
+        if (self._row_h, self._header_h) != old:
+            self._on_configure()
+
+    # ------------------------------------------------------------------
+    # Event handlers
+    # ------------------------------------------------------------------
+
+    def _sort(self, col: str):
+        if self._on_sort is not None:
+            self._on_sort(col)
+
+    def _on_click(self, event):
+        region = self._tree.identify_region(event.x, event.y)
+        if region in ("heading", "separator"):
+            return None   # default handling: heading command / column resize
+        self._tree.focus_set()
+        iid = self._tree.identify_row(event.y)
+        if iid in self._slots:
+            self._move_to(self._top + self._slots.index(iid))
+        return "break"
+
+    def _on_mousewheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self._scroll_to(self._top - WHEEL_ROWS)
+        else:
+            self._scroll_to(self._top + WHEEL_ROWS)
+        return "break"
+
+    def _on_scrollbar_command(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.yview_moveto(float(args[1]))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= max(1, self._page_rows - 1)
+            self._scroll_to(self._top + step)
+
+    # ------------------------------------------------------------------
+    # Navigation
+    # ------------------------------------------------------------------
+
+    def _move_to(self, new_idx: int):
+        if not self._files:
+            return
+        new_idx = max(0, min(new_idx, len(self._files) - 1))
+        if new_idx == self._current_idx:
+            self.see(new_idx)
+            return
+        if self._on_select is not None:
+            self._on_select(new_idx)
+        else:
+            self.set_current(new_idx)
+
+    def _key_move(self, delta: int):
+        self._move_to(self._current_idx + delta)
+        return "break"
+
+    def _key_to(self, index: int):
+        self._move_to(index)
+        return "break"
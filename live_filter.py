@@ -0,0 +1,210 @@
+"""
+live_filter.py — Debounced, off-thread evaluation of the file-list filter.
+
+``LiveFilter`` turns keystrokes in the filter box into at most one query per
+pause in typing and runs it on a background thread, so the Tk mainloop never
+waits for SQLite.
+
+Key properties:
+    * ``submit(spec)`` (re)starts a debounce timer; ``submit(spec, delay_ms=0)``
+      skips it (Enter key, checkboxes, folder combobox).
+    * Only the newest spec is evaluated: specs that arrive while a query runs
+      replace the queued one, and results of superseded queries are dropped
+      before they reach the UI.
+    * ``on_busy(True/False)`` lets the UI show a "filtering…" state.
+    * No Tk imports — the owner passes ``after`` / ``after_cancel`` for the
+      debounce timer and ``post`` to marshal results to the UI thread.
+"""
+
+import threading
+from dataclasses import dataclass
+
+from dedupe import duplicate_order
+
+FILTER_DEBOUNCE_MS = 200
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    text: str = ""
+    show_empty: bool = False
+    dir_sel: str = "\\"
+    mode: str = "auto"
+    duplicates: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        return (not self.text and not self.show_empty and self.dir_sel == "\\"
+                and not self.duplicates)
+
+
+def path_in_dir(rp: str, dir_disp: str) -> bool:
+    r"""True if *rp* is in folder *dir_disp* or a subfolder. \ = no restriction."""
+    if dir_disp == "\\":
+        return True
+    dir_norm = dir_disp.replace("\\", "/")
+    rp_dir = rp.replace("\\", "/").rpartition("/")[0]
+    return rp_dir == dir_norm or rp_dir.startswith(dir_norm + "/")
+
+
+def compute_filter(db, all_files: list[str], spec: FilterSpec,
+                   is_stale=lambda: False) -> list[str] | None:
+    """Return the subset of *all_files* (order kept) that passes *spec*.
+
+    With ``spec.duplicates`` only images with a near-duplicate are kept, and
+    each duplicate group is listed together (groups in order of their first
+    member). Returns None as soon as *is_stale()* reports the result is
+    unwanted.
+    """
+    if spec.is_empty:
+        return list(all_files)
+    if spec.text or spec.show_empty:
+        rows = db.get_all(filter_text=spec.text, show_empty=spec.show_empty,
+                          mode=spec.mode)
+        if is_stale():
+            return None
+        pool = {r["rel_path"] for r in rows}
+        candidates = [rp for rp in all_files if rp in pool]
+    else:
+        candidates = list(all_files)
+    if spec.dir_sel != "\\":
+        candidates = [rp for rp in candidates if path_in_dir(rp, spec.dir_sel)]
+    if spec.duplicates:
+        group_of = duplicate_order(db.get_phashes())
+        if is_stale():
+            return None
+        grouped: dict[int, list[str]] = {}
+        for rp in candidates:
+            g = group_of.get(rp)
+            if g is not None:
+                grouped.setdefault(g, []).append(rp)
+        candidates = [rp for g in grouped.values() if len(g) > 1 for rp in g]
+    return candidates
+
+
+class LiveFilter:
+    """Debounce + single background worker + newest-result-wins delivery."""
+
+    def __init__(self, db, *, after, after_cancel, post, on_result,
+                 on_busy=None, debounce_ms: int = FILTER_DEBOUNCE_MS):
+        self._db = db
+        self._after = after
+        self._after_cancel = after_cancel
+        self._post = post
+        self._on_result = on_result   # (spec, rel_paths) on the UI thread
+        self._on_busy = on_busy
+        self._debounce_ms = debounce_ms
+
+        self._timer = None
+        self._cond = threading.Condition()
+        self._queued: tuple[int, FilterSpec, list[str]] | None = None
+        self._generation = 0          # bumped by every submit()/cancel()
+        self._last_spec: FilterSpec | None = None
+        self._thread: threading.Thread | None = None
+
+    # ------------------------------------------------------------------
+    # UI-thread API
+    # ------------------------------------------------------------------
+
+    def submit(self, spec: FilterSpec, all_files, delay_ms: int | None = None):
+        """Evaluate *spec* over *all_files* after the debounce delay.
+
+        Debounced submits of an unchanged spec are ignored; an explicit
+        *delay_ms* always re-evaluates (Enter re-applies the filter).
+
+        *all_files* may be a callable returning the list, so the snapshot is
+        taken when the query actually starts rather than at every keystroke.
+        """
+        if delay_ms is None and spec == self._last_spec and self._timer is None:
+            return  # e.g. cursor keys in the entry: nothing changed
+        self._last_spec = spec
+        self._cancel_timer()
+        with self._cond:
+            self._generation += 1
+            gen = self._generation
+        delay = self._debounce_ms if delay_ms is None else delay_ms
+        if delay <= 0:
+            self._enqueue(gen, spec, all_files)
+        else:
+            self._timer = self._after(delay, self._enqueue, gen, spec, all_files)
+
+    def cancel(self):
+        """Drop any pending or running evaluation (e.g. a synchronous refilter)."""
+        self._cancel_timer()
+        with self._cond:
+            self._generation += 1
+            self._queued = None
+        self._last_spec = None
+        self._set_busy(False)
+
+    def mark_applied(self, spec: FilterSpec):
+        """Record *spec* as current after a synchronous refilter by the owner."""
+        self._last_spec = spec
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            try:
+                self._after_cancel(self._timer)
+            except Exception:
+                pass
+            self._timer = None
+
+    def _set_busy(self, busy: bool):
+        if self._on_busy is not None:
+            try:
+                self._on_busy(busy)
+            except Exception:
+                pass
+
+    def _enqueue(self, gen: int, spec: FilterSpec, all_files):
+        self._timer = None
+        if callable(all_files):
+            all_files = all_files()
+        files = list(all_files)   # snapshot: the UI may mutate the original
+        with self._cond:
+            if gen != self._generation:
+                return
+            self._queued = (gen, spec, files)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        self._set_busy(True)
+
+    def _is_stale(self, gen: int) -> bool:
+        return gen != self._generation
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._queued is None:
+                    if not self._cond.wait(timeout=30.0):
+                        if self._queued is None:
+                            self._thread = None
+                            return   # idle: let the thread go
+                gen, spec, files = self._queued
+                self._queued = None
+            try:
+                result = compute_filter(self._db, files, spec,
+                                        lambda: self._is_stale(gen))
+            except Exception:
+                result = None   # keep the current list; just clear "busy"
+            if self._is_stale(gen):
+                continue
+            try:
+                self._post(self._deliver, gen, spec, result)
+            except Exception:
+                pass   # UI already gone
+
+    def _deliver(self, gen: int, spec: FilterSpec, result: list[str] | None):
+        # UI thread. A newer submit() may have happened after the worker
+        # finished — its result will follow, so drop this one.
+        if self._is_stale(gen):
+            return
+        self._set_busy(False)
+        if result is not None:
+            self._on_result(spec, result)
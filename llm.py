@@ -0,0 +1,864 @@
+"""
+llm.py — LLM captioning core: settings, HTTP client, image encoding, batch pipeline.
+
+Everything needed to caption images through an OpenAI-compatible vision
+endpoint, without Tk: used by auto_caption.py (dialog and buttons in the
+app), caption_async.py, caption_jobs.py and the headless cli.py.
+
+Key properties:
+    * ``LLMSettings`` persists to ``auto_caption_settings.ini`` next to the
+      program, shared by the app and the CLI.
+    * ``LLMClient`` keeps keep-alive connections and the auto-detected model
+      id; ``generate_caption()`` captions one image (optionally streamed).
+    * ``caption_many()`` is the threaded batch pipeline: encoding runs ahead
+      of the requests, ``max_concurrency`` requests are kept in flight.
+    * Talks HTTP directly (http.client), so no extra dependency is required;
+      ``HTTP(S)_PROXY`` / ``NO_PROXY`` are honoured as urllib would.
+"""
+
+from __future__ import annotations
+
+import base64
+import collections
+import configparser
+import http.client
+import io
+import json
+import mimetypes
+import os
+import ssl
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, asdict, fields
+
+from PIL import Image
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+_INI_NAME = "auto_caption_settings.ini"
+_SECTION = "llm"
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You write factual image captions in English for image datasets. "
+    "Return one polished plain-text caption only. No markdown, no JSON, no "
+    "bullet points. Describe the main subjects, setting, style, lighting, "
+    "camera/viewpoint, and notable objects without guessing identities."
+)
+
+DEFAULT_USER_PROMPT = (
+    "Write a detailed but clean description of this image in English. Keep it "
+    "useful for recreating the image, but avoid unsupported proper names or "
+    "speculation."
+)
+
+
+BATCH_BACKENDS = ("threads", "asyncio")
+
+
+def settings_path() -> str:
+    """Path to the .ini stored in the program folder (next to this module)."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), _INI_NAME)
+
+
+@dataclass
+class LLMSettings:
+    base_url: str = "http://127.0.0.1:8000/v1"
+    api_key: str = ""
+    model: str = ""
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    user_prompt: str = DEFAULT_USER_PROMPT
+    max_tokens: int = 1000
+    temperature: float = 0.2
+    timeout: float = 180.0
+    # Sampling sent on every request so the result does not depend on the
+    # server's launch-time defaults (aggressive penalties can produce garbage).
+    top_p: float = 0.9
+    presence_penalty: float = 0.0
+    repeat_penalty: float = 1.0
+    # auto | original | png | jpeg : how the image is encoded before sending
+    vision_image_format: str = "auto"
+    # Downscale so the longer side is at most this many pixels before sending
+    # (0 = send full resolution); downscaled / re-encoded JPEGs use jpeg_quality.
+    max_image_side: int = 0
+    jpeg_quality: int = 90
+    # Requests kept in flight by "Caption all" (match llama-server --parallel).
+    max_concurrency: int = 1
+    # threads | asyncio : how "Caption all" drives those requests. asyncio
+    # keeps them all on one event-loop thread (for large max_concurrency).
+    batch_backend: str = "threads"
+    # "Auto-caption" asks for a streamed reply and shows text as it arrives.
+    stream: bool = False
+
+    @classmethod
+    def load(cls, path: str | None = None) -> "LLMSettings":
+        path = path or settings_path()
+        defaults = cls()
+        if not os.path.exists(path):
+            return defaults
+        parser = configparser.ConfigParser()
+        try:
+            parser.read(path, encoding="utf-8")
+        except (OSError, configparser.Error):
+            return defaults
+        if not parser.has_section(_SECTION):
+            return defaults
+
+        sec = parser[_SECTION]
+        values = asdict(defaults)
+        for f in fields(cls):
+            if f.name not in sec:
+                continue
+            raw = sec[f.name]
+            try:
+                if f.type == "bool":
+                    values[f.name] = raw.strip().lower() in ("1", "true", "yes", "on")
+                elif f.type == "int" or f.name == "max_tokens":
+                    values[f.name] = int(raw)
+                elif f.type == "float" or f.name in ("temperature", "timeout"):
+                    values[f.name] = float(raw)
+                else:
+                    values[f.name] = raw
+            except (TypeError, ValueError):
+                pass  # keep default on malformed value
+        return cls(**values)
+
+    def save(self, path: str | None = None) -> str:
+        path = path or settings_path()
+        parser = configparser.ConfigParser()
+        parser[_SECTION] = {k: str(v) for k, v in asdict(self).items()}
+        with open(path, "w", encoding="utf-8") as f:
+            parser.write(f)
+        return path
+
+
+# ---------------------------------------------------------------------------
+# Image encoding + HTTP call
+# ---------------------------------------------------------------------------
+
+# Encoded payloads kept for re-sends of the same image (retries, "Auto-caption"
+# again after editing the prompt); keyed by file identity + encode options.
+PAYLOAD_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class _PayloadCache:
+    """Byte-bounded LRU of data URLs."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: collections.OrderedDict[tuple, str] = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            url = self._items.get(key)
+            if url is not None:
+                self._items.move_to_end(key)
+            return url
+
+    def put(self, key: tuple, url: str):
+        if len(url) > self.max_bytes // 4:
+            return   # one huge payload would flush everything else
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = url
+            self._bytes += len(url)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+_payload_cache = _PayloadCache(PAYLOAD_CACHE_BYTES)
+
+
+def _image_to_data_url(path: str, vision_image_format: str = "auto",
+                       max_side: int = 0, jpeg_quality: int = 90) -> str:
+    """Encode an image file as a base64 ``data:`` URL for the chat payload.
+
+    With *max_side* > 0 larger images are downscaled so their longer side
+    fits (JPEG at *jpeg_quality*, or PNG if that format is forced). Results
+    are cached per file (path, size, mtime) and options.
+    """
+    try:
+        st = os.stat(path)
+        key = (path, st.st_size, st.st_mtime_ns, vision_image_format,
+               max_side, jpeg_quality)
+    except OSError:
+        key = None
+    if key is not None:
+        url = _payload_cache.get(key)
+        if url is not None:
+            return url
+    url = _encode_image(path, vision_image_format, max_side, jpeg_quality)
+    if key is not None:
+        _payload_cache.put(key, url)
+    return url
+
+
+def _encode_image(path: str, vision_image_format: str, max_side: int,
+                  jpeg_quality: int) -> str:
+    fmt = (vision_image_format or "auto").lower().strip()
+    suffix = os.path.splitext(path)[1].lower()
+
+    convert_to: str | None = None
+    if fmt == "png":
+        convert_to = "PNG"
+    elif fmt in ("jpeg", "jpg"):
+        convert_to = "JPEG"
+    elif fmt == "auto" and suffix == ".webp":
+        # Many endpoints choke on webp; re-encode to PNG by default.
+        convert_to = "PNG"
+
+    if max_side > 0:
+        with Image.open(path) as image:
+            if max(image.size) > max_side:
+                if image.format == "JPEG":
+                    # Fast path: let libjpeg decode at 1/2, 1/4 or 1/8 scale
+                    # (never below the target size).
+                    image.draft("RGB", (max_side, max_side))
+                image.thumbnail((max_side, max_side), Image.BICUBIC,
+                                reducing_gap=2.0)
+                return _pil_to_data_url(image, "PNG" if fmt == "png" else "JPEG",
+                                        jpeg_quality)
+
+    if convert_to is None:
+        mime, _ = mimetypes.guess_type(path)
+        mime = mime or "application/octet-stream"
+        with open(path, "rb") as fh:
+            b64 = base64.b64encode(fh.read()).decode("utf-8")
+        return f"data:{mime};base64,{b64}"
+
+    with Image.open(path) as image:
+        return _pil_to_data_url(image, convert_to, jpeg_quality)
+
+
+def _pil_to_data_url(image: Image.Image, convert_to: str, jpeg_quality: int) -> str:
+    if convert_to == "JPEG":
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        mime = "image/jpeg"
+        options = {"quality": jpeg_quality}
+    else:
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        mime = "image/png"
+        options = {}
+    buffer = io.BytesIO()
+    image.save(buffer, format=convert_to, **options)
+    b64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    return f"data:{mime};base64,{b64}"
+
+
+def _chat_completions_url(base_url: str) -> str:
+    base = base_url.rstrip("/")
+    if base.endswith("/chat/completions"):
+        return base
+    if base.endswith("/v1"):
+        return base + "/chat/completions"
+    return base + "/v1/chat/completions"
+
+
+def _models_url(base_url: str) -> str:
+    base = base_url.rstrip("/")
+    if base.endswith("/models"):
+        return base
+    if base.endswith("/v1"):
+        return base + "/models"
+    return base + "/v1/models"
+
+
+# HTTP statuses worth retrying later (rate limits, overloaded / restarting server).
+TRANSIENT_HTTP_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class TransientLLMError(RuntimeError):
+    """A request failure that may succeed if retried: connection errors,
+    timeouts and ``TRANSIENT_HTTP_STATUSES`` replies."""
+
+
+def _http_error(status: int, detail: str) -> RuntimeError:
+    cls = TransientLLMError if status in TRANSIENT_HTTP_STATUSES else RuntimeError
+    return cls(f"LLM request failed: HTTP {status}. {detail}")
+
+
+def _proxy_for(scheme: str, host: str) -> urllib.parse.SplitResult | None:
+    """Proxy for *scheme*://*host* as urllib picks it (``HTTP(S)_PROXY`` /
+    system settings, minus ``NO_PROXY``), or None for a direct connection."""
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    if "://" not in proxy:
+        proxy = "http://" + proxy
+    return urllib.parse.urlsplit(proxy)
+
+
+def _proxy_headers(proxy: urllib.parse.SplitResult) -> dict[str, str]:
+    """``Proxy-Authorization`` for a proxy URL with user:password, else {}."""
+    if proxy.username is None:
+        return {}
+    credentials = (f"{urllib.parse.unquote(proxy.username)}:"
+                   f"{urllib.parse.unquote(proxy.password or '')}")
+    token = base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+    return {"Proxy-Authorization": f"Basic {token}"}
+
+
+def _proxy_address(proxy: urllib.parse.SplitResult) -> tuple[str, int]:
+    return proxy.hostname, proxy.port or (443 if proxy.scheme == "https" else 80)
+
+
+class LLMClient:
+    """HTTP client for one endpoint configuration.
+
+    Keeps idle keep-alive connections per (scheme, host, port) and hands each
+    request its own connection, so parallel batch requests reuse up to
+    ``max_concurrency`` sockets instead of connecting (and TLS-handshaking)
+    per image. The auto-detected model id is fetched once per client.
+    A request that fails on a reused connection the server has meanwhile
+    closed is resent once on a fresh one, provided the server cannot have
+    seen it (see ``_send``). Proxies are honoured like urllib does: plain
+    http goes to the proxy with an absolute-URI request target, https is
+    tunnelled through it with CONNECT.
+    """
+
+    def __init__(self, settings: LLMSettings):
+        self.settings = settings
+        self._idle: dict[tuple, list[http.client.HTTPConnection]] = {}
+        self._proxies: dict[tuple, urllib.parse.SplitResult | None] = {}
+        self._lock = threading.Lock()
+        self._model: str | None = None
+        self._closed = False
+        self.connections_opened = 0
+
+    # -- public API --------------------------------------------------------
+
+    def list_models(self, timeout: float = 5.0) -> list[str]:
+        """Return model ids exposed by the endpoint (empty list on failure)."""
+        try:
+            status, body = self._request("GET", _models_url(self.settings.base_url),
+                                         None, timeout)
+            payload = json.loads(body.decode("utf-8")) if status < 400 else None
+        except (json.JSONDecodeError, OSError, http.client.HTTPException):
+            return []
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if not isinstance(data, list):
+            return []
+        ids = []
+        for item in data:
+            if isinstance(item, dict) and isinstance(item.get("id"), str) and item["id"].strip():
+                ids.append(item["id"].strip())
+        return ids
+
+    def model(self) -> str:
+        """Configured model name, or the server's first model when left blank."""
+        model = self.settings.model.strip()
+        if model:
+            return model
+        with self._lock:
+            if self._model is not None:
+                return self._model
+        # Servers like llama-server expose exactly one model; auto-pick it so
+        # the user doesn't have to type the gguf filename by hand.
+        available = self.list_models()
+        if not available:
+            raise RuntimeError(
+                "No model name is configured and none could be fetched from the "
+                "server. Open LLM settings and set the model (or check the URL)."
+            )
+        with self._lock:
+            self._model = available[0]
+        return available[0]
+
+    def request_caption(self, model: str, image_url: str) -> str:
+        """POST one chat completion for an already encoded image; return the caption."""
+        settings = self.settings
+        data = json.dumps(_caption_payload(settings, model, image_url)).encode("utf-8")
+        try:
+            status, body = self._request(
+                "POST", _chat_completions_url(settings.base_url), data,
+                settings.timeout)
+        except (OSError, http.client.HTTPException) as exc:
+            raise TransientLLMError(
+                f"Cannot reach LLM at {settings.base_url}: {exc}"
+            ) from exc
+        if status >= 400:
+            raise _http_error(status, body.decode("utf-8", errors="replace")[:500])
+        return _parse_caption(body.decode("utf-8", errors="replace"))
+
+    def stream_caption(self, model: str, image_url: str, on_delta) -> str:
+        """Like ``request_caption`` but streamed (``stream: true``, SSE).
+
+        ``on_delta(text)`` is called on this thread with the caption text
+        received so far, once per content chunk. The return value (and the
+        empty / reasoning-only checks) match the non-streamed call. A server
+        that ignores ``stream`` and answers with plain JSON is handled too.
+        """
+        settings = self.settings
+        payload = _caption_payload(settings, model, image_url)
+        payload["stream"] = True
+        data = json.dumps(payload).encode("utf-8")
+        try:
+            held, response = self._send(
+                "POST", _chat_completions_url(settings.base_url), data,
+                settings.timeout, accept="text/event-stream")
+        except (OSError, http.client.HTTPException) as exc:
+            raise TransientLLMError(
+                f"Cannot reach LLM at {settings.base_url}: {exc}"
+            ) from exc
+        try:
+            if response.status >= 400:
+                raise _http_error(response.status,
+                                  response.read().decode("utf-8", errors="replace")[:500])
+            ctype = response.getheader("Content-Type") or ""
+            if "text/event-stream" not in ctype:
+                caption = _parse_caption(response.read().decode("utf-8", errors="replace"))
+                on_delta(caption)
+            else:
+                caption = _read_stream(response, on_delta)
+                response.read()   # drain the terminating chunk so the socket is reusable
+        except (OSError, http.client.HTTPException) as exc:
+            held[1].close()
+            raise TransientLLMError(
+                f"Connection to {settings.base_url} lost while streaming: {exc}"
+            ) from exc
+        except BaseException:
+            held[1].close()
+            raise
+        self._release(held, response)
+        return caption
+
+    def close(self):
+        """Close idle connections (in-flight ones close when returned)."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    # -- transport ---------------------------------------------------------
+
+    def _request(self, method: str, url: str, data: bytes | None,
+                 timeout: float) -> tuple[int, bytes]:
+        held, response = self._send(method, url, data, timeout)
+        try:
+            body = response.read()
+        except BaseException:
+            held[1].close()
+            raise
+        self._release(held, response)
+        return response.status, body
+
+    def _send(self, method: str, url: str, data: bytes | None, timeout: float,
+              accept: str = "application/json"):
+        """Send a request and read the status line; returns (held, response).
+
+        *held* is ``(pool key, connection)``: the caller reads the body and
+        then hands both to ``_release``, or closes the connection on failure.
+        """
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        headers = {"Accept": accept}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        if self.settings.api_key.strip():
+            headers["Authorization"] = f"Bearer {self.settings.api_key.strip()}"
+        proxy = self._proxy(key)
+        if proxy is not None and parts.scheme == "http":
+            # Forward proxy: absolute-URI target (http.client takes Host from it).
+            path = urllib.parse.urlunsplit(parts._replace(fragment=""))
+            headers.update(_proxy_headers(proxy))
+
+        conn, reused = self._acquire(key, timeout)
+        sent = False
+        try:
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                sent = True
+                response = conn.getresponse()
+            except (ConnectionResetError, BrokenPipeError) as exc:
+                # Resend only what the server never saw: the request could not
+                # be written, or the idle keep-alive connection was closed
+                # without a byte of reply (RemoteDisconnected). Anything later
+                # may already be generating, and would be billed twice.
+                unseen = not sent or isinstance(exc, http.client.RemoteDisconnected)
+                if not (reused and unseen):
+                    raise
+                conn.close()
+                conn = self._connect(key, timeout)
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+        return (key, conn), response
+
+    def _release(self, held: tuple, response):
+        """Return a connection whose response was read in full to the pool."""
+        key, conn = held
+        with self._lock:
+            if not (response.will_close or self._closed):
+                self._idle.setdefault(key, []).append(conn)
+                return
+        conn.close()
+
+    def _acquire(self, key: tuple, timeout: float):
+        with self._lock:
+            conns = self._idle.get(key)
+            conn = conns.pop() if conns else None
+        if conn is None:
+            return self._connect(key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _proxy(self, key: tuple) -> urllib.parse.SplitResult | None:
+        with self._lock:
+            if key in self._proxies:
+                return self._proxies[key]
+        proxy = _proxy_for(key[0], key[1])
+        with self._lock:
+            self._proxies[key] = proxy
+        return proxy
+
+    def _connect(self, key: tuple, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        with self._lock:
+            self.connections_opened += 1
+        proxy = self._proxy(key)
+        if proxy is None:
+            address = (host, port)
+        else:
+            address = _proxy_address(proxy)
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(*address, timeout=timeout,
+                                               context=ssl.create_default_context())
+            if proxy is not None:
+                conn.set_tunnel(host, port, headers=_proxy_headers(proxy))
+            return conn
+        return http.client.HTTPConnection(*address, timeout=timeout)
+
+
+def list_models(settings: "LLMSettings", timeout: float = 5.0) -> list[str]:
+    """Return model ids exposed by the endpoint (empty list on failure)."""
+    client = LLMClient(settings)
+    try:
+        return client.list_models(timeout)
+    finally:
+        client.close()
+
+
+def generate_caption(settings: LLMSettings, image_path: str,
+                     client: LLMClient | None = None, on_delta=None) -> str:
+    """Send the image to the LLM and return a plain-text English caption.
+
+    Pass a long-lived *client* to reuse its connections and model id. With
+    *on_delta* and ``settings.stream`` the reply is streamed and
+    ``on_delta(text_so_far)`` is called from this thread as it arrives.
+    Raises RuntimeError with a user-facing message on any failure.
+    """
+    own = client is None
+    if own:
+        client = LLMClient(settings)
+    try:
+        model = client.model()
+        image_url = _image_to_data_url(image_path, settings.vision_image_format,
+                                       settings.max_image_side, settings.jpeg_quality)
+        if on_delta is not None and settings.stream:
+            return client.stream_caption(model, image_url, on_delta)
+        return client.request_caption(model, image_url)
+    finally:
+        if own:
+            client.close()
+
+
+def _caption_payload(settings: LLMSettings, model: str, image_url: str) -> dict:
+    return {
+        "model": model,
+        "temperature": settings.temperature,
+        "top_p": settings.top_p,
+        "presence_penalty": settings.presence_penalty,
+        # llama.cpp's name; OpenAI-style servers ignore unknown keys.
+        "repeat_penalty": settings.repeat_penalty,
+        "max_tokens": settings.max_tokens,
+        "messages": [
+            {"role": "system", "content": settings.system_prompt},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": settings.user_prompt},
+                    {"type": "image_url", "image_url": {"url": image_url}},
+                ],
+            },
+        ],
+    }
+
+
+def _parse_caption(body: str) -> str:
+    """Extract the caption from a chat-completion response body."""
+    try:
+        parsed = json.loads(body)
+        choice = parsed["choices"][0]
+        message = choice["message"]
+        content = message.get("content")
+    except (json.JSONDecodeError, KeyError, IndexError, TypeError) as exc:
+        raise RuntimeError(f"Unexpected LLM response: {body[:500]}") from exc
+
+    return _finish_caption(_content_text(content),
+                           bool((message.get("reasoning_content") or "").strip()),
+                           choice.get("finish_reason"))
+
+
+def _content_text(content) -> str:
+    if isinstance(content, list):  # some servers return content parts
+        return "".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    return content if isinstance(content, str) else ""
+
+
+def _read_stream(response, on_delta) -> str:
+    """Accumulate ``choices[0].delta`` chunks of an SSE chat-completion stream."""
+    parts: list[str] = []
+    reasoning = False
+    finish = None
+    while True:
+        line = response.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line.startswith(b"data:"):
+            continue   # blank separators, comments, "event:" lines
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(chunk, dict) and "error" in chunk:
+            raise RuntimeError(f"LLM stream error: {str(chunk['error'])[:500]}")
+        try:
+            choice = chunk["choices"][0]
+        except (KeyError, IndexError, TypeError):
+            continue   # e.g. a final usage-only chunk
+        delta = choice.get("delta") or {}
+        text = _content_text(delta.get("content"))
+        if (delta.get("reasoning_content") or "").strip():
+            reasoning = True
+        finish = choice.get("finish_reason") or finish
+        if text:
+            parts.append(text)
+            on_delta("".join(parts))
+    return _finish_caption("".join(parts), reasoning, finish)
+
+
+def _finish_caption(content: str, reasoning: bool, finish) -> str:
+    """Clean up the reply text, or explain why there is no caption."""
+    caption = content.strip().strip('"').strip()
+    if caption:
+        return caption
+
+    # Reasoning models may leave content empty and put text in reasoning_content.
+    # That text is the model's thinking, not a finished caption, so we don't use
+    # it — but we point the user at the real cause.
+    if reasoning:
+        raise RuntimeError(
+            "The model returned only reasoning/thinking text and no caption. "
+            "This is usually a reasoning model or an aggressive sampling setup. "
+            "Try a non-reasoning vision model, or relaunch the server without "
+            "high presence/repeat penalties."
+        )
+    raise RuntimeError(
+        f"LLM returned an empty caption (finish_reason={finish}). Check the model "
+        "and the server's sampling settings."
+    )
+
+
+# ---------------------------------------------------------------------------
+# Batch pipeline: encode ahead, keep N requests in flight
+# ---------------------------------------------------------------------------
+
+ENCODE_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+# Encoded-but-unsent payloads kept at most (data URLs; estimated from the
+# file size until an encode finishes). One image is always allowed.
+ENCODE_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class BatchStats:
+    """Per-stage timings of a batch run (seconds, summed over images)."""
+    encode_s: float = 0.0
+    encoded: int = 0
+    request_s: float = 0.0
+    requests: int = 0
+    persist_s: float = 0.0
+    persisted: int = 0
+    wall_s: float = 0.0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        """Record one image's time in *stage* ("encode", "request", "persist")."""
+        count = {"encode": "encoded", "request": "requests",
+                 "persist": "persisted"}[stage]
+        with self._lock:
+            setattr(self, f"{stage}_s", getattr(self, f"{stage}_s") + seconds)
+            setattr(self, count, getattr(self, count) + 1)
+
+    def summary(self) -> str:
+        def avg(total, n):
+            return f"{total / n * 1000:.0f} ms" if n else "-"
+        return (f"encode {avg(self.encode_s, self.encoded)}, "
+                f"request {avg(self.request_s, self.requests)}, "
+                f"save {avg(self.persist_s, self.persisted)} per image; "
+                f"{self.wall_s:.1f} s total")
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def _encode_estimate(image_path: str) -> int:
+    try:
+        return os.path.getsize(image_path) * 4 // 3
+    except OSError:
+        return 0
+
+
+def caption_many(settings: LLMSettings, items, *, on_result,
+                 should_stop=lambda: False, poll: float = 0.1,
+                 stats: BatchStats | None = None,
+                 client: LLMClient | None = None) -> bool:
+    """Caption ``(key, image_path)`` pairs as a two-stage pipeline.
+
+    Encoding (decode / re-encode / base64) runs on ``ENCODE_WORKERS`` threads
+    ahead of the requests, bounded by ``ENCODE_BUDGET_BYTES``; requests are
+    sent in item order with ``settings.max_concurrency`` of them in flight.
+
+    ``on_result(key, image_path, caption, error)`` is called on the calling
+    thread as each request completes (exactly one of caption / error is
+    None). *should_stop* is checked at least every *poll* seconds; once it
+    returns True nothing new is started and the call returns at once.
+    Requests already in flight are not waited for: their results are still
+    passed to ``on_result``, from the pool thread, when they arrive.
+
+    Requests go through *client* (a temporary one when omitted), so each
+    request slot keeps its keep-alive connection across images.
+
+    Raises RuntimeError if no model is configured and none can be fetched.
+    Returns True if stopped early.
+    """
+    t_start = time.perf_counter()
+    own = client is None
+    if own:
+        client = LLMClient(settings)
+    workers = max(1, int(settings.max_concurrency))
+    prefetch = workers + ENCODE_WORKERS
+    pending = iter(items)
+    held = None            # next item, waiting for room in the budget
+    exhausted = False
+    # Encodes in item order: [key, image_path, future, estimated size]
+    encoding: collections.deque[list] = collections.deque()
+    in_flight: dict = {}   # request Future -> (key, image_path)
+    encoders = ThreadPoolExecutor(max_workers=ENCODE_WORKERS,
+                                  thread_name_prefix="caption-encode")
+    senders = ThreadPoolExecutor(max_workers=workers,
+                                 thread_name_prefix="caption")
+
+    def deliver(fut, key, image_path):
+        try:
+            caption, secs = fut.result()
+        except Exception as exc:
+            on_result(key, image_path, None, exc)
+        else:
+            if stats is not None:
+                stats.add("request", secs)
+            on_result(key, image_path, caption, None)
+
+    def buffered() -> int:
+        total = 0
+        for entry in encoding:
+            fut = entry[2]
+            if fut.done() and fut.exception() is None:
+                total += len(fut.result()[0])
+            else:
+                total += entry[3]
+        return total
+
+    stopped = False
+    try:
+        model = client.model()
+        while True:
+            # 1. encode ahead, within the prefetch depth and memory budget
+            while not (stopped or exhausted) and len(encoding) < prefetch:
+                if should_stop():
+                    stopped = True
+                    break
+                if held is None:
+                    try:
+                        key, image_path = next(pending)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    held = (key, image_path, _encode_estimate(image_path))
+                key, image_path, estimate = held
+                if encoding and buffered() + estimate > ENCODE_BUDGET_BYTES:
+                    break
+                held = None
+                fut = encoders.submit(_timed, _image_to_data_url, image_path,
+                                      settings.vision_image_format,
+                                      settings.max_image_side,
+                                      settings.jpeg_quality)
+                encoding.append([key, image_path, fut, estimate])
+
+            # 2. send finished encodes, in order, into free request slots
+            while (not stopped and encoding and len(in_flight) < workers
+                   and encoding[0][2].done()):
+                key, image_path, fut, _ = encoding.popleft()
+                try:
+                    image_url, secs = fut.result()
+                except Exception as exc:
+                    on_result(key, image_path, None, exc)
+                    continue
+                if stats is not None:
+                    stats.add("encode", secs)
+                req = senders.submit(_timed, client.request_caption, model,
+                                     image_url)
+                in_flight[req] = (key, image_path)
+
+            if stopped or (exhausted and not encoding and not in_flight):
+                break
+            waiting = list(in_flight)
+            if encoding and len(in_flight) < workers:
+                waiting.append(encoding[0][2])
+            done, _ = wait(waiting, timeout=poll, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut in in_flight:
+                    deliver(fut, *in_flight.pop(fut))
+            stopped = should_stop()
+    finally:
+        for fut, (key, image_path) in in_flight.items():
+            fut.add_done_callback(
+                lambda f, k=key, p=image_path: deliver(f, k, p))
+        encoders.shutdown(wait=False, cancel_futures=True)
+        senders.shutdown(wait=False, cancel_futures=True)
+        if own:
+            client.close()   # requests still in flight close theirs when done
+        if stats is not None:
+            stats.wall_s = time.perf_counter() - t_start
+    return stopped
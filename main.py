@@ -1,42 +1,58 @@
 ﻿import os
 import queue
+import sys
+import time
 from tkinter import *
 from tkinter import ttk
 from tkinter import filedialog, messagebox, simpledialog
-from idlelib.tooltip import Hovertip
-from PIL import Image, ImageTk
+from PIL import Image
 import subprocess
 import platform
-from deep_translator import GoogleTranslator
-from tkinterdnd2 import TkinterDnD, DND_FILES # for drag-and-drop feature
+from typing import TYPE_CHECKING
 
-from db import ImageDB
+from db import ImageDB, ThumbWorker
+from thumb_cache import ThumbCache, THUMB_CACHE
+from live_filter import LiveFilter, FilterSpec, compute_filter, path_in_dir
 from thumb_view import ThumbnailView
+from list_view import VirtualListView
+from image_set import ImageSet
 from extract_text import extract_text_nodes
-from auto_caption import AutoCaptioner
-
-try:
-    from watchdog.observers import Observer
-    from watchdog.events import FileSystemEventHandler
-    _WATCHDOG_OK = True
-except Exception:                       # watchdog optional / missing
-    Observer = None
-    FileSystemEventHandler = object
-    _WATCHDOG_OK = False
+from dedupe import HashWorker, duplicate_order
+from folder_loader import FolderLoader
+from prefetch import ImagePrefetcher, scale_to_fit
+
+# Optional / slow-to-import modules are loaded on first use so the window
+# paints immediately: deep_translator (Translate), watchdog (folder watcher),
+# tkinterdnd2 (drag-out, after the first paint), idlelib.tooltip (after the
+# first paint), PIL.ImageTk (first image shown) and auto_caption + llm (first
+# LLM button press).
+if TYPE_CHECKING:
+    from PIL import ImageTk
+
+# Set to print "first-paint <unix time>" on stderr once the window is drawn
+# (used by benchmarks/bench_startup.py).
+_STARTUP_TRACE = os.environ.get("IMAGE_CAPTION_STARTUP_TRACE") == "1"
 
 _IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp")
 
 
-class _NewFileHandler(FileSystemEventHandler):
+class _NewFileHandler:
     """Pushes paths of newly-created image files onto a queue (watcher thread).
 
     Only enqueues; never touches Tk/DB. Additions only — created and the
     destination of a move (apps that write-temp-then-rename count as adds).
+    Duck-types watchdog's FileSystemEventHandler (``dispatch``) so the module
+    does not import watchdog before the first folder is opened.
     """
 
     def __init__(self, q: "queue.Queue"):
         self._q = q
 
+    def dispatch(self, event):
+        handler = getattr(self, f"on_{event.event_type}", None)
+        if handler is not None:
+            handler(event)
+
     def _maybe_enqueue(self, path):
         if path and not isinstance(path, bytes) and path.lower().endswith(_IMAGE_EXTS):
             self._q.put(path)
@@ -57,36 +73,121 @@ class ImageCaptionApp:
 
         # ---- DB / state ----
         self.db = ImageDB()
+        self.thumb_cache = ThumbCache() if THUMB_CACHE else None   # shared across folders
 
         # In-memory image list (list of rel paths, ordered by rel_path)
-        self.image_files:     list[str] = []   # current (possibly filtered)
-        self.all_image_files: list[str] = []   # full unfiltered list
+        self.image_files:     ImageSet = ImageSet()   # current (possibly filtered)
+        self.all_image_files: ImageSet = ImageSet()   # full unfiltered list
+        self._caption_lengths: dict[str, int] = {}   # rel_path -> caption length
         self.image_directory: str = ""
         self.image_index:     int = 0
 
         self.current_image:        str | None = None
         self.current_caption_file: str | None = None
         self.original_image:       Image.Image | None = None
-        self.photo:                ImageTk.PhotoImage | None = None
+        self.photo:                "ImageTk.PhotoImage | None" = None
 
         self.view_mode = "list"
 
+        # ---- neighbours decoded and scaled ahead of navigation ----
+        self._prefetcher = ImagePrefetcher()
+
         # ---- filesystem watcher (additions only) ----
         self._fs_queue: queue.Queue = queue.Queue()
         self._observer = None
 
-        # ---- auto-captioning (external LLM) ----
-        self.auto_captioner = AutoCaptioner(self)
+        # ---- auto-captioning (external LLM), created on first use ----
+        self._auto_captioner = None
+        self._auto_caption_button: Button | None = None
+        self._caption_all_button: Button | None = None
+
+        # ---- folder loading (scan + sync streamed from a worker thread) ----
+        self._loading = False
+        self._loader = FolderLoader(
+            self.db,
+            post=lambda fn, *a: self.root.after(0, fn, *a),
+            on_chunk=self._on_load_chunk,
+            on_done=self._on_load_done,
+            on_error=self._on_load_error,
+        )
+
+        # (widget, text) tooltips, attached after the first paint
+        self._tooltips: list[tuple] = []
+
+        # ---- search-as-you-type (debounced, evaluated off the Tk thread) ----
+        self._live_filter = LiveFilter(
+            self.db,
+            after=self.root.after,
+            after_cancel=self.root.after_cancel,
+            post=lambda fn, *a: self.root.after(0, fn, *a),
+            on_result=self._on_live_filter_result,
+            on_busy=self._set_filtering,
+        )
+
+        # ---- perceptual hashes for the "Duplicates" filter (on demand) ----
+        self._hash_worker = HashWorker(
+            self.db,
+            post=lambda fn, *a: self.root.after(0, fn, *a),
+            generate=ThumbWorker._generate,
+            on_progress=self._set_hash_progress,
+            on_done=self._on_hashes_done,
+        )
 
         # ---- UI build ----
         self._build_ui()
 
-        self.load_images()
-        self.display_image()
         root.state("zoomed")
         root.after(200, root.focus_force)
         self.root.after(700, self._poll_fs_queue)
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        # Paint the empty window first; the folder prompt, the scan and the
+        # optional extras follow.
+        self._first_paint_id = self._container.bind("<Expose>", self._on_first_expose, "+")
+
+    def _on_first_expose(self, event=None):
+        self._container.unbind("<Expose>", self._first_paint_id)
+        # Idle callbacks queued by the expose (the actual redraw) run first.
+        self.root.after_idle(self._after_first_paint)
+
+    def _after_first_paint(self):
+        if _STARTUP_TRACE:
+            print(f"first-paint {time.time():.6f}", file=sys.stderr, flush=True)
+        self._install_tooltips()
+        self._enable_drag_out()
+        self.load_images()
+
+    @property
+    def auto_captioner(self):
+        """The AutoCaptioner (imports auto_caption / llm on first access)."""
+        if self._auto_captioner is None:
+            from auto_caption import AutoCaptioner
+            self._auto_captioner = AutoCaptioner(self)
+            self._auto_captioner.button = self._auto_caption_button
+            self._auto_captioner.batch_button = self._caption_all_button
+        return self._auto_captioner
+
+    def _tooltip(self, widget, text: str):
+        self._tooltips.append((widget, text))
+
+    def _install_tooltips(self):
+        from idlelib.tooltip import Hovertip
+        for widget, text in self._tooltips:
+            Hovertip(widget, text=text)
+        self._tooltips = []
+
+    def _enable_drag_out(self):
+        """Enable OS-level drag-out of the current image file (e.g. into browser upload).
+
+        Loads the tkdnd Tcl extension into the running root; without
+        tkinterdnd2 (or its native library) drag-out is simply unavailable.
+        """
+        try:
+            from tkinterdnd2 import TkinterDnD, DND_FILES
+            TkinterDnD.require(self.root)
+            self.image_label.drag_source_register(1, DND_FILES)
+            self.image_label.dnd_bind("<<DragInitCmd>>", self._on_drag_init)
+        except Exception:
+            pass
 
     # ==================================================================
     # UI construction
@@ -94,7 +195,7 @@ class ImageCaptionApp:
 
     def _build_ui(self):
         root = self.root
-        container = Frame(root)
+        container = self._container = Frame(root)
         container.pack(fill=BOTH, expand=True)
         container.grid_rowconfigure(1, weight=1)
         container.grid_columnconfigure(0, weight=1)
@@ -110,14 +211,14 @@ class ImageCaptionApp:
             ("Cancel",         self.load_caption,         "Return to original prompt"),
             ("Delete",         self.delete_current_image, "Delete current image and caption file"),
             ("New folder",     self.create_subfolder,     "in current folder"),
-            ("Auto-caption",   self.auto_captioner.generate_for_current, "Generate a caption for the current image via an external LLM"),
-            ("Caption all",    self.auto_captioner.generate_for_all_missing, "Generate captions for all images that have no caption yet"),
-            ("LLM settings",   self.auto_captioner.open_settings, "Configure the LLM connection used for auto-captioning"),
+            ("Auto-caption",   lambda: self.auto_captioner.generate_for_current(), "Generate a caption for the current image via an external LLM"),
+            ("Caption all",    lambda: self.auto_captioner.generate_for_all_missing(), "Generate captions for all images that have no caption yet"),
+            ("LLM settings",   lambda: self.auto_captioner.open_settings(), "Configure the LLM connection used for auto-captioning"),
         ]:
             btn = Button(b_frame, text=text, command=cmd)
             btn.pack(side=LEFT, padx=2, pady=2)
             if tip:
-                Hovertip(btn, text=tip)
+                self._tooltip(btn, tip)
             if text == "Save":
                 self.save_button = btn
             elif text == "Cancel":
@@ -125,9 +226,9 @@ class ImageCaptionApp:
             elif text == "Delete":
                 self.delete_button = btn
             elif text == "Auto-caption":
-                self.auto_captioner.button = btn
+                self._auto_caption_button = btn
             elif text == "Caption all":
-                self.auto_captioner.batch_button = btn
+                self._caption_all_button = btn
 
         # ---- main split frame ----
         main_frame = Frame(container)
@@ -167,14 +268,7 @@ class ImageCaptionApp:
         self.image_label.grid(row=1, column=0, sticky="nsew", padx=2, pady=2)
         self.image_label.bind("<Configure>", self.resize_image)
         self.image_label.bind("<Double-Button-1>", self.open_image)
-        # Enable OS-level drag-out of the current image file (e.g. into browser upload).
-        # Note: requires the root to be created via TkinterDnD.Tk(); in plain Tk (tests),
-        # tkdnd commands are not available.
-        try:
-            self.image_label.drag_source_register(1, DND_FILES)
-            self.image_label.dnd_bind("<<DragInitCmd>>", self._on_drag_init)
-        except Exception:
-            pass
+        # OS-level drag-out is registered after the first paint (_enable_drag_out).
 
         text_frame = Frame(img_frame, height=text_frame_height)
         text_frame.grid(row=2, column=0, sticky="nsew")
@@ -249,10 +343,13 @@ class ImageCaptionApp:
         Label(filter_frame, text="Filter:").grid(row=0, column=0, padx=(0, 2))
         filter_entry_frame = Frame(filter_frame)
         filter_entry_frame.grid(row=0, column=1, sticky="ew", padx=2)
+        self.filter_status_label = Label(filter_entry_frame, text="", fg="gray", font=("", 8))
+        self.filter_status_label.pack(side=RIGHT)
         self.filter_entry = Entry(filter_entry_frame)
         self.filter_entry.pack(fill=X, expand=True)
+        self.filter_entry.bind("<KeyRelease>", self._on_filter_typed)
         self.filter_entry.bind("<Return>", self.filter_files)
-        Hovertip(self.filter_entry, text="Enter text and press Enter to filter by caption content")
+        self._tooltip(self.filter_entry, "Type words to filter by caption content or path")
         self.clear_filter_button = Button(filter_frame, text="Clear", command=self.clear_filter)
         self.clear_filter_button.grid(row=0, column=2, padx=2)
         dir_filter_frame = Frame(filter_frame)
@@ -260,10 +357,22 @@ class ImageCaptionApp:
         self.dir_filter = ttk.Combobox(dir_filter_frame, state="readonly", height=40)
         self.dir_filter.pack(fill=X, expand=True)
         self.dir_filter.bind("<<ComboboxSelected>>", self.filter_files)
-        Hovertip(self.dir_filter, text="Filter list by folder")
+        self._tooltip(self.dir_filter, "Filter list by folder")
         self.show_empty_var = BooleanVar()
         Checkbutton(filter_frame, text="Show empty", variable=self.show_empty_var,
                     command=self.filter_files).grid(row=0, column=4, padx=2)
+        self.substring_var = BooleanVar()
+        substring_cb = Checkbutton(filter_frame, text="Substring", variable=self.substring_var,
+                                   command=self.filter_files)
+        substring_cb.grid(row=0, column=5, padx=2)
+        self._tooltip(substring_cb, "Match plain substrings instead of words.\n"
+                 "Word search supports prefix*, \"exact phrases\" and AND / OR / NOT.")
+        self.show_dupes_var = BooleanVar()
+        dupes_cb = Checkbutton(filter_frame, text="Duplicates", variable=self.show_dupes_var,
+                               command=self._toggle_duplicates)
+        dupes_cb.grid(row=0, column=6, padx=2)
+        self._tooltip(dupes_cb, "Show only images that look like another image, grouped together.\n"
+                 "Hashes are computed in the background the first time.")
 
         # mode toggle bar
         mode_frame = Frame(nav_frame)
@@ -282,26 +391,25 @@ class ImageCaptionApp:
         self.thumb_progress_label = Label(mode_frame, text="", fg="gray", font=("", 8))
         # hidden until generation starts
 
-        # file list (path + caption length), sortable
+        # folder loading: busy bar + count + Stop, shown while a folder loads
+        self.load_progress_bar = ttk.Progressbar(
+            mode_frame, orient=HORIZONTAL, mode="indeterminate", length=60
+        )
+        self.load_progress_label = Label(mode_frame, text="", fg="gray", font=("", 8))
+        self.load_cancel_button = Button(mode_frame, text="Stop", font=("", 8),
+                                         command=self._cancel_loading)
+
+        # file list (path + caption length), sortable, virtualized
         self._sort_state = {"col": None, "reverse": False}
-        self.file_list = ttk.Treeview(
+        self.file_list = VirtualListView(
             nav_frame,
-            columns=("path", "len"),
-            show="headings",
-            selectmode="browse",
+            display=self._reldisp,
+            on_select=lambda idx: self.select_image(index=idx),
+            on_sort=self._sort_by_column,
         )
-        self.file_list.heading("path", text="File", command=lambda: self._sort_by_column("path"))
-        self.file_list.heading("len", text="Len", command=lambda: self._sort_by_column("len"))
-        self.file_list.column("path", anchor="w", stretch=True)
-        self.file_list.column("len", anchor="e", width=56, stretch=False, minwidth=40)
-        self.file_list.grid(row=2, column=0, sticky="nsew", padx=(2, 0), pady=2)
-        self.file_list.bind("<<TreeviewSelect>>", self.on_file_select)
+        self.file_list.grid(row=2, column=0, columnspan=2, sticky="nsew", padx=2, pady=2)
         self.file_list.bind("<FocusOut>", lambda e: self.root.after_idle(self.restore_listbox_selection))
 
-        self.scrollbar = Scrollbar(nav_frame, orient=VERTICAL, command=self.file_list.yview, width=18)
-        self.scrollbar.grid(row=2, column=1, sticky="ns", padx=(0, 2), pady=2)
-        self.file_list.configure(yscrollcommand=self.scrollbar.set)
-
         # Thumbnail panel — fully encapsulated in ThumbnailView.
         self.thumb_view = ThumbnailView(
             parent=nav_frame,
@@ -309,6 +417,7 @@ class ImageCaptionApp:
             on_select=lambda idx: self.select_image(index=idx),
             on_open=self._open_image_rp,
             on_progress=self._set_thumb_progress,
+            cache=self.thumb_cache,
         )
 
     # ==================================================================
@@ -322,8 +431,7 @@ class ImageCaptionApp:
         self.list_mode_btn.config(relief=SUNKEN)
         self.thumb_mode_btn.config(relief=RAISED)
         self.thumb_view.grid_remove()
-        self.file_list.grid(row=2, column=0, sticky="nsew", padx=(2, 0), pady=2)
-        self.scrollbar.grid(row=2, column=1, sticky="ns", padx=(0, 2), pady=2)
+        self.file_list.grid(row=2, column=0, columnspan=2, sticky="nsew", padx=2, pady=2)
         self.restore_listbox_selection()
 
     def switch_to_thumbs(self):
@@ -333,7 +441,6 @@ class ImageCaptionApp:
         self.thumb_mode_btn.config(relief=SUNKEN)
         self.list_mode_btn.config(relief=RAISED)
         self.file_list.grid_remove()
-        self.scrollbar.grid_remove()
         self.thumb_view.grid(row=2, column=0, columnspan=2,
                              sticky="nsew", padx=2, pady=2)
         self.thumb_view.set_images(self.image_files, self.image_index)
@@ -378,12 +485,9 @@ class ImageCaptionApp:
     # ==================================================================
 
     def _rebuild_file_list(self):
-        """Repopulate Treeview from self.image_files (iid = rel_path)."""
-        tv = self.file_list
-        tv.delete(*tv.get_children())
-        lengths = self.db.get_caption_lengths()
-        for rp in self.image_files:
-            tv.insert("", END, iid=rp, values=(self._reldisp(rp), lengths.get(rp, 0)))
+        """Point the list view at self.image_files (only visible rows are drawn)."""
+        self.file_list.set_images(self.image_files, self._caption_lengths,
+                                  self.image_index)
 
     def _sort_by_column(self, col: str):
         """Sort self.image_files by column; toggle direction when same column."""
@@ -399,34 +503,49 @@ class ImageCaptionApp:
         self.restore_listbox_selection()
 
     def _apply_current_sort(self):
-        """Reorder self.image_files per _sort_state and refresh the tree.
+        """Reorder self.image_files per _sort_state and refresh the list.
 
-        Reorders Treeview items in place via `move()` so the current scroll
-        position and selection are preserved. Callers that need the current
-        row scrolled into view should invoke `see()` explicitly.
+        Sorts in place and repaints only the visible rows, so the current
+        scroll position is preserved. Callers that need the current row
+        scrolled into view should invoke `restore_listbox_selection()`.
         """
-        if not self.image_files or self._sort_state["col"] is None:
+        key, rev = self._sort_key()
+        if not self.image_files or key is None:
             return
-        col, rev = self._sort_state["col"], self._sort_state["reverse"]
-        lengths = self.db.get_caption_lengths()
         cur_rp = self.current_image
-        if col == "path":
-            key = lambda rp: self._reldisp(rp).lower()
-        else:
-            key = lambda rp: (lengths.get(rp, 0), self._reldisp(rp).lower())
         self.image_files.sort(key=key, reverse=rev)
-        tv = self.file_list
-        existing = set(tv.get_children(""))
-        for i, rp in enumerate(self.image_files):
-            if rp in existing:
-                tv.move(rp, "", i)
-            else:
-                tv.insert("", i, iid=rp,
-                          values=(self._reldisp(rp), lengths.get(rp, 0)))
         if cur_rp and cur_rp in self.image_files:
             self.image_index = self.image_files.index(cur_rp)
         else:
             self.image_index = min(self.image_index, len(self.image_files) - 1)
+        self.file_list.refresh()
+        self.file_list.set_current(self.image_index, ensure_visible=False)
+        if self.view_mode == "thumbs":
+            self.thumb_view.refresh(self.image_index)
+
+    def _sort_key(self):
+        """(key, reverse) for the current sort column; key is None if unsorted."""
+        col, rev = self._sort_state["col"], self._sort_state["reverse"]
+        lengths = self._caption_lengths
+        if col == "path":
+            return (lambda rp: self._reldisp(rp).lower()), rev
+        if col == "len":
+            return (lambda rp: (lengths.get(rp, 0), self._reldisp(rp).lower())), rev
+        return None, False
+
+    def _resort_one(self, rp: str):
+        """Move *rp* to its place under the current sort after its key changed."""
+        key, rev = self._sort_key()
+        if key is None or rp not in self.image_files:
+            return
+        self.image_files.remove(rp)
+        self.image_files.insert_sorted(rp, key=key, reverse=rev)
+        if self.current_image in self.image_files:
+            self.image_index = self.image_files.index(self.current_image)
+        self.file_list.refresh()
+        self.file_list.set_current(self.image_index, ensure_visible=False)
+        if self.view_mode == "thumbs":
+            self.thumb_view.refresh(self.image_index)
 
     def _reldisp(self, rp: str) -> str:
         r"""Relative path for display in file list (backslash, root = \)."""
@@ -445,9 +564,17 @@ class ImageCaptionApp:
         abs_path = self.db._abs(rp)
         self.current_caption_file = os.path.splitext(abs_path)[0] + ".txt"
 
+        box = self._label_box()
         try:
-            self.original_image = Image.open(abs_path)
-            self.resize_image()
+            # A prefetched image needs no decode here; the original is only
+            # opened again if the window is resized (resize_image).
+            scaled = self._prefetcher.get(abs_path, box) if box else None
+            self.original_image = None if scaled is not None else Image.open(abs_path)
+            if scaled is None and box:
+                scaled = scale_to_fit(self.original_image, box)
+                self._prefetcher.put(abs_path, box, scaled)
+            if scaled is not None:
+                self._show_scaled(scaled)
         except Exception as e:
             messagebox.showerror("Error", f"Cannot open image: {e}")
             return
@@ -466,14 +593,14 @@ class ImageCaptionApp:
         # populate EXIF tabs with per-node text extracted from the image
         self.update_exif_tabs(extract_text_nodes(abs_path))
 
-        rp_sel = self.image_files[self.image_index]
-        self.file_list.selection_set(rp_sel)
-        if scroll_into_view:
-            self.file_list.see(rp_sel)
+        self.file_list.set_current(self.image_index, ensure_visible=scroll_into_view)
 
         if self.view_mode == "thumbs":
             self.thumb_view.set_current(self.image_index, ensure_visible=scroll_into_view)
 
+        files = self.image_files
+        self._prefetcher.update(self.image_index, len(files),
+                                lambda i: self.db._abs(files[i]), box)
 
     def _make_exif_tab(self):
         """Build one read-only EXIF tab; return (frame, text_area)."""
@@ -525,23 +652,28 @@ class ImageCaptionApp:
 
     def restore_listbox_selection(self):
         if self.image_files and 0 <= self.image_index < len(self.image_files):
-            rp = self.image_files[self.image_index]
-            if self.file_list.exists(rp):
-                self.file_list.selection_set(rp)
-                self.file_list.see(rp)
+            self.file_list.set_current(self.image_index, ensure_visible=True)
 
     def resize_image(self, event=None):
-        if not self.original_image:
+        box = self._label_box(event)
+        if box is None or not self.current_image:
             return
+        if self.original_image is None:   # shown from the prefetch cache
+            try:
+                self.original_image = Image.open(self.db._abs(self.current_image))
+            except Exception:
+                return
+        self._show_scaled(scale_to_fit(self.original_image, box))
+
+    def _label_box(self, event=None) -> tuple[int, int] | None:
+        """(width, height) available for the image in image_label, or None."""
         w = (event.width  if event else self.image_label.winfo_width())  - 4
         h = (event.height if event else self.image_label.winfo_height()) - 4
-        if w <= 0 or h <= 0:
-            return
-        ow, oh = self.original_image.size
-        ratio = min(w / ow, h / oh)
-        nw, nh = int(ow * ratio), int(oh * ratio)
-        resized = self.original_image.resize((nw, nh), Image.LANCZOS)
-        self.photo = ImageTk.PhotoImage(resized)
+        return (w, h) if w > 0 and h > 0 else None
+
+    def _show_scaled(self, scaled: Image.Image):
+        from PIL import ImageTk
+        self.photo = ImageTk.PhotoImage(scaled)
         self.image_label.config(image=self.photo)
         self.image_label.image = self.photo
 
@@ -578,13 +710,9 @@ class ImageCaptionApp:
         # Keep DB caption_text / has_caption aligned with the editor (same as on disk).
         self.db.update_caption(self.current_image, caption)
         self.thumb_view.refresh_caption_dot(self.current_image)
-        rp = self.current_image
-        if self.file_list.exists(rp):
-            vals = self.file_list.item(rp, "values")
-            disp = vals[0] if vals else self._reldisp(rp)
-            self.file_list.item(rp, values=(disp, len(caption)))
+        self.file_list.set_length(self.current_image, len(caption))
         if self._sort_state["col"] == "len":
-            self._apply_current_sort()
+            self._resort_one(self.current_image)
 
     # ==================================================================
     # Navigation
@@ -604,18 +732,6 @@ class ImageCaptionApp:
             self.image_index = (self.image_index + step) % len(self.image_files)
         self.display_image()
 
-    def on_file_select(self, event):
-        try:
-            sel = event.widget.selection()
-            if not sel:
-                return
-            rp = sel[0]
-            if rp == self.current_image:
-                return
-            self.select_image(rp=rp)
-        except (ValueError, IndexError):
-            pass
-
     # ==================================================================
     # Filter
     # ==================================================================
@@ -626,18 +742,21 @@ class ImageCaptionApp:
             return (0, "", "")
         return (1, disp.casefold(), disp)
 
-    def _collect_subdirs(self) -> list[str]:
+    def _collect_subdirs(self, abs_dirs: list[str] | None = None) -> list[str]:
+        """Display names of all folders; *abs_dirs* (from a scan) skips the walk."""
         if not self.image_directory:
             return []
+        if abs_dirs is None:
+            abs_dirs = [root for root, _, _ in os.walk(self.image_directory)]
         dirs = []
-        for root, _, _ in os.walk(self.image_directory):
+        for root in abs_dirs:
             r = os.path.relpath(root, self.image_directory)
             dirs.append("\\" if r == "." else self._reldisp(r))
         dirs.sort(key=self._subdir_sort_key)
         return dirs
 
-    def _refresh_dir_comboboxes(self):
-        dirs = self._collect_subdirs()
+    def _refresh_dir_comboboxes(self, abs_dirs: list[str] | None = None):
+        dirs = self._collect_subdirs(abs_dirs)
         self.dir_entry["values"] = dirs
         self.dir_filter["values"] = dirs
         if not self.dir_filter.get():
@@ -653,48 +772,44 @@ class ImageCaptionApp:
 
     def _path_in_dir(self, rp: str, dir_disp: str) -> bool:
         r"""True if *rp* is in folder *dir_disp* or a subfolder. \\ = no restriction."""
-        if dir_disp == "\\":
-            return True
-        dir_norm = dir_disp.replace("\\", "/")
-        rp_dir = os.path.dirname(rp.replace("\\", "/"))
-        return rp_dir == dir_norm or rp_dir.startswith(dir_norm + "/")
+        return path_in_dir(rp, dir_disp)
+
+    def _filter_mode(self) -> str:
+        return "substring" if self.substring_var.get() else "auto"
+
+    def _filter_spec(self) -> FilterSpec:
+        return FilterSpec(
+            text=self.filter_entry.get().strip(),
+            show_empty=self.show_empty_var.get(),
+            dir_sel=self.dir_filter.get() or "\\",
+            mode=self._filter_mode(),
+            duplicates=self.show_dupes_var.get(),
+        )
 
     def _file_passes_filters(self, rp: str) -> bool:
-        text = self.filter_entry.get().strip()
-        show_empty = self.show_empty_var.get()
-        dir_sel = self.dir_filter.get() or "\\"
-
-        if text or show_empty:
-            rows = self.db.get_all(filter_text=text, show_empty=show_empty)
-            if rp not in {r["rel_path"] for r in rows}:
+        spec = self._filter_spec()
+        if spec.text or spec.show_empty:
+            if not self.db.matches_filter(rp, filter_text=spec.text,
+                                          show_empty=spec.show_empty, mode=spec.mode):
                 return False
-        if dir_sel != "\\" and not self._path_in_dir(rp, dir_sel):
+        if spec.duplicates and rp not in duplicate_order(self.db.get_phashes()):
             return False
-        return True
+        return path_in_dir(rp, spec.dir_sel)
 
     def _apply_filters(self):
-        text = self.filter_entry.get().strip()
-        show_empty = self.show_empty_var.get()
-        dir_sel = self.dir_filter.get() or "\\"
+        """Re-filter synchronously (supersedes any live filter in flight)."""
+        spec = self._filter_spec()
+        self._live_filter.cancel()
+        self._live_filter.mark_applied(spec)
+        self._show_filtered(compute_filter(self.db, self.all_image_files, spec))
+
+    def _show_filtered(self, rel_paths: list[str]):
         prev_index = self.image_index
         list_yview = self.file_list.yview()
         thumb_yview = (
             self.thumb_view.yview() if self.view_mode == "thumbs" else None
         )
-
-        if not text and not show_empty and dir_sel == "\\":
-            self.image_files = list(self.all_image_files)
-        else:
-            if text or show_empty:
-                rows = self.db.get_all(filter_text=text, show_empty=show_empty)
-                pool = {r["rel_path"] for r in rows}
-                candidates = [rp for rp in self.all_image_files if rp in pool]
-            else:
-                candidates = list(self.all_image_files)
-            if dir_sel != "\\":
-                candidates = [rp for rp in candidates if self._path_in_dir(rp, dir_sel)]
-            self.image_files = candidates
-
+        self.image_files = ImageSet(rel_paths)
         self._rebuild_file_list()
         self._resolve_index_after_filter(
             prev_index=prev_index,
@@ -702,14 +817,44 @@ class ImageCaptionApp:
             thumb_yview=thumb_yview,
         )
 
+    def _on_live_filter_result(self, spec: FilterSpec, rel_paths: list[str]):
+        if spec != self._filter_spec():
+            return  # widgets changed since; a newer result is on its way
+        self._show_filtered(rel_paths)
+
+    def _set_filtering(self, busy: bool):
+        self.filter_status_label.config(text="filtering…" if busy else "")
+
+    def _toggle_duplicates(self):
+        if self.show_dupes_var.get():
+            self._hash_worker.start()   # no-op when already running
+        self.filter_files()
+
+    def _set_hash_progress(self, done: int, total: int):
+        self.filter_status_label.config(text=f"hashing {done}/{total}")
+
+    def _on_hashes_done(self, hashed: int):
+        self.filter_status_label.config(text="")
+        if hashed and self.show_dupes_var.get():
+            self._apply_filters()
+
+    def _on_filter_typed(self, event=None):
+        self._live_filter.submit(self._filter_spec(), lambda: self.all_image_files)
+
     def filter_files(self, event=None):
-        self._apply_filters()
+        self._live_filter.submit(self._filter_spec(), lambda: self.all_image_files,
+                                 delay_ms=0)
 
     def clear_filter(self):
+        self._reset_filter_widgets()
+        self._apply_filters()
+
+    def _reset_filter_widgets(self):
         self.filter_entry.delete(0, END)
         self.show_empty_var.set(False)
+        self.substring_var.set(False)
+        self.show_dupes_var.set(False)
         self.dir_filter.set("\\")
-        self._apply_filters()
 
     def _resolve_index_after_filter(
         self,
@@ -726,7 +871,7 @@ class ImageCaptionApp:
             self.file_entry.delete(0, END)
             self.index_label.config(text="0 of 0")
             if self.view_mode == "thumbs":
-                self.thumb_view.set_images([], 0)
+                self.thumb_view.set_images(self.image_files, 0)
             return
 
         current_stays = (
@@ -744,9 +889,7 @@ class ImageCaptionApp:
 
         if preserve_scroll and list_yview is not None:
             self.file_list.yview_moveto(list_yview[0])
-            rp = self.image_files[self.image_index]
-            if self.file_list.exists(rp):
-                self.file_list.selection_set(rp)
+            self.file_list.set_current(self.image_index, ensure_visible=False)
 
         if self.view_mode == "thumbs":
             self.thumb_view.set_images(
@@ -760,57 +903,157 @@ class ImageCaptionApp:
     # Load images / open folder
     # ==================================================================
 
-    def load_images(self):
+    def load_images(self, clear_filter: bool = False):
+        """Ask for a folder and load it progressively (folder_loader.py).
+
+        Images become browsable chunk by chunk while the rest of the folder is
+        scanned and synced; opening another folder supersedes the load.
+        """
+        captioner = self._auto_captioner
+        if captioner is not None and captioner.batch_running:
+            # Its jobs, paths and late results belong to this folder's database.
+            messagebox.showinfo(
+                "Caption all is running",
+                "Stop \"Caption all\" and wait for its summary before opening "
+                "another folder.")
+            return
         directory = filedialog.askdirectory(title="Select Image Directory")
         if not directory:
-            if not self.image_files:
+            if not self.image_files and not self._loading:
                 messagebox.showinfo("No Images", "No directory selected.")
                 self.root.quit()
             return
 
         # Drain any in-flight thumbnail work before switching DB.
         self.thumb_view.set_images([], 0)
-
-        # scan disk
-        found: list[str] = []
-        for root, _, files in os.walk(directory):
-            for f in files:
-                if f.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
-                    found.append(os.path.join(root, f))
-        found.sort()
-
-        if not found:
-            messagebox.showinfo("No Images", "No images found in the selected directory.")
-            self.root.quit()
-            return
-
-        # open DB and sync
-        self.db.open(directory)
-        synced_rps = self.db.sync(found)
-        # caption .txt files may have been added/edited/removed outside this
-        # utility; sync() only refreshes captions for *new* rows, so re-read
-        # every caption from disk to actualise the cached DB state.
-        self.db.update_all_captions(synced_rps)
+        self._hash_worker.stop()
+        self._stop_watcher()
+        while True:   # additions seen in the previous folder
+            try:
+                self._fs_queue.get_nowait()
+            except queue.Empty:
+                break
+        self._live_filter.cancel()
+        if clear_filter:
+            self._reset_filter_widgets()
 
         self.image_directory = directory
-        self.all_image_files = synced_rps
-        self.image_files     = list(synced_rps)
+        self.all_image_files = ImageSet()
+        self.image_files     = ImageSet()
+        self._caption_lengths = {}
         self.image_index     = 0
         self._sort_state = {"col": None, "reverse": False}
-
-        self._refresh_dir_comboboxes()
+        self._refresh_dir_comboboxes([directory])
         self.dir_filter.set("\\")
-
         self._rebuild_file_list()
+        self._resolve_index_after_filter()
+
+        self._loading = True
+        self._set_load_progress(0)
+        self._loader.start(directory)
+        # Files added while loading wait in the queue until the load is done.
+        self._start_watcher()
 
+    def _on_load_chunk(self, rel_paths: list[str], lengths: dict[str, int]):
+        """Append a freshly synced chunk to the lists (folder_loader thread → here)."""
+        first = not self.all_image_files
+        self._caption_lengths.update(lengths)
+        # A file renamed / moved (or added by the watcher) during the load can
+        # arrive again in a later chunk; ImageSet rejects duplicates.
+        rel_paths = [rp for rp in rel_paths if rp not in self.all_image_files]
+        for rp in rel_paths:
+            self.all_image_files.append(rp)
+
+        spec = self._filter_spec()
+        if not spec.is_empty:
+            rel_paths = compute_filter(self.db, rel_paths, spec)
+        key, rev = self._sort_key()
+        for rp in rel_paths:
+            if rp in self.image_files:
+                continue
+            if key is None:
+                self.image_files.append(rp)
+            else:
+                self.image_files.insert_sorted(rp, key=key, reverse=rev)
+
+        if self.current_image and self.current_image in self.image_files:
+            self.image_index = self.image_files.index(self.current_image)
+        self.file_list.refresh()
+        self.file_list.set_current(self.image_index, ensure_visible=False)
+        if self.view_mode == "thumbs":
+            self.thumb_view.refresh(self.image_index)
+        if first and self.image_files:
+            self.display_image()
+        elif self.image_files:
+            self.index_label.config(
+                text=f"{self.image_index + 1} of {len(self.image_files)}")
+        self._set_load_progress(len(self.all_image_files))
+
+    def _on_load_done(self, dirs: list[str], rel_paths: list[str], complete: bool):
+        self._loading = False
+        self._set_load_progress(None)
+        if not rel_paths:
+            if complete:
+                messagebox.showinfo("No Images", "No images found in the selected directory.")
+                self.root.quit()
+            return
+        self._refresh_dir_comboboxes(dirs)
+        if not complete:
+            return   # cancelled: keep what was loaded, in arrival order
+
+        # Whole folder synced: switch to path order, keeping the current image
+        # and the user's deletes / renames made while loading.
+        known = set(rel_paths)
+        ordered = [rp for rp in rel_paths if rp in self.all_image_files]
+        ordered += [rp for rp in self.all_image_files if rp not in known]
+        self.all_image_files = ImageSet(ordered)
+        spec = self._filter_spec()
+        self._live_filter.cancel()
+        self._live_filter.mark_applied(spec)
+        self.image_files = ImageSet(compute_filter(self.db, self.all_image_files, spec))
+        key, rev = self._sort_key()
+        if key is not None:
+            self.image_files.sort(key=key, reverse=rev)
+        if self.current_image and self.current_image in self.image_files:
+            self.image_index = self.image_files.index(self.current_image)
+        else:
+            self.image_index = min(self.image_index, max(0, len(self.image_files) - 1))
+        self._rebuild_file_list()
         if self.view_mode == "thumbs":
             self.thumb_view.set_images(self.image_files, self.image_index)
-
-        self._start_watcher()
+        if self.current_image is None and self.image_files:
+            self.display_image()
+        elif self.image_files:
+            self.index_label.config(
+                text=f"{self.image_index + 1} of {len(self.image_files)}")
+
+    def _on_load_error(self, error: Exception):
+        self._loading = False
+        self._set_load_progress(None)
+        messagebox.showerror("Error", f"Cannot open {self.image_directory}: {error}")
+
+    def _cancel_loading(self):
+        self.load_cancel_button.config(state=DISABLED)
+        self._loader.cancel()
+
+    def _set_load_progress(self, loaded: int | None):
+        """Show "N images…" with a busy bar and Stop button; None hides them."""
+        if loaded is None:
+            self.load_progress_bar.stop()
+            self.load_progress_bar.pack_forget()
+            self.load_progress_label.pack_forget()
+            self.load_cancel_button.pack_forget()
+            return
+        self.load_progress_label.config(text=f"loading… {loaded} images")
+        if not self.load_progress_bar.winfo_ismapped():
+            self.load_progress_bar.pack(side=LEFT, padx=(6, 2))
+            self.load_progress_label.pack(side=LEFT, padx=(0, 2))
+            self.load_cancel_button.config(state=NORMAL)
+            self.load_cancel_button.pack(side=LEFT, padx=(0, 4))
+            self.load_progress_bar.start(50)
 
     def open_folder(self):
-        self.load_images()
-        self.clear_filter()
+        self.load_images(clear_filter=True)
 
     def create_subfolder(self):
         if not self.image_directory:
@@ -837,9 +1080,16 @@ class ImageCaptionApp:
     # ==================================================================
 
     def _start_watcher(self):
-        """(Re)start the watchdog observer on the current directory."""
+        """(Re)start the watchdog observer on the current directory.
+
+        watchdog is optional and imported here, on first use.
+        """
         self._stop_watcher()
-        if not _WATCHDOG_OK or not self.image_directory:
+        if not self.image_directory:
+            return
+        try:
+            from watchdog.observers import Observer
+        except Exception:                   # watchdog optional / missing
             return
         try:
             obs = Observer()
@@ -860,12 +1110,21 @@ class ImageCaptionApp:
             self._observer = None
 
     def _on_close(self):
+        self._loader.stop()
+        self._prefetcher.close()
         self._stop_watcher()
+        self._hash_worker.stop()
+        self.thumb_view.destroy()
+        if self.thumb_cache is not None:
+            self.thumb_cache.close()
+        self.db.close()   # commits writes still queued in the DB writer
         self.root.destroy()
 
     def _poll_fs_queue(self):
         """Drain watcher events on the main thread and add new files."""
         try:
+            if self._loading:
+                return   # added once the folder has finished loading
             seen = set()
             while True:
                 try:
@@ -887,28 +1146,21 @@ class ImageCaptionApp:
             return
 
         self.all_image_files.append(rp)
+        row = self.db.get_by_rel(rp)
+        self._caption_lengths[rp] = len(row["caption_text"] or "") if row else 0
 
         if not self._file_passes_filters(rp):
             return
 
-        self.image_files.append(rp)
-        lengths = self.db.get_caption_lengths()
-        self.file_list.insert("", END, iid=rp,
-                              values=(self._reldisp(rp), lengths.get(rp, 0)))
-
-        # Reapply current sort (cheap move()) or fall back to path order.
-        if self._sort_state.get("col"):
-            self._apply_current_sort()
-        else:
-            self.image_files.sort()
-            existing = set(self.file_list.get_children(""))
-            for i, r in enumerate(self.image_files):
-                if r in existing:
-                    self.file_list.move(r, "", i)
+        # Insert at its place under the current sort (or path order).
+        key, rev = self._sort_key()
+        self.image_files.insert_sorted(rp, key=key, reverse=rev)
 
         # Keep selection index consistent with current_image.
         if self.current_image and self.current_image in self.image_files:
             self.image_index = self.image_files.index(self.current_image)
+        self.file_list.refresh()
+        self.file_list.set_current(self.image_index, ensure_visible=False)
 
         if self.view_mode == "thumbs":
             self.thumb_view.set_images(self.image_files, self.image_index)
@@ -971,9 +1223,7 @@ class ImageCaptionApp:
         self.file_entry.delete(0, END)
         self.file_entry.insert(0, os.path.basename(new_rp))
         self._rebuild_file_list()
-        rp_sel = self.image_files[self.image_index]
-        self.file_list.selection_set(rp_sel)
-        self.file_list.see(rp_sel)
+        self.file_list.set_current(self.image_index, ensure_visible=True)
         self.file_entry.focus_set()
 
         self.thumb_view.rename(old_rp, new_rp)
@@ -1031,11 +1281,11 @@ class ImageCaptionApp:
         
     def _update_path_in_lists(self, old_rp: str, new_rp: str):
         if old_rp in self.image_files:
-            idx = self.image_files.index(old_rp)
-            self.image_files[idx] = new_rp
+            self.image_files.replace(old_rp, new_rp)
         if old_rp in self.all_image_files:
-            idx = self.all_image_files.index(old_rp)
-            self.all_image_files[idx] = new_rp
+            self.all_image_files.replace(old_rp, new_rp)
+        if old_rp in self._caption_lengths:
+            self._caption_lengths[new_rp] = self._caption_lengths.pop(old_rp)
 
     # ==================================================================
     # Delete
@@ -1074,9 +1324,9 @@ class ImageCaptionApp:
         if del_rp in self.all_image_files:
             self.all_image_files.remove(del_rp)
 
-        if self.file_list.exists(del_rp):
-            self.file_list.delete(del_rp)
-        self.thumb_view.remove(del_rp)
+        self._caption_lengths.pop(del_rp, None)
+        self.file_list.refresh()
+        self.thumb_view.remove(del_rp, cur_idx)
 
         if not self.image_files:
             self.current_image = None
@@ -1116,8 +1366,10 @@ class ImageCaptionApp:
                         count += content.count(find_text)
                         with open(cap_file, "w", encoding="utf-8") as f:
                             f.write(new_content)
-                        self.db.update_caption(rp, new_content)
-                        self.thumb_view.refresh_caption_dot(rp)
+                        self.db.update_caption(rp, new_content, wait=False)
+                        self._caption_lengths[rp] = len(new_content)
+                        self.thumb_view.refresh_caption_dot(
+                            rp, has_caption=1 if new_content.strip() else 0)
 
             if self._sort_state["col"] == "len":
                 self._apply_current_sort()
@@ -1154,6 +1406,7 @@ class ImageCaptionApp:
 
         src_lang = self.text_lang.get(1.0, END).strip() or "ru"
         try:
+            from deep_translator import GoogleTranslator   # slow import: first use only
             translated = GoogleTranslator(source=src_lang, target='en').translate(s)
             t = " " + translated.strip()
             self.text_area.insert(END, t)
@@ -1180,6 +1433,7 @@ class ImageCaptionApp:
 
     def _on_drag_init(self, event):
         """Provide current image path to OS drag-and-drop as a file list."""
+        from tkinterdnd2 import DND_FILES
         if not self.current_image:
             return ("copy", DND_FILES, "")
         ap = os.path.normpath(self.db._abs(self.current_image))
@@ -1248,7 +1502,7 @@ def keypress(e):
 
 
 if __name__ == "__main__":
-    root = TkinterDnD.Tk()
+    root = Tk()
     root.bind_all("<KeyPress>", keypress)
     install_text_context_menu(root)
     app = ImageCaptionApp(root)
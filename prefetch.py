@@ -0,0 +1,236 @@
+"""
+prefetch.py — Decode and pre-scale the images around the current one.
+
+``ImagePrefetcher`` keeps the next images in the direction the user is
+moving (and one behind) decoded and scaled to the image label's size, so
+``display_image`` only has to wrap a ready PIL image in a ``PhotoImage``
+instead of decoding and LANCZOS-resizing a full-size file on the Tk thread.
+
+Key properties:
+    * ``update(index, count, path_of, box)`` after every navigation step:
+      the direction is taken from the previous index (wrapping at the ends
+      like Prev / Next), and ``PREFETCH_AHEAD`` images that way plus
+      ``PREFETCH_BEHIND`` the other way are queued, nearest first. The
+      queue is replaced each time, so a change of direction cancels the
+      work still queued for the old one.
+    * Ready images live in an LRU cache bounded by ``PREFETCH_BYTES`` of
+      pixel data, keyed by path, file mtime and target box; a new box
+      (window resized) empties it.
+    * ``get(path, box)`` returns a cached image or None. If that image is
+      being decoded right now it waits for it instead of decoding it twice.
+      ``put()`` stores what the caller scaled itself, for stepping back.
+    * ``stats`` counts hits, misses, decodes, cancelled and unused entries;
+      ``stats.summary()`` gives the hit rate.
+    * Decoding runs on ``PREFETCH_WORKERS`` daemon threads (PIL releases the
+      GIL while decoding and resampling); no Tk imports.
+"""
+
+import collections
+import os
+import threading
+from dataclasses import dataclass
+
+from PIL import Image
+
+PREFETCH_AHEAD = 3
+PREFETCH_BEHIND = 1
+PREFETCH_BYTES = 128 * 1024 * 1024
+PREFETCH_WORKERS = 2
+
+
+def scale_to_fit(img: Image.Image, box: tuple[int, int]) -> Image.Image:
+    """*img* resized (LANCZOS) to the largest size that fits in *box*."""
+    w, h = box
+    ow, oh = img.size
+    ratio = min(w / ow, h / oh)
+    return img.resize((max(1, int(ow * ratio)), max(1, int(oh * ratio))), Image.LANCZOS)
+
+
+def _image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+def _file_key(path: str) -> tuple[str, int] | None:
+    try:
+        return path, os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@dataclass
+class PrefetchStats:
+    hits: int = 0        # get() served from the cache (incl. after waiting)
+    waits: int = 0       # ... of which waited for an in-flight decode
+    misses: int = 0      # get() found nothing; the caller decoded
+    decoded: int = 0     # images decoded and scaled by the workers
+    cancelled: int = 0   # queued images dropped before being decoded
+    unused: int = 0      # prefetched images evicted without being shown
+
+    @property
+    def hit_rate(self) -> float:
+        asked = self.hits + self.misses
+        return self.hits / asked if asked else 0.0
+
+    def summary(self) -> str:
+        return (f"hit rate {self.hit_rate:.0%} ({self.hits} hits, {self.waits} after "
+                f"waiting, {self.misses} misses); {self.decoded} decoded, "
+                f"{self.cancelled} cancelled, {self.unused} unused")
+
+
+class ImagePrefetcher:
+    """Background decoder + byte-bounded LRU of scaled images (see module doc)."""
+
+    def __init__(self, *, ahead: int = PREFETCH_AHEAD, behind: int = PREFETCH_BEHIND,
+                 max_bytes: int = PREFETCH_BYTES, workers: int = PREFETCH_WORKERS):
+        self.ahead = ahead
+        self.behind = behind
+        self.max_bytes = max_bytes
+        self.stats = PrefetchStats()
+        # (path, mtime_ns, box) -> (image, nbytes, shown)
+        self._cache: "collections.OrderedDict[tuple, tuple]" = collections.OrderedDict()
+        self._bytes = 0
+        self._box: tuple[int, int] | None = None
+        self._pending: collections.deque[str] = collections.deque()
+        self._inflight: set[tuple] = set()
+        self._cond = threading.Condition()
+        self._last_index: int | None = None
+        self._direction = 1
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f"prefetch-{i}",
+                                          daemon=True) for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    # ------------------------------------------------------------------
+    # UI side
+    # ------------------------------------------------------------------
+
+    def update(self, index: int, count: int, path_of, box: tuple[int, int] | None):
+        """Queue the neighbours of *index* (of *count*); ``path_of(i)`` → path."""
+        last, self._last_index = self._last_index, index
+        if box is None or count < 2:
+            return
+        if last is not None and last != index:
+            step = index - last
+            if abs(step) * 2 > count:   # wrapped around an end
+                step = -step
+            self._direction = 1 if step > 0 else -1
+        d = self._direction
+        order = [index + d * k for k in range(1, self.ahead + 1)]
+        order += [index - d * k for k in range(1, self.behind + 1)]
+        paths = list(dict.fromkeys(path_of(i % count) for i in order
+                                   if i % count != index))
+        with self._cond:
+            self._set_box(box)
+            keep = set(paths)
+            self.stats.cancelled += sum(1 for p in self._pending if p not in keep)
+            self._pending = collections.deque(paths)
+            self._cond.notify_all()
+
+    def get(self, path: str, box: tuple[int, int]) -> Image.Image | None:
+        """The scaled image for *path* at *box*, or None (counted as a miss)."""
+        fk = _file_key(path)
+        if fk is None:
+            return None
+        key = fk + (box,)
+        with self._cond:
+            waited = False
+            while key in self._inflight:
+                waited = True
+                self._cond.wait()
+            entry = self._cache.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            img, nbytes, _ = entry
+            self._cache[key] = (img, nbytes, True)
+            self.stats.hits += 1
+            self.stats.waits += waited
+            return img
+
+    def put(self, path: str, box: tuple[int, int], img: Image.Image):
+        """Cache an image the caller scaled itself (it has been shown)."""
+        fk = _file_key(path)
+        if fk is None:
+            return
+        with self._cond:
+            self._set_box(box)
+            self._store(fk + (box,), img, shown=True)
+
+    def clear(self):
+        with self._cond:
+            self._cache.clear()
+            self._bytes = 0
+            self._pending.clear()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=2.0)
+
+    # ------------------------------------------------------------------
+    # Cache (called with self._cond held)
+    # ------------------------------------------------------------------
+
+    def _set_box(self, box: tuple[int, int]):
+        if box != self._box:
+            self._box = box
+            self._cache.clear()   # scaled for another size: useless now
+            self._bytes = 0
+
+    def _store(self, key: tuple, img: Image.Image, shown: bool):
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        nbytes = _image_bytes(img)
+        self._cache[key] = (img, nbytes, shown)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes and len(self._cache) > 1:
+            _, (_, n, was_shown) = self._cache.popitem(last=False)
+            self._bytes -= n
+            self.stats.unused += not was_shown
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    def _next_job(self) -> tuple | None:
+        """Pop the next path that is neither cached nor being decoded."""
+        with self._cond:
+            while not self._closed:
+                while self._pending:
+                    fk = _file_key(self._pending.popleft())
+                    if fk is None:
+                        continue
+                    key = fk + (self._box,)
+                    if key in self._cache:
+                        self._cache.move_to_end(key)
+                    elif key not in self._inflight:
+                        self._inflight.add(key)
+                        return key
+                self._cond.wait()
+            return None
+
+    def _run(self):
+        while True:
+            key = self._next_job()
+            if key is None:
+                return
+            path, _, box = key
+            try:
+                with Image.open(path) as img:
+                    img.load()
+                    scaled = scale_to_fit(img, box)
+            except Exception:
+                scaled = None
+            with self._cond:
+                self._inflight.discard(key)
+                if scaled is not None:
+                    self.stats.decoded += 1
+                    if box == self._box:
+                        self._store(key, scaled, shown=False)
+                self._cond.notify_all()
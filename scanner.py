@@ -0,0 +1,136 @@
+"""
+scanner.py — Single-pass directory scanner for ImageCaptionApp.
+
+``scan_directory(root)`` walks the tree with ``os.scandir`` and returns every
+image together with its ``stat`` result and the ``stat`` of its ``.txt``
+sidecar (if any), so ``ImageDB.sync`` needs no further per-file syscalls.
+
+Key properties:
+    * One ``scandir`` per directory; ``DirEntry.stat()`` is served from the
+      directory listing on Windows and costs one ``stat`` elsewhere.
+    * Sidecars are matched against the ``.txt`` names seen in the same listing
+      — no ``os.path.exists`` probe per image.
+    * Subdirectories are listed concurrently on a thread pool (directory
+      I/O releases the GIL), which hides latency on network shares.
+    * Symlinked directories are not followed (same as ``os.walk``).
+    * ``iter_directory(root)`` yields each directory's images as soon as it
+      has been listed, for callers that show results progressively.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp")
+CAPTION_EXT = ".txt"
+SCAN_WORKERS = 8
+
+
+@dataclass(slots=True)
+class ScannedImage:
+    path: str                          # absolute path of the image
+    mtime: float = 0.0
+    size: int = 0
+    caption_mtime: float | None = None  # None = no .txt sidecar
+    caption_size: int = 0
+
+    @property
+    def caption_path(self) -> str:
+        return os.path.splitext(self.path)[0] + CAPTION_EXT
+
+
+@dataclass
+class ScanResult:
+    images: list[ScannedImage] = field(default_factory=list)  # sorted by path
+    dirs: list[str] = field(default_factory=list)             # incl. the root
+
+
+def stat_image(path: str) -> ScannedImage:
+    """Build a ``ScannedImage`` for a single file (mtime 0.0 if unreadable)."""
+    entry = ScannedImage(path)
+    try:
+        st = os.stat(path)
+        entry.mtime, entry.size = st.st_mtime, st.st_size
+    except OSError:
+        pass
+    try:
+        st = os.stat(entry.caption_path)
+        entry.caption_mtime, entry.caption_size = st.st_mtime, st.st_size
+    except OSError:
+        pass
+    return entry
+
+
+def _scan_one(path: str) -> tuple[list[ScannedImage], list[str]]:
+    """List a single directory. Returns (images, subdirectories)."""
+    images: list[ScannedImage] = []
+    captions: dict[str, os.stat_result] = {}
+    subdirs: list[str] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                        continue
+                    name = os.path.normcase(entry.name)
+                    if name.lower().endswith(IMAGE_EXTS):
+                        st = entry.stat()
+                        images.append(ScannedImage(entry.path, st.st_mtime, st.st_size))
+                    elif name.endswith(CAPTION_EXT):
+                        captions[name[:-len(CAPTION_EXT)]] = entry.stat()
+                except OSError:
+                    continue
+    except OSError:
+        return [], []
+    if captions:
+        for img in images:
+            stem = os.path.splitext(os.path.normcase(os.path.basename(img.path)))[0]
+            st = captions.get(stem)
+            if st is not None:
+                img.caption_mtime, img.caption_size = st.st_mtime, st.st_size
+    return images, subdirs
+
+
+def iter_directory(root: str, workers: int = SCAN_WORKERS):
+    """Yield ``(directory, images)`` for *root* and every subdirectory.
+
+    Directories come in the order their listings complete, not sorted; the
+    images of one directory are sorted by path. Closing the generator early
+    abandons the directories not listed yet.
+    """
+    if workers <= 1:
+        stack = [root]
+        while stack:
+            d = stack.pop()
+            images, subdirs = _scan_one(d)
+            stack.extend(subdirs)
+            images.sort(key=lambda e: e.path)
+            yield d, images
+        return
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        running = {pool.submit(_scan_one, root): root}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                d = running.pop(fut)
+                images, subdirs = fut.result()
+                for sd in subdirs:
+                    running[pool.submit(_scan_one, sd)] = sd
+                images.sort(key=lambda e: e.path)
+                yield d, images
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_directory(root: str, workers: int = SCAN_WORKERS) -> ScanResult:
+    """Scan *root* recursively; see module docstring."""
+    result = ScanResult()
+    for d, images in iter_directory(root, workers):
+        result.dirs.append(d)
+        result.images.extend(images)
+    result.images.sort(key=lambda e: e.path)
+    result.dirs.sort()
+    return result
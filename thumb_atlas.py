@@ -0,0 +1,125 @@
+"""
+thumb_atlas.py — Append-only packed thumbnail file read through mmap.
+
+Alternative to storing thumbnail BLOBs in SQLite (``ImageDB(thumb_backend=
+"atlas")``). JPEG bytes are appended to ``thumbs.<generation>.atlas`` next to
+the database; the SQLite table ``thumb_atlas(image_id, pos, size)`` is the
+index. Reads return ``memoryview`` slices of a read-only mapping, so fetching
+the visible window copies no thumbnail data.
+
+Key properties:
+    * Crash safety: bytes are appended and fsync-ed (``sync()``) before the
+      index rows that point at them are committed. A crash can leave an
+      unreferenced tail, never an index entry pointing at missing data.
+    * Replaced / invalidated / deleted entries stay in the file as dead
+      bytes until compaction, which copies the live entries into the next
+      generation's file. The switch is a single SQLite commit of the new
+      offsets + generation number; files of other generations are deleted
+      on the next open, so a crash at any point leaves one consistent pair.
+    * The mapping is grown lazily when a read goes past its end; views
+      handed out earlier keep the old mapping alive until released.
+"""
+
+import glob
+import mmap
+import os
+import threading
+
+ATLAS_PREFIX = "thumbs"
+ATLAS_EXT = ".atlas"
+
+
+def atlas_path(directory: str, generation: int) -> str:
+    return os.path.join(directory, f"{ATLAS_PREFIX}.{generation}{ATLAS_EXT}")
+
+
+def remove_stale_atlases(directory: str, keep_generation: int):
+    """Delete atlas files of every generation except *keep_generation*."""
+    keep = os.path.normcase(atlas_path(directory, keep_generation))
+    for path in glob.glob(os.path.join(glob.escape(directory),
+                                       f"{ATLAS_PREFIX}.*{ATLAS_EXT}")):
+        if os.path.normcase(path) != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass   # still mapped elsewhere (Windows): next open
+
+
+class ThumbAtlas:
+    """One generation of the packed thumbnail file."""
+
+    def __init__(self, directory: str, generation: int, truncate: bool = False):
+        self.generation = generation
+        self.path = atlas_path(directory, generation)
+        self._lock = threading.Lock()
+        self._f = open(self.path, "wb" if truncate else "ab")
+        self._f.seek(0, os.SEEK_END)
+        self._size = self._f.tell()
+        self._dirty = False
+        self._mm: mmap.mmap | None = None
+
+    @property
+    def size(self) -> int:
+        """Bytes appended so far (including dead entries)."""
+        return self._size
+
+    # ------------------------------------------------------------------
+    # Write side
+    # ------------------------------------------------------------------
+
+    def append(self, data) -> tuple[int, int]:
+        """Append *data*; return ``(pos, size)`` for the index row."""
+        with self._lock:
+            pos = self._size
+            self._f.write(data)
+            self._size += len(data)
+            self._dirty = True
+        return pos, len(data)
+
+    def sync(self):
+        """Make appended bytes durable. Call before committing their index."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Read side
+    # ------------------------------------------------------------------
+
+    def view(self, pos: int, size: int) -> memoryview:
+        """Zero-copy view of an entry (must have been ``sync()``-ed)."""
+        end = pos + size
+        mm = self._mm
+        if mm is None or end > len(mm):
+            mm = self._remap(end)
+        return memoryview(mm)[pos:end]
+
+    def _remap(self, needed: int) -> mmap.mmap:
+        with self._lock:
+            mm = self._mm
+            if mm is not None and needed <= len(mm):
+                return mm
+            with open(self.path, "rb") as f:
+                length = os.fstat(f.fileno()).st_size
+                if length < needed:
+                    raise ValueError("atlas entry beyond end of file")
+                # The mapping keeps its own handle; the file can be closed.
+                mm = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+            self._mm = mm   # older mapping lives on while views reference it
+            return mm
+
+    def close(self):
+        with self._lock:
+            try:
+                self._f.close()
+            except OSError:
+                pass
+            if self._mm is not None:
+                try:
+                    self._mm.close()
+                except BufferError:
+                    pass   # views still exported; freed with the last one
+                self._mm = None
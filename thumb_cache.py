@@ -0,0 +1,213 @@
+"""
+thumb_cache.py — Per-user thumbnail cache shared across folders.
+
+Each opened folder keeps its own thumbs.sqlite, so opening a parent folder, a
+subfolder or a copy of a dataset used to decode every image again. The
+ThumbWorker now asks this cache first; it is keyed by a content fingerprint
+instead of a path:
+
+    blake2b(size, mtime, THUMB_SIZE, policy, first + last FINGERPRINT_CHUNK bytes)
+
+Key properties:
+    * One SQLite file in the user cache directory (``cache_dir()``), WAL
+      mode, safe to share between several running instances.
+    * LRU by access time with a byte cap (``max_bytes``): once the stored
+      thumbnails exceed it, the least recently used entries are evicted down
+      to ``EVICT_TO`` of the cap. Access times are only rewritten when older
+      than ``TOUCH_INTERVAL``, so hits cost no write in the common case.
+    * Writes are committed in batches (every ``COMMIT_EVERY`` operations and
+      on ``flush()``); the worker flushes whenever it goes idle.
+    * Best effort: any SQLite / OS error turns into a miss, never an
+      exception in the caller.
+    * ``dataset_store_dir()`` gives read-only folders a place for their
+      database outside the dataset (see ``ImageDB.open``).
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+THUMB_CACHE = True           # set False to keep thumbnails per folder only
+APP_DIRNAME = "image_caption_utility"
+CACHE_FILENAME = "thumb_cache.sqlite"
+THUMB_CACHE_MAX_BYTES = 512 * 1024 * 1024
+FINGERPRINT_CHUNK = 64 * 1024
+EVICT_TO = 0.9
+TOUCH_INTERVAL = 3600.0      # seconds
+COMMIT_EVERY = 64            # operations per transaction
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key          TEXT PRIMARY KEY,
+        data         BLOB NOT NULL,
+        size         INTEGER NOT NULL,
+        atime        REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_atime ON entries (atime);
+"""
+
+
+def cache_dir() -> str:
+    """Per-user cache directory (``IMAGE_CAPTION_CACHE_DIR`` overrides)."""
+    override = os.environ.get("IMAGE_CAPTION_CACHE_DIR")
+    if override:
+        return override
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, APP_DIRNAME)
+
+
+def dataset_store_dir(directory: str) -> str:
+    """Directory holding the database of a folder that cannot be written to."""
+    ident = os.path.normcase(os.path.abspath(directory)).encode("utf-8", "surrogatepass")
+    path = os.path.join(cache_dir(), "datasets",
+                        hashlib.blake2b(ident, digest_size=8).hexdigest())
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def fingerprint(abs_path: str, thumb_size: int, policy: str) -> str | None:
+    """Content key of *abs_path* for this thumbnail geometry (None if unreadable)."""
+    try:
+        with open(abs_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            h = hashlib.blake2b(digest_size=16)
+            h.update(f"{st.st_size}:{st.st_mtime_ns}:{thumb_size}:{policy}".encode())
+            h.update(f.read(FINGERPRINT_CHUNK))
+            if st.st_size > 2 * FINGERPRINT_CHUNK:
+                f.seek(-FINGERPRINT_CHUNK, os.SEEK_END)
+                h.update(f.read(FINGERPRINT_CHUNK))
+            return h.hexdigest()
+    except OSError:
+        return None
+
+
+class ThumbCache:
+    """Fingerprint-keyed JPEG thumbnail store with an LRU byte cap."""
+
+    def __init__(self, path: str | None = None,
+                 max_bytes: int = THUMB_CACHE_MAX_BYTES):
+        self.path = path or os.path.join(cache_dir(), CACHE_FILENAME)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._total = 0
+        self._uncommitted = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._conn = conn
+        except (sqlite3.Error, OSError):
+            self._conn = None   # cache unavailable: every lookup misses
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT data, atime FROM entries WHERE key=?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                now = time.time()
+                if now - row[1] > TOUCH_INTERVAL:
+                    self._conn.execute(
+                        "UPDATE entries SET atime=? WHERE key=?", (now, key))
+                    self._count_op()
+                self.hits += 1
+                return row[0]
+            except sqlite3.Error:
+                return None
+
+    def put(self, key: str, data: bytes):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                old = self._conn.execute(
+                    "SELECT size FROM entries WHERE key=?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, data, size, atime) "
+                    "VALUES (?, ?, ?, ?)", (key, data, len(data), time.time()))
+                self._total += len(data) - (old[0] if old else 0)
+                if self._total > self.max_bytes:
+                    self._evict()
+                self._count_op()
+            except sqlite3.Error:
+                pass
+
+    def flush(self):
+        """Commit pending writes."""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._commit()
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    # ------------------------------------------------------------------
+    # Internals (caller holds _lock)
+    # ------------------------------------------------------------------
+
+    def _count_op(self):
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY:
+            self._commit()
+
+    def _commit(self):
+        if self._conn is None or not self._uncommitted:
+            return
+        try:
+            self._conn.commit()
+        except sqlite3.Error:
+            pass
+        self._uncommitted = 0
+
+    def _evict(self):
+        target = int(self.max_bytes * EVICT_TO)
+        while self._total > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY atime LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._total = 0
+                return
+            victims = []
+            for key, size in rows:
+                victims.append((key,))
+                self._total -= size
+                if self._total <= target:
+                    break
+            self._conn.executemany("DELETE FROM entries WHERE key=?", victims)
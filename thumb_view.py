@@ -22,11 +22,17 @@ import io
 import os
 import queue
 from collections import OrderedDict
+from typing import TYPE_CHECKING
 from tkinter import (Frame, Canvas, Label, Scrollbar, VERTICAL, LEFT, RIGHT,
                      BOTH, X, Y)
-from PIL import Image, ImageTk
+from PIL import Image
 
-from db import ImageDB, ThumbWorker, THUMB_SIZE
+from db import ImageDB, ThumbWorker, THUMB_SIZE, THUMB_WORKERS, THUMB_POLICY
+from thumb_cache import ThumbCache
+from image_set import ImageSet
+
+if TYPE_CHECKING:
+    from PIL import ImageTk   # imported on first use (startup time)
 
 
 # ---------------------------------------------------------------------------
@@ -79,6 +85,9 @@ class ThumbnailView:
         on_progress=None,
         cell_w: int = CELL_W,
         cell_h: int = CELL_H,
+        workers: int = THUMB_WORKERS,
+        policy: str = THUMB_POLICY,
+        cache: ThumbCache | None = None,
     ):
         self._db = db
         self._on_select = on_select
@@ -88,7 +97,7 @@ class ThumbnailView:
         self._cell_h = cell_h
 
         # --- data state ---
-        self._files: list[str] = []
+        self._files: ImageSet = ImageSet()
         self._current_idx: int = 0
         self._cols: int = 1
         self._rows: int = 0
@@ -108,7 +117,8 @@ class ThumbnailView:
 
         # --- worker ---
         self._queue: queue.Queue = queue.Queue()
-        self._worker = ThumbWorker(db, self._queue)
+        self._worker = ThumbWorker(db, self._queue, workers=workers,
+                                   policy=policy, cache=cache)
         self._poll_after: str | None = None
         self._total_requested: int = 0
         self._remaining: int = 0
@@ -191,16 +201,21 @@ class ThumbnailView:
 
     def set_images(
         self,
-        rel_paths: list[str],
+        rel_paths: ImageSet | list[str],
         current_index: int = 0,
         *,
         preserve_scroll: bool = False,
         yview: tuple[float, float] | None = None,
     ):
-        """Replace the file set and re-render the visible window."""
+        """Replace the file set and re-render the visible window.
+
+        An ``ImageSet`` is kept by reference, so the caller's in-place edits
+        show up here; follow them with ``refresh()``, ``remove()`` or
+        ``rename()``. Any other sequence is copied.
+        """
         self._unmount_range(set(self._mounted))
         self._photos.clear()
-        self._files = list(rel_paths)
+        self._files = rel_paths if isinstance(rel_paths, ImageSet) else ImageSet(rel_paths)
         if self._files:
             self._current_idx = max(0, min(current_index, len(self._files) - 1))
         else:
@@ -223,6 +238,21 @@ class ThumbnailView:
             self._scroll_cell_into_view(self._current_idx)
             self._sync_visible()
 
+    def refresh(self, current_index: int | None = None):
+        """Re-render after the shared set was reordered or grown in place.
+
+        Keeps the scroll position and the decoded thumbnails.
+        """
+        self._unmount_range(set(self._mounted))
+        if current_index is not None:
+            self._current_idx = current_index
+        if self._files:
+            self._current_idx = max(0, min(self._current_idx, len(self._files) - 1))
+        else:
+            self._current_idx = 0
+        self._recompute_layout()
+        self._sync_visible()
+
     def set_current(self, index: int, ensure_visible: bool = True):
         """Select *index* and optionally scroll it into view."""
         if not self._files:
@@ -241,8 +271,8 @@ class ThumbnailView:
             self._scroll_cell_into_view(index)
             self._sync_visible()
 
-    def refresh_caption_dot(self, rel_path: str):
-        """Re-query DB for caption state and repaint the dot of *rel_path*."""
+    def refresh_caption_dot(self, rel_path: str, has_caption: int | None = None):
+        """Repaint the dot of *rel_path*; re-queries the DB unless *has_caption*."""
         try:
             idx = self._files.index(rel_path)
         except ValueError:
@@ -250,21 +280,27 @@ class ThumbnailView:
         cell = self._cells.get(idx)
         if cell is None:
             return
-        row = self._db.get_by_rel(rel_path)
-        has = row["has_caption"] if row else 0
+        if has_caption is None:
+            row = self._db.get_by_rel(rel_path)
+            has_caption = row["has_caption"] if row else 0
         try:
-            cell["dot"].config(fg=_dot_color(has))
+            cell["dot"].config(fg=_dot_color(has_caption))
         except Exception:
             pass
 
-    def remove(self, rel_path: str):
+    def remove(self, rel_path: str, index: int | None = None):
         """Remove *rel_path* from the set, shifting indices and selection.
 
         Intended to be called AFTER the caller has updated its own lists.
+        If the set is the caller's own ``ImageSet`` the path is already gone;
+        pass the *index* it had.
         """
-        try:
+        owned = rel_path in self._files
+        if owned:
             del_idx = self._files.index(rel_path)
-        except ValueError:
+        elif index is not None:
+            del_idx = index
+        else:
             return
 
         self._worker.cancel(rel_path)
@@ -274,7 +310,8 @@ class ThumbnailView:
         doomed = {i for i in self._mounted if i >= del_idx}
         self._unmount_range(doomed)
 
-        self._files.pop(del_idx)
+        if owned:
+            self._files.pop(del_idx)
 
         if not self._files:
             self._current_idx = 0
@@ -295,11 +332,13 @@ class ThumbnailView:
 
     def rename(self, old_rp: str, new_rp: str):
         """Update a rel_path in-place; keep caches aligned."""
-        try:
+        if old_rp in self._files:
             idx = self._files.index(old_rp)
-        except ValueError:
+            self._files.replace(old_rp, new_rp)
+        elif new_rp in self._files:   # shared set, already renamed by the caller
+            idx = self._files.index(new_rp)
+        else:
             return
-        self._files[idx] = new_rp
         if old_rp in self._photos:
             self._photos[new_rp] = self._photos.pop(old_rp)
         cell = self._cells.get(idx)
@@ -535,6 +574,7 @@ class ThumbnailView:
                 pil = Image.open(io.BytesIO(jpeg_bytes))
             except Exception:
                 return
+            from PIL import ImageTk   # first thumbnail shown, not at startup
             photo = ImageTk.PhotoImage(pil)
             self._photos[rel_path] = photo
         else: